@@ -1,5 +1,7 @@
 import openai
 import json
+from extractor.images import select_image_variant
+from extractor.raw_content import RawContent
 import config
 
 class DeepSeekClient:
@@ -94,15 +96,18 @@ class DeepSeekClient:
             for heading in raw_content['headings'][:5]:  # Limit to first 5 headings
                 prompt_parts.append(f"  H{heading['level']}: {heading['text']}")
 
-        if raw_content.get('text_content'):
-            # Truncate text content if too long
-            text = raw_content['text_content'][:1500]  # Reduced to fit images
+        # Only the first 1500 characters are read from the page (reduced to fit images)
+        if isinstance(raw_content, RawContent):
+            text = raw_content.text(1500)
+        else:
+            text = (raw_content.get('text_content') or '')[:1500]
+        if text:
             prompt_parts.append(f"Text Content: {text}...")
 
         if raw_content.get('images'):
             prompt_parts.append("Images found on page:")
             for i, img in enumerate(raw_content['images'][:10]):  # Limit to 10 images
-                prompt_parts.append(f"  {i+1}. {img['src']} (alt: {img.get('alt', 'N/A')})")
+                prompt_parts.append(f"  {i+1}. {select_image_variant(img)} (alt: {img.get('alt', 'N/A')})")
 
         if raw_content.get('structured_data'):
             prompt_parts.append("Structured Data:")
@@ -135,3 +140,16 @@ class DeepSeekClient:
         ])
 
         return "\n".join(prompt_parts)
+
+def parse_json_reply(text, open_char, close_char):
+    """Pull the outermost JSON object/array out of an LLM reply (fences and prose tolerated)"""
+    if not text:
+        return None
+    start = text.find(open_char)
+    end = text.rfind(close_char)
+    if start == -1 or end <= start:
+        return None
+    try:
+        return json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return None
@@ -1,6 +1,8 @@
 from .deepseek_client import DeepSeekClient
-from extractor.images import ImageExtractor
+from extractor.images import ImageExtractor, image_key, select_image_candidate, select_image_variant
+from extractor.raw_content import html_to_text
 import os
+from urllib.parse import unquote, urljoin, urlsplit
 import config
 
 class ProductParser:
@@ -8,16 +10,34 @@ class ProductParser:
 
     def __init__(self, base_url):
         self.base_url = base_url
-        self.ai_client = DeepSeekClient()
+        # Created on first use: extraction workers parse pages in child
+        # processes and must not open their own API clients or sessions
+        self._ai_client = None
         self.image_extractor = ImageExtractor(base_url)
 
-    def parse_product_page(self, raw_content, page_url):
-        """Parse a single product page and return structured product data"""
+    @property
+    def ai_client(self):
+        if self._ai_client is None:
+            self._ai_client = DeepSeekClient()
+        return self._ai_client
+
+    def parse_product_page(self, raw_content, page_url, captured_json=None):
+        """Parse a single product page and return structured product data
+
+        captured_json holds JSON responses recorded while the page rendered
+        (PageFetcher capture mode); a product found there for this page wins
+        over the DOM.
+        """
         if not raw_content:
             return None
 
+        product_data = None
+        if captured_json:
+            product_data = self._extract_from_captured_json(captured_json, raw_content, page_url)
+
         # Try to extract product data from structured data (JSON-LD)
-        product_data = self._extract_from_structured_data(raw_content, page_url)
+        if not product_data:
+            product_data = self._extract_from_structured_data(raw_content, page_url)
 
         if not product_data:
             print(f"No structured data found for URL: {page_url}")
@@ -25,12 +45,26 @@ class ProductParser:
 
         print(f"Extracted product: {product_data.get('title', 'Unknown')}")
 
+        return self.finalize_product(product_data, page_url, raw_content)
+
+    def finalize_product(self, product_data, page_url, raw_content=None):
+        """Attach image filenames and the URL, then normalize; also used for platform API products
+
+        Image URLs are made absolute against page_url. One the page also
+        shows in an <img> is replaced by the srcset/<picture> variant
+        select_image_variant() picks, so structured data pointing at the
+        full-size original downloads a copy near IMAGE_TARGET_WIDTH.
+        """
+        variants = self._page_image_variants(raw_content, page_url) if raw_content else {}
+
         # Process images from structured data
         structured_images = product_data.get('images', [])
         processed_images = []
 
         for img_url in structured_images[:5]:  # Limit to 5 images
             if img_url and isinstance(img_url, str):
+                img_url = urljoin(page_url, img_url.strip())
+                img_url = variants.get(image_key(img_url), img_url)
                 processed_images.append({
                     'url': img_url,
                     'alt': '',
@@ -45,6 +79,20 @@ class ProductParser:
 
         return product_data
 
+    @staticmethod
+    def _page_image_variants(raw_content, page_url):
+        """Map image_key() of each page image's src and variants to the variant to download"""
+        variants = {}
+        for image in raw_content.get('images') or []:
+            candidate = select_image_candidate(image)
+            if not candidate:
+                continue
+            chosen_url = urljoin(page_url, candidate['url'])
+            for url in [image.get('src')] + [c['url'] for c in image['candidates']]:
+                if url:
+                    variants.setdefault(image_key(urljoin(page_url, url)), chosen_url)
+        return variants
+
     def _normalize_product_data(self, product_data):
         """Normalize and clean product data"""
         # Ensure title is clean
@@ -80,6 +128,130 @@ class ProductParser:
 
         return product_data
 
+    def _extract_from_captured_json(self, captured_json, raw_content, page_url):
+        """Extract product data from captured Shopify product JSON or GraphQL responses"""
+        product = self._find_captured_product(captured_json, page_url)
+        if not product:
+            return None
+
+        title = product.get('title') or product.get('name') or ''
+        if not title:
+            return None
+
+        product_data = {
+            'is_product': True,
+            'title': title,
+            'description': html_to_text(product.get('description') or product.get('descriptionHtml') or ''),
+            'images': self._captured_images(product),
+        }
+
+        if isinstance(product.get('price'), int) and 'variants' in product:
+            # Shopify /products/<handle>.js: prices in cents, no currency
+            product_data['price'] = f"{product['price'] / 100:.2f}"
+            compare_at = product.get('compare_at_price')
+            if isinstance(compare_at, int) and compare_at > product['price']:
+                product_data['old_price'] = f"{compare_at / 100:.2f}"
+        else:
+            # GraphQL (Storefront API style): MoneyV2 {amount, currencyCode}
+            price = self._money(product, 'priceRange', 'minVariantPrice') or self._money(product, 'price')
+            if price:
+                product_data['price'] = str(price.get('amount', ''))
+                product_data['currency'] = price.get('currencyCode', '')
+            old_price = (self._money(product, 'compareAtPriceRange', 'maxVariantPrice') or
+                         self._money(product, 'compareAtPrice'))
+            if old_price and old_price.get('amount') and price and \
+                    float(old_price['amount']) > float(price.get('amount') or 0):
+                product_data['old_price'] = str(old_price['amount'])
+
+        if not product_data.get('currency'):
+            meta_tags = raw_content.get('meta_tags', {})
+            product_data['currency'] = (meta_tags.get('product:price:currency') or
+                                        meta_tags.get('og:price:currency') or '')
+
+        print(f"DEBUG: Product data taken from captured JSON: {title}")
+        return product_data
+
+    def _find_captured_product(self, captured_json, page_url):
+        """The captured product this page shows, or None
+
+        Pages also load related products, quick-view and recommendation
+        JSON, so a product is taken only if its handle, url or
+        onlineStoreUrl matches page_url, or if it is the only one captured.
+        """
+        products = []
+        for payload in captured_json:
+            for product in self._captured_products(payload):
+                if not any(product is seen for seen in products):
+                    products.append(product)
+
+        for product in products:
+            if self._is_page_product(product, page_url):
+                return product
+        return products[0] if len(products) == 1 else None
+
+    def _captured_products(self, payload, depth=0):
+        """Product objects in a captured payload: the payload itself or nested "product" keys"""
+        if depth > 6:
+            return []
+        if isinstance(payload, dict):
+            if 'variants' in payload and ('title' in payload or 'name' in payload):
+                return [payload]
+            product = payload.get('product')
+            if isinstance(product, dict) and ('title' in product or 'name' in product):
+                return [product]
+            children = payload.values()
+        elif isinstance(payload, list):
+            children = payload
+        else:
+            return []
+
+        products = []
+        for child in children:
+            products.extend(self._captured_products(child, depth + 1))
+        return products
+
+    @staticmethod
+    def _is_page_product(product, page_url):
+        page_path = unquote(urlsplit(page_url).path).rstrip('/').lower()
+        handle = product.get('handle')
+        if isinstance(handle, str) and handle and page_path.rsplit('/', 1)[-1] == handle.lower():
+            return True
+        for key in ('url', 'onlineStoreUrl'):
+            url = product.get(key)
+            if not isinstance(url, str) or not url:
+                continue
+            # Relative (/products/x) or absolute; the page may sit under a collection
+            path = '/' + unquote(urlsplit(url).path).strip('/').lower()
+            if path != '/' and (page_path == path or page_path.endswith(path)):
+                return True
+        return False
+
+    @staticmethod
+    def _captured_images(product):
+        images = product.get('images') or []
+        if isinstance(images, dict):
+            # GraphQL connection: {edges: [{node: {...}}]} or {nodes: [...]}
+            images = [edge.get('node', {}) for edge in images.get('edges', [])] or images.get('nodes', [])
+
+        urls = []
+        for image in images:
+            if isinstance(image, dict):
+                image = image.get('url') or image.get('src') or image.get('originalSrc')
+            if isinstance(image, str) and image:
+                urls.append('https:' + image if image.startswith('//') else image)
+        return urls
+
+    @staticmethod
+    def _money(product, *path):
+        value = product
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        if isinstance(value, dict) and 'amount' in value:
+            return value
+        if isinstance(value, (str, int, float)) and value != '':
+            return {'amount': value}
+        return None
+
     def _extract_from_structured_data(self, raw_content, page_url):
         """Extract product data from JSON-LD structured data or fallback to meta tags"""
         structured_data = raw_content.get('structured_data', [])
@@ -158,10 +330,23 @@ class ProductParser:
 
     def download_product_images(self, product_data, output_dir, product_id):
         """Download images for a product with proper naming"""
+        downloaded_images = []
+
+        for img_url, filepath, filename in self.image_jobs(product_data, output_dir, product_id):
+            # Download image
+            if self.image_extractor.download_image(img_url, filepath):
+                downloaded_images.append(filename)
+            else:
+                print(f"Failed to download image: {img_url}")
+
+        return downloaded_images
+
+    def image_jobs(self, product_data, output_dir, product_id):
+        """List (img_url, filepath, filename) downloads for a product's images"""
         if not product_data or 'images' not in product_data:
             return []
 
-        downloaded_images = []
+        jobs = []
         images_dir = os.path.join(output_dir, 'images')
 
         # Ensure images directory exists
@@ -171,21 +356,15 @@ class ProductParser:
             # Generate filename with product ID
             ext = self._get_image_extension(image_data['filename'])
             filename = f"{product_id}-{i}.{ext}"
-            filepath = os.path.join(images_dir, filename)
+            jobs.append((image_data['url'], os.path.join(images_dir, filename), filename))
 
-            # Download image
-            if self.image_extractor.download_image(image_data['url'], filepath):
-                downloaded_images.append(filename)
-            else:
-                print(f"Failed to download image: {image_data['url']}")
-
-        return downloaded_images
+        return jobs
 
     def _get_image_extension(self, filename):
         """Extract or determine image extension"""
         if '.' in filename:
             ext = filename.split('.')[-1].lower()
-            if ext in ['jpg', 'jpeg', 'png', 'webp', 'gif']:
+            if ext in ['jpg', 'jpeg', 'png', 'webp', 'avif', 'gif']:
                 return ext
 
         # Default to webp as specified in README
@@ -208,7 +387,8 @@ class ProductParser:
         images = raw_content.get('images', [])
         if images:
             # Take first few images
-            product_data['images'] = [img['src'] for img in images[:5] if img.get('src')]
+            # Sized srcset/<picture> variant instead of whatever src the theme set
+            product_data['images'] = [select_image_variant(img) for img in images[:5] if img.get('src')]
 
         # Try to extract price from text content
         text_content = raw_content.get('text_content', '')
@@ -0,0 +1,123 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .deepseek_client import DeepSeekClient, parse_json_reply
+import config
+
+class LLMURLFilter:
+    """Classifies URL lists with concurrent DeepSeek calls over token-sized chunks"""
+
+    def __init__(self, ai_client=None, max_workers=None, chunk_tokens=None, max_retries=None):
+        self.ai_client = ai_client or DeepSeekClient()
+        self.max_workers = max_workers or config.LLM_FILTER_WORKERS
+        self.chunk_tokens = chunk_tokens or config.LLM_FILTER_CHUNK_TOKENS
+        self.max_retries = max_retries if max_retries is not None else config.LLM_FILTER_RETRIES
+
+    def filter_urls(self, urls, progress=None):
+        """Return product URLs from the whole list, in sitemap order"""
+        results = {}
+        for start, product_urls in self.iter_chunks(urls, progress):
+            results[start] = product_urls
+
+        filtered_urls = []
+        for start in sorted(results):
+            filtered_urls.extend(results[start])
+        return filtered_urls
+
+    def iter_chunks(self, urls, progress=None):
+        """Yield (chunk start index, product URLs) as each chunk is classified
+
+        progress, if given, is called with (chunks done, total chunks).
+        """
+        chunks = self.chunk(urls)
+        print(f"DEBUG: Classifying {len(urls)} URLs in {len(chunks)} chunks")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._classify_chunk, chunk): start for start, chunk in chunks}
+            for done, future in enumerate(as_completed(futures), 1):
+                if progress:
+                    progress(done, len(chunks))
+                yield futures[future], future.result()
+
+    def chunk(self, urls):
+        """Split URLs into (start index, chunk) pieces of roughly chunk_tokens each"""
+        chunks = []
+        current = []
+        tokens = 0
+        start = 0
+
+        for i, url in enumerate(urls):
+            # ~4 characters per token, plus the line number and newline
+            url_tokens = len(url) // 4 + 3
+            if current and tokens + url_tokens > self.chunk_tokens:
+                chunks.append((start, current))
+                current, tokens, start = [], 0, i
+            current.append(url)
+            tokens += url_tokens
+
+        if current:
+            chunks.append((start, current))
+        return chunks
+
+    def _classify_chunk(self, urls):
+        """Classify one chunk, retrying with backoff; returns its product URLs
+
+        A chunk that still fails after the retries is returned unfiltered:
+        crawling a few non-product pages is cheaper than losing products.
+        """
+        url_list = '\n'.join(f'{i}. {url}' for i, url in enumerate(urls, 1))
+        prompt = f"""
+You are an expert at identifying product pages on e-commerce websites.
+
+Given the following numbered list of URLs from a sitemap, identify which ones are likely PRODUCT pages (individual items for sale).
+
+Exclude:
+- Homepage (/)
+- Collection/category pages (/collections/)
+- Static pages (/pages/)
+- Blog pages (/blogs/)
+- Any other non-product pages
+
+Return ONLY a JSON array with the numbers of the product URLs, like: [1, 4, 5]
+
+URL LIST:
+{url_list}
+"""
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.ai_client.client.chat.completions.create(
+                    model=self.ai_client.model,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": "You are a helpful assistant that filters product URLs from a list. Return only valid JSON arrays."
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    temperature=0.1,
+                    max_tokens=min(8000, len(urls) * 5 + 50),
+                    timeout=config.LLM_FILTER_TIMEOUT
+                )
+
+                numbers = parse_json_reply(response.choices[0].message.content, '[', ']')
+                if not isinstance(numbers, list):
+                    raise ValueError("reply is not a JSON array")
+
+                indexes = set()
+                for n in numbers:
+                    try:
+                        indexes.add(int(n))
+                    except (TypeError, ValueError):
+                        continue
+                return [urls[n - 1] for n in sorted(indexes) if 1 <= n <= len(urls)]
+
+            except Exception as e:
+                print(f"AI filtering error (attempt {attempt + 1}): {e}")
+                if attempt < self.max_retries:
+                    time.sleep(2 ** attempt)
+
+        print(f"AI filtering failed for a chunk, keeping all {len(urls)} of its URLs unfiltered")
+        return list(urls)
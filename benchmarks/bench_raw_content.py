@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark: RawContentExtractor single-pass lxml engine vs. the BeautifulSoup engine,
+plus the head-only JSON-LD/meta scan and the budgeted lazy text read
+
+Usage: python benchmarks/bench_raw_content.py [page_count | page.html ...]
+"""
+
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractor.raw_content import RawContentExtractor
+
+def generate_page(i, rng):
+    """Product page shaped like a typical storefront theme: big head, nav, scripts, grid"""
+    product = {"@context": "https://schema.org", "@type": "Product", "name": f"Product {i}",
+               "offers": {"@type": "Offer", "price": f"{rng.randint(5, 500)}.00", "priceCurrency": "EUR"}}
+    nav = ''.join(f'<li><a href="/collections/c{n}">Category {n}</a>'
+                  f'<ul>{"".join(f"<li><a href=/c{n}/{m}>Sub {m}</a></li>" for m in range(8))}</ul></li>'
+                  for n in range(12))
+    scripts = ''.join(f'<script>window.theme_{n} = {json.dumps({"k": "v" * 200})};</script>' for n in range(20))
+    grid = ''.join(f'<div class="card"><img data-src="/img/{i}-{n}.jpg" alt="Related {n}">'
+                   f'<h3>Related &amp; product {n}</h3><span class="price">&euro;{n}.99</span></div>'
+                   for n in range(24))
+    description = ' '.join(f'<p>Paragraph {n} with <b>bold</b> and&nbsp;<i>italic</i> text.</p>' for n in range(30))
+    return f"""<!DOCTYPE html><html><head><meta charset="utf-8"><title>Product {i} | Shop</title>
+<meta property="og:title" content="Product {i}"><meta name="description" content="Product {i} description">
+<style>{'.x{color:red}' * 300}</style>{scripts}
+<script type="application/ld+json">{json.dumps(product)}</script></head>
+<body><header><nav><ul>{nav}</ul></nav></header><main><h1>Product {i}</h1>
+<picture><source type="image/webp" srcset="/img/{i}-800.webp 800w, /img/{i}-1600.webp 1600w">
+<img src="/img/{i}.jpg" srcset="/img/{i}-800.jpg 800w, /img/{i}-1600.jpg 1600w" alt="Product {i}"></picture><h2>Description</h2>{description}
+<section><h2>You may also like</h2>{grid}</section></main><footer><!-- footer -->&copy; Shop</footer></body></html>"""
+
+def main():
+    args = sys.argv[1:]
+    if args and not args[0].isdigit():
+        pages = []
+        for path in args:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                pages.append(f.read())
+    else:
+        count = int(args[0]) if args else 200
+        rng = random.Random(42)
+        pages = [generate_page(i, rng) for i in range(count)]
+
+    soup_extractor = RawContentExtractor(engine='soup', mode='full')
+    lxml_extractor = RawContentExtractor(engine='lxml', mode='full')
+    head_extractor = RawContentExtractor(mode='head')
+
+    start = time.perf_counter()
+    soup_results = [dict(soup_extractor.extract_content(page)) for page in pages]
+    soup_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lxml_results = [dict(lxml_extractor.extract_content(page)) for page in pages]
+    lxml_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    head_results = [head_extractor.extract_head(page) for page in pages]
+    head_time = time.perf_counter() - start
+    head_fields = ('title', 'structured_data')
+    head_identical = all(head[field] == full[field] for head, full in zip(head_results, lxml_results)
+                         for field in head_fields)
+
+    start = time.perf_counter()
+    prompt_texts = [lxml_extractor.extract_content(page).text(1500) for page in pages]
+    prompt_time = time.perf_counter() - start
+    prompt_identical = all(text == full['text_content'][:1500] for text, full in zip(prompt_texts, lxml_results))
+
+    size_mb = sum(len(page) for page in pages) / 1024 / 1024
+    print(f"Pages extracted: {len(pages)} ({size_mb:.1f} MB)")
+    print(f"BeautifulSoup: {soup_time:.2f}s ({soup_time / len(pages) * 1000:.1f} ms/page)")
+    print(f"lxml:          {lxml_time:.2f}s ({lxml_time / len(pages) * 1000:.1f} ms/page)")
+    print(f"Speedup:       {soup_time / lxml_time:.1f}x")
+    print(f"Identical results: {soup_results == lxml_results}")
+    print(f"Head-only scan: {head_time:.3f}s ({head_time / len(pages) * 1000000:.0f} us/page, "
+          f"{lxml_time / head_time:.0f}x faster than lxml)")
+    print(f"Head-only title/JSON-LD identical: {head_identical}")
+    print(f"Lazy text(1500): {prompt_time:.3f}s ({prompt_time / len(pages) * 1000:.2f} ms/page), "
+          f"identical prefix: {prompt_identical}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark: URLFilter compiled matcher vs. the previous per-URL urlparse/loop check
+
+Usage: python benchmarks/bench_url_filter.py [url_count]
+"""
+
+import os
+import random
+import sys
+import time
+from urllib.parse import urlparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawler.filters import URLFilter, SKIP_EXTENSIONS, SKIP_PATTERNS
+
+BASE_URL = "https://shop.example.com"
+
+def legacy_is_valid_url(url, base_domain):
+    """The pre-compilation URLFilter._is_valid_url, kept for comparison"""
+    try:
+        parsed = urlparse(url)
+        if parsed.netloc != base_domain:
+            return False
+        if parsed.scheme not in ['http', 'https']:
+            return False
+        path = parsed.path.lower()
+        if any(path.endswith(ext) for ext in SKIP_EXTENSIONS):
+            return False
+        for pattern in SKIP_PATTERNS:
+            if pattern in path:
+                return False
+        return True
+    except Exception:
+        return False
+
+def generate_urls(count, seed=42):
+    """Mixed multi-site sitemap dump: products, collections, assets, other hosts"""
+    rng = random.Random(seed)
+    hosts = ["shop.example.com"] * 8 + ["other-store.com", "cdn.example.com"]
+    sections = ["products", "collections", "pages", "blogs/news", "de/products", "cart",
+                "account", "assets", "search", "images"]
+    suffixes = ["", "", "", ".jpg", ".css", ".html", "/", "?variant=123", ".js?v=2"]
+    urls = []
+    for i in range(count):
+        scheme = "https" if rng.random() < 0.95 else "ftp"
+        urls.append(f"{scheme}://{rng.choice(hosts)}/{rng.choice(sections)}/item-{i}{rng.choice(suffixes)}")
+    return urls
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    urls = generate_urls(count)
+    url_filter = URLFilter(BASE_URL, rules={})
+    base_domain = url_filter.base_domain
+
+    start = time.perf_counter()
+    legacy = [url for url in urls if legacy_is_valid_url(url, base_domain)]
+    legacy_time = time.perf_counter() - start
+
+    match = url_filter._matcher.match
+    start = time.perf_counter()
+    compiled = [url for url in urls if match(url)]
+    compiled_time = time.perf_counter() - start
+
+    print(f"URLs classified: {count}")
+    print(f"Legacy:   {legacy_time:.2f}s ({count / legacy_time:,.0f} URLs/s)")
+    print(f"Compiled: {compiled_time:.2f}s ({count / compiled_time:,.0f} URLs/s)")
+    print(f"Speedup:  {legacy_time / compiled_time:.1f}x")
+    print(f"Identical results: {legacy == compiled} ({len(compiled)} kept)")
+
+if __name__ == "__main__":
+    main()
@@ -2,3 +2,66 @@ DEEPSEEK_API_KEY = "sk-f3a244a781a043468f189dd2f23bdf3e"
 DEEPSEEK_MODEL = "deepseek-chat"
 REQUEST_TIMEOUT = 30
 MAX_PAGES = 10000
+FETCH_POOL_SIZE = 4
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/128.0 Safari/537.36"
+HTTP_FETCH_WORKERS = 16
+TIER_PROBE_PAGES = 3
+FETCH_TIERS_FILE = "output/fetch_tiers.json"
+FETCH_TIER_MAX_AGE_HOURS = 24 * 7  # a host's HTTP/browser tier is probed again after this
+BLOCKED_RESOURCE_TYPES = ["image", "media", "font", "stylesheet"]
+THIRD_PARTY_BLOCKED_TYPES = ["script", "websocket", "eventsource"]
+PLATFORM_CDN_HOSTS = ["cdn.shopify.com", "cdn.shopifycdn.net", "cdn11.bigcommerce.com",
+                      "static.parastorage.com", "assets.squarespace.com"]  # third-party hosts always allowed
+SITE_ALLOWED_REQUESTS = {}  # e.g. {"shop.example.com": ["widgets.example-cdn.com/product.js"]}
+PAGE_CACHE_PATH = "output/page_cache.sqlite3"
+PAGE_CACHE_MAX_MB = 1024
+RATE_LIMIT_INITIAL = 2.0  # requests per second per host
+RATE_LIMIT_MIN = 0.2
+RATE_LIMIT_MAX = 20.0
+RATE_LIMIT_INCREASE = 0.25  # additive increase per fast response
+RATE_LIMIT_SLOW_SECONDS = 5.0  # responses slower than this count as back-pressure
+RATE_LIMIT_MAX_RETRY_AFTER = 120
+SITEMAP_WORKERS = 8
+SITEMAP_QUEUE_SIZE = 10000
+URL_STATE_PATH = "output/url_state.sqlite3"
+TRACKING_QUERY_PARAMS = ["utm_*", "gclid", "gbraid", "wbraid", "fbclid", "msclkid", "yclid", "mc_cid", "mc_eid",
+                         "_ga", "_gl", "ref", "ref_", "srsltid", "_pos", "_sid", "_ss", "_psq", "_kx"]
+LOCALE_CODES = ["en", "de", "fr", "es", "it", "nl", "pt", "pl", "ru", "uk", "sv", "da", "fi", "no", "nb",
+                "cs", "sk", "hu", "ro", "bg", "el", "tr", "ja", "zh", "ko", "ar", "he", "et", "lv", "lt",
+                "sl", "hr", "sr"]
+LOCALE_PATH_PATTERNS = []  # extra regexes for locale path prefixes, e.g. r"/intl/[a-z]{2}"
+LOCALE_QUERY_PARAMS = ["lang", "language", "locale"]
+URL_FILTER_RULES = {}  # e.g. {"shop.example.com": {"skip_patterns": ["/lookbook"], "allow_patterns": ["/products/"]}}
+URL_FILTER_RULES_FILE = None  # optional JSON file with the same {domain: rules} shape
+URL_CLASSIFIER_USE_LLM = True  # label clusters that path keywords can't explain with one small LLM call
+URL_CLASSIFIER_LITERAL_SHARE = 0.02  # a segment stays literal if this share of its group uses it
+URL_CLASSIFIER_SAMPLES = 5
+URL_CLASSIFIER_MAX_LLM_CLUSTERS = 50
+URL_FILTER_MODE = "clusters"  # "clusters" (path-template classifier) or "llm" (chunked DeepSeek filtering)
+LLM_FILTER_WORKERS = 8
+LLM_FILTER_CHUNK_TOKENS = 6000
+LLM_FILTER_RETRIES = 2
+LLM_FILTER_TIMEOUT = 120
+FRONTIER_WEIGHTS = {"product": 4.0, "priority": 1.0, "recency": 1.0, "novelty": 2.0}
+FRONTIER_RECENCY_HALF_LIFE_DAYS = 30
+EXTRACTOR_ENGINE = "lxml"  # "lxml" (single pass) or "soup" (BeautifulSoup reference implementation)
+EXTRACTOR_MODE = "head"  # "head" (title/JSON-LD/meta scan; full extraction unless it finds a Product) or "full"
+EXTRACTION_WORKERS = None  # extraction processes; None = one per CPU core
+EXTRACTION_PENDING_PER_WORKER = 4  # pages queued per process before fetching pauses
+EXTRACTION_MAX_RESTARTS = 3  # pool rebuilds after worker crashes before extracting in-process
+CAPTURE_JSON = False  # record product JSON (XHR/fetch) responses while rendering pages
+CAPTURE_JSON_PATTERNS = [
+    r"/products/[^/?#\s]+\.js(?:[?#\s]|$)",  # Shopify product JSON
+    r"graphql\S*[\s?].*(?:\b|%[0-9A-Fa-f]{2})products?\b",  # GraphQL queries mentioning product(s)
+]
+CAPTURE_JSON_MAX_BYTES = 2 * 1024 * 1024
+CAPTURE_JSON_WAIT_SECONDS = 5
+PLATFORM_BULK_CATALOG = True  # read Shopify/WooCommerce catalogs through their public APIs when available
+PLATFORM_MAX_API_PAGES = 400
+IMAGE_DOWNLOAD_WORKERS = 16
+IMAGE_DOWNLOADS_PER_HOST = 6  # concurrent downloads (and pooled connections) per image host
+MAX_IMAGE_BYTES = 20 * 1024 * 1024  # larger images are skipped mid-download
+IMAGE_INDEX_PATH = "output/image_index.sqlite3"  # image URL -> content-addressed object
+IMAGE_REVALIDATE = True  # recheck stored image URLs once per run with If-None-Match/If-Modified-Since
+IMAGE_TARGET_WIDTH = 1200  # smallest srcset/<picture> variant at least this wide is downloaded
+IMAGE_PREFERRED_FORMATS = ["avif", "webp"]  # preferred among variants wide enough, in order
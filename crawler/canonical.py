@@ -0,0 +1,88 @@
+import re
+from urllib.parse import urlsplit, urlunsplit, unquote_plus
+import config
+
+class URLCanonicalizer:
+    """Normalizes URLs and collapses locale variants of the same page before fetching"""
+
+    def __init__(self, locale_codes=None, locale_patterns=None, tracking_params=None):
+        codes = locale_codes if locale_codes is not None else config.LOCALE_CODES
+        patterns = list(locale_patterns if locale_patterns is not None else config.LOCALE_PATH_PATTERNS)
+        if codes:
+            # /de/..., /en-gb/..., /pt_BR/...
+            patterns.append(r'/(?:' + '|'.join(map(re.escape, codes)) + r')(?:[-_][a-z]{2})?(?=/|$)')
+        self.locale_regex = re.compile(r'^(?:' + '|'.join(patterns) + r')', re.IGNORECASE) if patterns else None
+
+        params = tracking_params if tracking_params is not None else config.TRACKING_QUERY_PARAMS
+        self.tracking_params = {param.lower() for param in params if not param.endswith('*')}
+        self.tracking_prefixes = tuple(param[:-1].lower() for param in params if param.endswith('*'))
+        self.locale_params = {param.lower() for param in config.LOCALE_QUERY_PARAMS}
+
+    def canonicalize(self, url):
+        """Normalize scheme/host case, default ports, slashes, fragments and tracking params"""
+        parts = urlsplit(url.strip())
+        scheme = parts.scheme.lower()
+        host = (parts.hostname or '').lower()
+        if parts.port and (scheme, parts.port) not in (('http', 80), ('https', 443)):
+            host = f"{host}:{parts.port}"
+
+        path = re.sub(r'/{2,}', '/', parts.path) or '/'
+        if len(path) > 1:
+            path = path.rstrip('/') or '/'
+
+        # Raw key=value pairs are filtered and sorted, never re-encoded, so
+        # %20 stays %20 and a bare ?flag keeps its form
+        query = sorted(pair for pair in parts.query.split('&')
+                       if pair and not self._is_tracking_param(unquote_plus(pair.split('=', 1)[0])))
+
+        return urlunsplit((scheme, host, path, '&'.join(query), ''))
+
+    def dedupe_key(self, url):
+        """Key shared by all scheme/www/locale variants of a canonical URL"""
+        parts = urlsplit(url)
+        host = parts.netloc
+        if host.startswith('www.'):
+            host = host[4:]
+
+        path = parts.path
+        if self.locale_regex:
+            path = self.locale_regex.sub('', path, count=1) or '/'
+
+        query = '&'.join(pair for pair in parts.query.split('&')
+                         if pair and pair.split('=', 1)[0].lower() not in self.locale_params)
+        return f"{host}{path}?{query}"
+
+    def is_locale_variant(self, url):
+        """Check whether a canonical URL carries a locale path prefix or query param"""
+        parts = urlsplit(url)
+        if self.locale_regex and self.locale_regex.match(parts.path):
+            return True
+        return any(pair.split('=', 1)[0].lower() in self.locale_params
+                   for pair in parts.query.split('&') if pair)
+
+    def dedupe(self, urls):
+        """Canonicalize URLs and keep one per page, preferring the default-locale variant"""
+        return self._dedupe(urls, lambda url: url, lambda url, new_url: new_url)
+
+    def dedupe_entries(self, entries):
+        """Like dedupe() for sitemap entries; returned entries carry the canonical URL"""
+        return self._dedupe(entries, lambda entry: entry.url, lambda entry, new_url: entry._replace(url=new_url))
+
+    def _dedupe(self, items, get_url, with_url):
+        # Dicts keep first-seen order; a later default-locale variant replaces
+        # a locale variant in place
+        chosen = {}
+        for item in items:
+            url = self.canonicalize(get_url(item))
+            key = self.dedupe_key(url)
+            current = chosen.get(key)
+            if current is None or (self.is_locale_variant(get_url(current)) and not self.is_locale_variant(url)):
+                chosen[key] = with_url(item, url)
+
+        result = list(chosen.values())
+        print(f"DEBUG: Canonicalized to {len(result)} unique pages")
+        return result
+
+    def _is_tracking_param(self, key):
+        key = key.lower()
+        return key in self.tracking_params or key.startswith(self.tracking_prefixes)
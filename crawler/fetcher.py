@@ -1,17 +1,104 @@
-from playwright.sync_api import sync_playwright
+import asyncio
+import json
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from functools import partial
+from urllib.parse import urlparse
+from playwright.async_api import async_playwright
+from crawler.rate_limiter import get_rate_limiter
+from crawler.request_policy import RequestPolicy, RequestStats
 import config
 
 class PageFetcher:
     """Fetches page content using Playwright"""
 
-    def __init__(self):
+    def __init__(self, pool_size=None, request_policy=None, rate_limiter=None, capture_patterns=None):
+        # Number of browser contexts/pages kept alive and rendered concurrently
+        self.pool_size = pool_size or config.FETCH_POOL_SIZE
+        self.request_policy = request_policy or RequestPolicy()
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        # Request totals across all pages; per-page stats live in _page_state
+        self.request_stats = RequestStats()
+        self._page_state = {}
+        # url -> (ETag, Last-Modified) of the rendered document, for caching
+        self.validators = {}
+        # url -> JSON bodies of responses matching capture_patterns (opt-in);
+        # consumers pop entries as they parse pages
+        self.captured_json = {}
+        self._capture_regex = None
+        if capture_patterns:
+            self._capture_regex = re.compile('|'.join(f'(?:{pattern})' for pattern in capture_patterns))
         self.playwright = None
         self.browser = None
+        self._loop = None
+        self._thread = None
+        self._idle_pages = None
 
     def __enter__(self):
-        self.playwright = sync_playwright().start()
+        # Playwright runs on its own event loop thread so that the pooled pages
+        # can render concurrently while callers keep using a plain sync API
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        try:
+            self._run(self._start())
+        except Exception:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.request_stats.allowed or self.request_stats.blocked:
+            print(f"DEBUG: Page subresources: {self.request_stats.summary()}")
+        if self._loop:
+            try:
+                self._run(self._stop())
+            finally:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join()
+                self._loop.close()
+                self._loop = None
+
+    def fetch_page(self, url):
+        """Fetch page content with full rendering"""
+        return self._run(self._fetch(url))
+
+    def fetch_many(self, urls):
+        """Fetch pages concurrently, yielding (url, html_content) as they complete
+
+        URLs are pulled from the iterable lazily, so at most a couple of pages
+        per pool slot are queued at any time. html_content is None on failure.
+        """
+        url_iter = iter(urls)
+        exhausted = object()
+        max_in_flight = self.pool_size * 2
+        pending = {}
+
+        while True:
+            while len(pending) < max_in_flight:
+                url = next(url_iter, exhausted)
+                if url is exhausted:
+                    break
+                future = asyncio.run_coroutine_threadsafe(self._fetch(url), self._loop)
+                pending[future] = url
+
+            if not pending:
+                return
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+
+    def _run(self, coro):
+        """Run a coroutine on the fetcher loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def _start(self):
+        self.playwright = await async_playwright().start()
         # Use system Chromium with new headless mode
-        self.browser = self.playwright.chromium.launch(
+        self.browser = await self.playwright.chromium.launch(
             executable_path="/usr/bin/chromium",  # System Chromium path
             args=[
                 '--headless=new',  # Use new headless mode
@@ -20,36 +107,132 @@ class PageFetcher:
                 '--disable-gpu'
             ]
         )
-        return self
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._idle_pages = asyncio.Queue()
+        for _ in range(self.pool_size):
+            self._idle_pages.put_nowait(await self._new_page())
+
+    async def _stop(self):
         if self.browser:
-            self.browser.close()
+            await self.browser.close()
+            self.browser = None
         if self.playwright:
-            self.playwright.stop()
+            await self.playwright.stop()
+            self.playwright = None
 
-    def fetch_page(self, url):
-        """Fetch page content with full rendering"""
+    async def _new_page(self):
+        """Create a page in its own browser context"""
+        context = await self.browser.new_context()
+        page = await context.new_page()
+
+        # Block subresources the policy does not need for faster loading
+        await page.route("**/*", partial(self._handle_route, page))
+        page.on("response", partial(self._on_response, page))
+
+        return page
+
+    async def _handle_route(self, page, route):
+        request = route.request
+        state = self._page_state.get(page)
+        page_host = state['host'] if state else urlparse(page.url).hostname
+
+        if self.request_policy.should_block(request.url, request.resource_type, page_host):
+            if state:
+                state['stats'].blocked += 1
+                state['stats'].bytes_saved += self.request_policy.estimated_size(request.resource_type)
+            await route.abort()
+        else:
+            if state:
+                state['stats'].allowed += 1
+            await route.continue_()
+
+    def _on_response(self, page, response):
+        state = self._page_state.get(page)
+        if state:
+            try:
+                state['stats'].allowed_bytes += int(response.headers.get('content-length', 0))
+            except ValueError:
+                pass
+
+            if self._capture_regex:
+                # Patterns see the URL plus the request body, e.g. a GraphQL query
+                if self._capture_regex.search(f"{response.url} {self._post_body(response.request)}"):
+                    state['captures'].append(asyncio.ensure_future(self._capture_json(response, state)))
+
+    @staticmethod
+    def _post_body(request):
+        """Request body as text for capture matching; post_data raises on binary bodies"""
         try:
-            page = self.browser.new_page()
+            body = request.post_data_buffer
+        except Exception:
+            return ''
+        return body.decode('utf-8', errors='replace') if body else ''
 
-            # Block analytics and ads for faster loading
-            page.route("**/*", lambda route: route.abort() if any(
-                pattern in route.request.url for pattern in [
-                    "google-analytics.com", "googletagmanager.com",
-                    "facebook.com/tr", "doubleclick.net", "hotjar.com"
-                ]
-            ) else route.continue_())
+    async def _capture_json(self, response, state):
+        try:
+            if not response.ok:
+                return
+            body = await response.body()
+            if len(body) > config.CAPTURE_JSON_MAX_BYTES:
+                return
+            state['json'].append(json.loads(body))
+        except Exception as e:
+            # Not JSON, or the page navigated away before the body arrived
+            print(f"DEBUG: Could not capture {response.url}: {e}")
+
+    async def _fetch(self, url):
+        """Render a single URL on the next idle pooled page"""
+        page = await self._idle_pages.get()
+        stats = RequestStats()
+        self._page_state[page] = {'host': urlparse(url).hostname, 'stats': stats, 'captures': [], 'json': []}
+        start = None
+        try:
+            delay = self.rate_limiter.reserve(url)
+            if delay > 0:
+                await asyncio.sleep(delay)
 
             # Navigate and wait for DOM content loaded
-            page.goto(url, wait_until="domcontentloaded", timeout=config.REQUEST_TIMEOUT * 1000)
+            start = time.monotonic()
+            response = await page.goto(url, wait_until="domcontentloaded", timeout=config.REQUEST_TIMEOUT * 1000)
+            self.rate_limiter.record(url, response.status if response else 200, time.monotonic() - start)
+            if response:
+                self.validators[url] = (response.headers.get('etag'), response.headers.get('last-modified'))
+
+            state = self._page_state[page]
+            if self._capture_regex and not state['captures']:
+                # Headless themes request product JSON after DOMContentLoaded
+                try:
+                    await page.wait_for_load_state('networkidle', timeout=config.CAPTURE_JSON_WAIT_SECONDS * 1000)
+                except Exception:
+                    pass
 
             # Get full HTML content
-            html_content = page.content()
+            html_content = await page.content()
+
+            if state['captures']:
+                # Let bodies of matching responses finish downloading
+                await asyncio.wait(state['captures'], timeout=config.CAPTURE_JSON_WAIT_SECONDS)
+            if state['json']:
+                self.captured_json[url] = list(state['json'])
+                print(f"DEBUG: Captured {len(state['json'])} JSON responses for {url}")
 
-            page.close()
             return html_content
 
         except Exception as e:
             print(f"Error fetching {url}: {e}")
+            if start is not None:
+                self.rate_limiter.record(url, None, time.monotonic() - start)
             return None
+
+        finally:
+            del self._page_state[page]
+            self.request_stats.add(stats)
+            print(f"DEBUG: {url} subresources: {stats.summary()}")
+
+            if page.is_closed():
+                # Replace crashed pages so the pool keeps its size
+                try:
+                    page = await self._new_page()
+                except Exception as e:
+                    print(f"Error replacing pooled page: {e}")
+            self._idle_pages.put_nowait(page)
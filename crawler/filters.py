@@ -1,77 +1,98 @@
+import json
+import re
 from urllib.parse import urlparse
 import config
 
+# File extensions of non-page resources (images, scripts, etc.)
+SKIP_EXTENSIONS = ['.jpg', '.png', '.gif', '.svg', '.ico', '.css', '.js', '.pdf', '.zip', '.woff', '.woff2', '.ttf', '.eot']
+
+# Very specific non-content paths
+SKIP_PATTERNS = [
+    '/cart', '/checkout', '/account', '/login', '/register',
+    '/search', '/admin', '/wp-admin', '/api/', '/cdn-',
+    '/javascript', '/css', '/images/', '/fonts/', '/assets/',
+    '/ajax', '/json', '/xml', '/rss', '/feed'
+]
+
 class URLFilter:
-    """Filters URLs to keep only relevant pages"""
+    """Filters URLs to keep only relevant pages
+
+    All rules are compiled into a single anchored regex, so each URL is
+    classified in one pass without urlparse. Sites can extend the default
+    rules through config.URL_FILTER_RULES or a JSON rules file.
+    """
 
-    def __init__(self, base_url):
+    def __init__(self, base_url, rules=None):
         self.base_domain = urlparse(base_url).netloc
         self.base_url = base_url.rstrip('/')
+        self.rules = rules if rules is not None else self.load_site_rules(self.base_domain)
+        self._matcher = self._compile(self.rules)
 
     def filter_urls(self, urls):
         """Filter URLs to keep only relevant pages"""
         filtered_urls = []
-        skipped_count = 0
+        path_counts = {}
+        match = self._matcher.match
 
         for url in urls:
-            if self._is_valid_url(url):
+            m = match(url)
+            if m:
                 filtered_urls.append(url)
-            else:
-                skipped_count += 1
-
-        print(f"DEBUG: Total URLs: {len(urls)}, Filtered: {len(filtered_urls)}, Skipped: {skipped_count}")
-
-        # Show sample of filtered URLs by path type
-        path_counts = {}
-        for url in filtered_urls[:100]:  # Sample first 100
-            try:
-                path = urlparse(url).path
-                if '/' in path:
-                    path_type = path.split('/')[1] if len(path.split('/')) > 1 else 'root'
-                else:
-                    path_type = 'root'
+                # Count path types in the same pass (first path segment)
+                path_type = m.group('section') if m.group('slash') else 'root'
                 path_counts[path_type] = path_counts.get(path_type, 0) + 1
-            except:
-                pass
 
+        print(f"DEBUG: Total URLs: {len(urls)}, Filtered: {len(filtered_urls)}, Skipped: {len(urls) - len(filtered_urls)}")
         print(f"DEBUG: Path type counts: {path_counts}")
 
-        # Limit to MAX_PAGES
-        return filtered_urls[:config.MAX_PAGES]
+        # The MAX_PAGES budget is applied by CrawlFrontier in priority order
+        return filtered_urls
 
     def _is_valid_url(self, url):
         """Check if URL is valid for crawling"""
-        try:
-            parsed = urlparse(url)
-
-            # Must have same domain
-            if parsed.netloc != self.base_domain:
-                return False
-
-            # Must be HTTP/HTTPS
-            if parsed.scheme not in ['http', 'https']:
-                return False
-
-            # Skip file extensions (images, scripts, etc.)
-            path = parsed.path.lower()
-            if any(path.endswith(ext) for ext in ['.jpg', '.png', '.gif', '.svg', '.ico', '.css', '.js', '.pdf', '.zip', '.woff', '.woff2', '.ttf', '.eot']):
-                return False
-
-            # Skip very specific non-content paths
-            skip_patterns = [
-                '/cart', '/checkout', '/account', '/login', '/register',
-                '/search', '/admin', '/wp-admin', '/api/', '/cdn-',
-                '/javascript', '/css', '/images/', '/fonts/', '/assets/',
-                '/ajax', '/json', '/xml', '/rss', '/feed'
-            ]
-
-            # Skip if matches skip patterns
-            for pattern in skip_patterns:
-                if pattern in path:
-                    return False
-
-            # Allow all other URLs from the same domain (be very permissive for sitemap URLs)
-            return True
-
-        except Exception:
-            return False
+        return self._matcher.match(url) is not None
+
+    @staticmethod
+    def load_site_rules(domain, rules_file=None):
+        """Rules for a site from config.URL_FILTER_RULES and the optional JSON rules file, concatenated per key"""
+        site_rules = {key: list(values) for key, values in config.URL_FILTER_RULES.get(domain, {}).items()}
+
+        rules_file = rules_file or config.URL_FILTER_RULES_FILE
+        if rules_file:
+            try:
+                with open(rules_file, 'r', encoding='utf-8') as f:
+                    file_rules = json.load(f).get(domain, {})
+            except (OSError, ValueError) as e:
+                print(f"Error loading URL filter rules from {rules_file}: {e}")
+                file_rules = {}
+            # Both sources extend the defaults, so lists under the same key add up
+            for key, values in file_rules.items():
+                site_rules.setdefault(key, []).extend(values)
+
+        return site_rules
+
+    def _compile(self, rules):
+        """Build one regex: same host, http(s), not a skipped path unless allowed
+
+        Site rules extend the defaults: skip_extensions and skip_patterns add
+        rejections, allow_patterns are path substrings that override them.
+        """
+        extensions = SKIP_EXTENSIONS + list(rules.get('skip_extensions', []))
+        patterns = SKIP_PATTERNS + list(rules.get('skip_patterns', []))
+        allow_patterns = list(rules.get('allow_patterns', []))
+
+        skip = '|'.join(
+            [re.escape(pattern.lower()) for pattern in patterns] +
+            [re.escape(ext.lower()) + r'(?=[?#]|$)' for ext in extensions]
+        )
+        path_check = rf'(?![^?#]*?(?:{skip}))'
+        if allow_patterns:
+            allow = '|'.join(re.escape(pattern.lower()) for pattern in allow_patterns)
+            path_check = rf'(?:(?=[^?#]*?(?:{allow}))|{path_check})'
+
+        return re.compile(
+            rf'https?://{re.escape(self.base_domain)}(?=[/?#]|$)'
+            rf'{path_check}'
+            r'(?P<slash>/?)(?P<section>[^/?#]*)',
+            re.IGNORECASE
+        )
@@ -0,0 +1,119 @@
+import heapq
+import itertools
+import queue
+import threading
+import time
+import config
+
+# Product likelihood of each URL classifier label
+LABEL_SCORES = {
+    'product': 1.0,
+    'unknown': 0.5,
+    'collection': 0.2,
+    'other': 0.0
+}
+
+class CrawlFrontier:
+    """Priority queue of URLs to fetch, best first
+
+    Each URL is scored from its product likelihood (classifier label),
+    sitemap <priority>, <lastmod> recency and novelty (never extracted
+    before), weighted by config.FRONTIER_WEIGHTS. Fetch workers pull URLs
+    in score order, so a MAX_PAGES budget is spent on the most valuable
+    pages first. Safe to use from several threads.
+
+    A producer may keep adding URLs while a consumer pulls them with get(),
+    like a queue.Queue closed by close(); get() hands out at most limit URLs.
+    """
+
+    def __init__(self, weights=None, now=None, limit=None):
+        self.weights = dict(config.FRONTIER_WEIGHTS, **(weights or {}))
+        self.now = now or time.time()
+        self.limit = limit
+        self._heap = []
+        self._seen = set()
+        self._counter = itertools.count()  # FIFO among equal scores
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._handed_out = 0
+        self._closed = False
+
+    def __len__(self):
+        with self._lock:
+            return len(self._heap)
+
+    def add(self, url, label='unknown', priority=None, lastmod=None, extracted=False):
+        """Queue a URL once; returns False if it was already added"""
+        score = self.score(label, priority, lastmod, extracted)
+        with self._lock:
+            if url in self._seen:
+                return False
+            self._seen.add(url)
+            heapq.heappush(self._heap, (-score, next(self._counter), url))
+            self._not_empty.notify()
+        return True
+
+    def add_entries(self, entries, labels=None, extracted_urls=None):
+        """Queue sitemap entries; labels maps URL -> classifier label"""
+        labels = labels or {}
+        extracted_urls = extracted_urls or set()
+        for entry in entries:
+            self.add(entry.url, labels.get(entry.url, 'unknown'), entry.priority,
+                     entry.lastmod, entry.url in extracted_urls)
+
+    def pop(self):
+        """Highest-scoring URL, or None when the frontier is empty"""
+        with self._lock:
+            if not self._heap:
+                return None
+            return heapq.heappop(self._heap)[2]
+
+    def get(self, block=True):
+        """Best URL for a streaming consumer, or None once closed and empty or at the limit
+
+        Without block, raises queue.Empty while the producer may still add URLs.
+        """
+        with self._not_empty:
+            while True:
+                if self.limit is not None and self._handed_out >= self.limit:
+                    return None
+                if self._heap:
+                    self._handed_out += 1
+                    return heapq.heappop(self._heap)[2]
+                if self._closed:
+                    return None
+                if not block:
+                    raise queue.Empty
+                self._not_empty.wait()
+
+    def close(self):
+        """No more URLs will be added; get() returns None once the rest are taken"""
+        with self._not_empty:
+            self._closed = True
+            self._not_empty.notify_all()
+
+    def drain(self, limit=None):
+        """Yield URLs in priority order, at most limit of them
+
+        URLs are popped lazily, so a consumer such as TieredFetcher.fetch_many
+        always takes the best URL left when a worker frees up.
+        """
+        for _ in itertools.repeat(None) if limit is None else range(limit):
+            url = self.pop()
+            if url is None:
+                return
+            yield url
+
+    def score(self, label, priority=None, lastmod=None, extracted=False):
+        weights = self.weights
+        # Sitemaps default <priority> to 0.5
+        priority = 0.5 if priority is None else min(max(priority, 0.0), 1.0)
+        recency = 0.0
+        if lastmod is not None:
+            age_days = max(self.now - lastmod, 0) / 86400
+            recency = 0.5 ** (age_days / config.FRONTIER_RECENCY_HALF_LIFE_DAYS)
+
+        return (weights['product'] * LABEL_SCORES.get(label, LABEL_SCORES['unknown']) +
+                weights['priority'] * priority +
+                weights['recency'] * recency +
+                weights['novelty'] * (0.0 if extracted else 1.0))
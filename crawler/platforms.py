@@ -0,0 +1,252 @@
+import html
+import re
+from abc import ABC, abstractmethod
+from crawler.rate_limiter import RateLimitedSession
+from crawler.sitemap import SitemapEntry, parse_lastmod
+from extractor.raw_content import html_to_text
+import config
+
+SHOPIFY = 'shopify'
+WOOCOMMERCE = 'woocommerce'
+
+# Fields a bulk product must have to skip rendering its page
+REQUIRED_FIELDS = ['title', 'price', 'currency', 'images']
+
+# Store currency in homepage markup: price meta tags or Shopify's currency object
+CURRENCY_PATTERNS = [
+    re.compile(r'<meta[^>]+(?:property|name)=["\'](?:og|product):price:currency["\'][^>]*content=["\']([A-Za-z]{3})["\']', re.IGNORECASE),
+    re.compile(r'<meta[^>]+content=["\']([A-Za-z]{3})["\'][^>]*(?:property|name)=["\'](?:og|product):price:currency["\']', re.IGNORECASE),
+    re.compile(r'Shopify\.currency\s*=\s*\{\s*"active"\s*:\s*"([A-Za-z]{3})"'),
+]
+
+class PlatformCatalog(ABC):
+    """Pages through a store platform's public catalog API
+
+    iter_products() yields product dicts in ProductParser's shape
+    (title, description, price, old_price, currency, images as URLs, url)
+    plus 'lastmod' (UTC timestamp or None) for incremental runs. Only pages
+    of products whose missing_fields() is not empty still need to be rendered.
+
+    currency is the store currency read from the homepage, used when the
+    API does not report one.
+    """
+
+    platform = None
+
+    def __init__(self, base_url, session=None, currency=''):
+        self.base_url = base_url.rstrip('/')
+        self.session = session or RateLimitedSession()
+        self.currency = currency
+
+    @abstractmethod
+    def iter_products(self):
+        """Yield every product of the catalog"""
+
+    @abstractmethod
+    def probe(self):
+        """Check that the catalog endpoint answers with products"""
+
+    def collect(self, canonicalize, finalize):
+        """Read the whole catalog
+
+        Returns sitemap-style entries (for URL state and the frontier) and a
+        dict of canonical URL -> product passed through finalize(product, url).
+        """
+        entries = []
+        products = {}
+        for product in self.iter_products():
+            url = canonicalize(product['url'])
+            if url in products:
+                continue
+            entries.append(SitemapEntry(url, product.pop('lastmod'), None, None))
+            products[url] = finalize(product, url)
+
+        print(f"DEBUG: Found {len(products)} products in the {self.platform} catalog API")
+        return entries, products
+
+    @staticmethod
+    def missing_fields(product):
+        return [field for field in REQUIRED_FIELDS if not product.get(field)]
+
+    @classmethod
+    def fill_missing(cls, product, rendered):
+        """Complete an API product with fields parsed from its rendered page"""
+        for field in cls.missing_fields(product) + ['description', 'old_price']:
+            if not product.get(field) and rendered.get(field):
+                product[field] = rendered[field]
+        return product
+
+    def _get_json(self, url, params=None):
+        response = self.session.get(url, params=params, timeout=config.REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
+class ShopifyCatalog(PlatformCatalog):
+    """Shopify /products.json, 250 products per page; currency from /cart.js or the homepage"""
+
+    platform = SHOPIFY
+
+    def probe(self):
+        try:
+            return isinstance(self._get_json(f"{self.base_url}/products.json", {'limit': 1}).get('products'), list)
+        except Exception:
+            return False
+
+    def iter_products(self):
+        currency = self._store_currency()
+        count = 0
+
+        for page in range(1, config.PLATFORM_MAX_API_PAGES + 1):
+            try:
+                products = self._get_json(f"{self.base_url}/products.json",
+                                          {'limit': 250, 'page': page}).get('products', [])
+            except Exception as e:
+                print(f"Error fetching Shopify products page {page}: {e}")
+                return
+            if not products:
+                return
+
+            for product in products:
+                count += 1
+                yield self._to_product(product, currency)
+            print(f"DEBUG: Shopify catalog page {page}: {count} products so far")
+
+    def _store_currency(self):
+        try:
+            currency = self._get_json(f"{self.base_url}/cart.js").get('currency')
+        except Exception as e:
+            print(f"DEBUG: Could not read store currency from /cart.js: {e}")
+            currency = None
+        return currency or self.currency
+
+    def _to_product(self, product, currency):
+        variants = product.get('variants') or [{}]
+        # The cheapest variant is the advertised price
+        variant = min(variants, key=lambda v: _to_float(v.get('price')) or float('inf'))
+        price = variant.get('price') or ''
+        compare_at = variant.get('compare_at_price') or ''
+        old_price = compare_at if _to_float(compare_at) > _to_float(price) else ''
+
+        return {
+            'is_product': True,
+            'url': f"{self.base_url}/products/{product.get('handle', '')}",
+            'title': product.get('title', ''),
+            'description': html_to_text(product.get('body_html') or ''),
+            'price': str(price),
+            'old_price': str(old_price),
+            'currency': currency,
+            'images': [image['src'] for image in product.get('images', []) if image.get('src')],
+            'lastmod': parse_lastmod(product.get('updated_at'))
+        }
+
+class WooCommerceCatalog(PlatformCatalog):
+    """WooCommerce Store API /wp-json/wc/store/v1/products, 100 products per page"""
+
+    platform = WOOCOMMERCE
+
+    def probe(self):
+        try:
+            return isinstance(self._get_json(f"{self.base_url}/wp-json/wc/store/v1/products", {'per_page': 1}), list)
+        except Exception:
+            return False
+
+    def iter_products(self):
+        count = 0
+
+        for page in range(1, config.PLATFORM_MAX_API_PAGES + 1):
+            try:
+                response = self.session.get(f"{self.base_url}/wp-json/wc/store/v1/products",
+                                            params={'per_page': 100, 'page': page},
+                                            timeout=config.REQUEST_TIMEOUT)
+                # Past the last page the API answers 400
+                if response.status_code == 400:
+                    return
+                response.raise_for_status()
+                products = response.json()
+            except Exception as e:
+                print(f"Error fetching WooCommerce products page {page}: {e}")
+                return
+            if not products:
+                return
+
+            for product in products:
+                count += 1
+                yield self._to_product(product)
+            print(f"DEBUG: WooCommerce catalog page {page}: {count} products so far")
+
+            total_pages = response.headers.get('x-wp-totalpages')
+            if total_pages and total_pages.isdigit() and page >= int(total_pages):
+                return
+
+    def _to_product(self, product):
+        prices = product.get('prices') or {}
+        # Store API prices are integers in minor units, e.g. "1299" with minor unit 2
+        minor_unit = prices.get('currency_minor_unit', 2)
+        price = _from_minor_units(prices.get('price'), minor_unit)
+        regular_price = _from_minor_units(prices.get('regular_price'), minor_unit)
+        old_price = regular_price if _to_float(regular_price) > _to_float(price) else ''
+
+        return {
+            'is_product': True,
+            'url': product.get('permalink', ''),
+            'title': html.unescape(product.get('name', '')),
+            'description': html_to_text(product.get('description') or product.get('short_description') or ''),
+            'price': price,
+            'old_price': old_price,
+            'currency': prices.get('currency_code') or self.currency,
+            'images': [image['src'] for image in product.get('images', []) if image.get('src')],
+            # Only some API versions and plugins expose it; naive GMT time
+            'lastmod': parse_lastmod(product.get('date_modified_gmt'))
+        }
+
+def detect_platform(base_url, session=None):
+    """Return a PlatformCatalog for the store, or None if no bulk API is available
+
+    The homepage is checked for platform markers first; the matching API is
+    then probed, so a false positive just costs one request.
+    """
+    base_url = base_url.rstrip('/')
+    session = session or RateLimitedSession()
+
+    try:
+        response = session.get(base_url, timeout=config.REQUEST_TIMEOUT)
+        headers = {key.lower() for key in response.headers}
+        page = response.text[:200000]
+    except Exception as e:
+        print(f"DEBUG: Platform detection failed: {e}")
+        return None
+
+    candidates = []
+    if headers & {'x-shopid', 'x-shopify-stage'} or 'cdn.shopify.com' in page or 'Shopify.theme' in page:
+        candidates.append(ShopifyCatalog)
+    if 'woocommerce' in page.lower() or 'wc/store' in page:
+        candidates.append(WooCommerceCatalog)
+
+    currency = page_currency(page)
+    for catalog_class in candidates:
+        catalog = catalog_class(base_url, session, currency)
+        if catalog.probe():
+            print(f"DEBUG: Detected {catalog.platform} store with a public catalog API")
+            return catalog
+
+    return None
+
+def page_currency(page):
+    """Store currency code from homepage markup, or ''"""
+    for pattern in CURRENCY_PATTERNS:
+        match = pattern.search(page)
+        if match:
+            return match.group(1).upper()
+    return ''
+
+def _from_minor_units(value, minor_unit):
+    try:
+        return f"{int(value) / 10 ** int(minor_unit):.{int(minor_unit)}f}"
+    except (TypeError, ValueError):
+        return ''
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
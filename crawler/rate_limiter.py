@@ -0,0 +1,131 @@
+import threading
+import time
+from urllib.parse import urlparse
+import requests
+import config
+
+class TokenBucket:
+    """Token bucket for a single host; rate is adjusted by the limiter"""
+
+    def __init__(self, rate, max_rate):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.last_decrease = 0.0
+
+    def reserve(self):
+        """Take a token and return how long the caller must wait before using it"""
+        now = time.monotonic()
+        # Burst capacity of one second worth of requests
+        capacity = max(1.0, self.rate)
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        # Tokens may go negative: each waiter reserves its own future slot
+        self.tokens -= 1
+        delay = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+        return max(delay, self.blocked_until - now)
+
+class HostRateLimiter:
+    """Per-host token-bucket limiter with AIMD rate adjustment
+
+    The rate grows additively while a host answers quickly and is halved on
+    429/503 responses, errors or slow responses. A robots.txt Crawl-delay
+    caps the rate for its host.
+    """
+
+    def __init__(self, initial_rate=None, min_rate=None, max_rate=None):
+        self.initial_rate = initial_rate or config.RATE_LIMIT_INITIAL
+        self.min_rate = min_rate or config.RATE_LIMIT_MIN
+        self.max_rate = max_rate or config.RATE_LIMIT_MAX
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, url):
+        """Block until a request to the URL's host is allowed"""
+        delay = self.reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+
+    def reserve(self, url):
+        """Reserve a request slot and return the delay in seconds (for async callers)"""
+        with self._lock:
+            return self._bucket(url).reserve()
+
+    def record(self, url, status_code, latency, retry_after=None):
+        """Feed back the outcome of a request; status_code is None on errors"""
+        with self._lock:
+            bucket = self._bucket(url)
+            now = time.monotonic()
+
+            throttled = status_code in (429, 503) or status_code is None
+            if throttled or latency > config.RATE_LIMIT_SLOW_SECONDS:
+                # Decrease at most once per second so concurrent failures
+                # from the same burst don't collapse the rate to the minimum
+                if now - bucket.last_decrease >= 1.0:
+                    bucket.rate = max(self.min_rate, bucket.rate * 0.5)
+                    bucket.last_decrease = now
+                if retry_after:
+                    bucket.blocked_until = max(bucket.blocked_until, now + retry_after)
+            else:
+                bucket.rate = min(bucket.max_rate, bucket.rate + config.RATE_LIMIT_INCREASE)
+
+    def set_crawl_delay(self, host, delay):
+        """Apply a robots.txt Crawl-delay (seconds between requests) to a host"""
+        if not delay or delay <= 0:
+            return
+        with self._lock:
+            bucket = self._bucket_for_host(host)
+            bucket.max_rate = min(bucket.max_rate, 1.0 / delay)
+            bucket.rate = min(bucket.rate, bucket.max_rate)
+        print(f"DEBUG: Crawl-delay {delay}s for {host}")
+
+    def _bucket(self, url):
+        return self._bucket_for_host(urlparse(url).netloc)
+
+    def _bucket_for_host(self, host):
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            bucket = self.buckets[host] = TokenBucket(self.initial_rate, self.max_rate)
+        return bucket
+
+class RateLimitedSession(requests.Session):
+    """requests.Session that waits for the host rate limiter and reports outcomes"""
+
+    def __init__(self, rate_limiter=None):
+        super().__init__()
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.headers['User-Agent'] = config.USER_AGENT
+
+    def request(self, method, url, *args, **kwargs):
+        self.rate_limiter.acquire(url)
+        start = time.monotonic()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except requests.RequestException:
+            self.rate_limiter.record(url, None, time.monotonic() - start)
+            raise
+
+        self.rate_limiter.record(url, response.status_code, time.monotonic() - start,
+                                 parse_retry_after(response.headers.get('retry-after')))
+        return response
+
+def parse_retry_after(value):
+    """Parse a Retry-After header given in seconds"""
+    try:
+        return min(float(value), config.RATE_LIMIT_MAX_RETRY_AFTER)
+    except (TypeError, ValueError):
+        return None
+
+_default_limiter = None
+_default_lock = threading.Lock()
+
+def get_rate_limiter():
+    """Limiter shared by the page fetcher, sitemap parser and image downloader"""
+    global _default_limiter
+    with _default_lock:
+        if _default_limiter is None:
+            _default_limiter = HostRateLimiter()
+        return _default_limiter
@@ -0,0 +1,117 @@
+from urllib.parse import urlparse
+import config
+
+# Analytics and ad hosts that are never worth loading
+TRACKER_PATTERNS = [
+    "google-analytics.com", "googletagmanager.com",
+    "facebook.com/tr", "doubleclick.net", "hotjar.com"
+]
+
+# Typical transfer sizes used to estimate bandwidth saved by blocked requests,
+# since a blocked request never tells us its real size
+TYPICAL_RESOURCE_BYTES = {
+    'image': 80000,
+    'media': 500000,
+    'font': 40000,
+    'stylesheet': 30000,
+    'script': 60000,
+}
+DEFAULT_RESOURCE_BYTES = 10000
+
+# Multi-label public suffixes: common country suffixes and the store/hosting
+# platforms whose subdomains are separate sites
+MULTI_LABEL_SUFFIXES = {
+    'co.uk', 'org.uk', 'ac.uk', 'gov.uk', 'me.uk', 'ltd.uk', 'plc.uk', 'com.au', 'net.au', 'org.au',
+    'co.nz', 'org.nz', 'co.jp', 'ne.jp', 'or.jp', 'co.kr', 'or.kr', 'com.br', 'net.br', 'com.mx',
+    'com.ar', 'com.tr', 'com.cn', 'com.hk', 'com.sg', 'com.my', 'co.in', 'co.za', 'co.il', 'com.ua',
+    'com.pl', 'com.ru', 'com.es', 'com.pt', 'co.id', 'com.vn', 'com.ph', 'com.tw', 'co.th',
+    'myshopify.com', 'shopifypreview.com', 'mybigcommerce.com', 'wixsite.com', 'square.site',
+    'github.io', 'netlify.app', 'vercel.app', 'pages.dev', 'herokuapp.com', 'appspot.com',
+    'cloudfront.net', 'azurewebsites.net', 'blogspot.com', 'wordpress.com', 'myshopline.com'
+}
+
+def registrable_domain(host):
+    """Approximate registrable domain of a host
+
+    cdn.shop.co.uk -> shop.co.uk, a.myshopify.com -> a.myshopify.com,
+    static.abc.de -> abc.de. IP addresses and bare suffixes are returned as is.
+    """
+    if not host:
+        return ''
+    host = host.lower().split(':')[0].rstrip('.')
+    if host.replace('.', '').isdigit():
+        return host
+
+    labels = host.split('.')
+    suffix_length = 2 if '.'.join(labels[-2:]) in MULTI_LABEL_SUFFIXES else 1
+    if suffix_length >= len(labels):
+        return host
+    return '.'.join(labels[-(suffix_length + 1):])
+
+class RequestStats:
+    """Counts allowed and blocked subresource requests"""
+
+    def __init__(self):
+        self.allowed = 0
+        self.blocked = 0
+        self.allowed_bytes = 0
+        self.bytes_saved = 0
+
+    def add(self, other):
+        self.allowed += other.allowed
+        self.blocked += other.blocked
+        self.allowed_bytes += other.allowed_bytes
+        self.bytes_saved += other.bytes_saved
+
+    def summary(self):
+        return (f"allowed {self.allowed} ({self.allowed_bytes / 1024:.0f} KB), "
+                f"blocked {self.blocked} (~{self.bytes_saved / 1024:.0f} KB saved)")
+
+class RequestPolicy:
+    """Decides which subresource requests a rendered page may load"""
+
+    def __init__(self, blocked_types=None, third_party_blocked_types=None, site_allow_patterns=None,
+                 platform_cdn_hosts=None):
+        # Resource types blocked from any origin; we only read page.content()
+        self.blocked_types = set(blocked_types if blocked_types is not None
+                                 else config.BLOCKED_RESOURCE_TYPES)
+        # Resource types blocked only when served from another site
+        self.third_party_blocked_types = set(third_party_blocked_types if third_party_blocked_types is not None
+                                             else config.THIRD_PARTY_BLOCKED_TYPES)
+        # Site host -> URL substrings that site needs loaded (opt back in)
+        self.site_allow_patterns = (site_allow_patterns if site_allow_patterns is not None
+                                    else config.SITE_ALLOWED_REQUESTS)
+        # Store platform CDNs serving theme and product scripts to every shop
+        self.platform_cdn_hosts = tuple(platform_cdn_hosts if platform_cdn_hosts is not None
+                                        else config.PLATFORM_CDN_HOSTS)
+
+    def should_block(self, request_url, resource_type, page_host):
+        """Check whether a subresource request should be aborted"""
+        # The page itself is always loaded
+        if resource_type == 'document':
+            return False
+
+        allow_patterns = self.site_allow_patterns.get(page_host, [])
+        if any(pattern in request_url for pattern in allow_patterns):
+            return False
+
+        if any(pattern in request_url for pattern in TRACKER_PATTERNS):
+            return True
+
+        if resource_type in self.blocked_types:
+            return True
+
+        if resource_type in self.third_party_blocked_types:
+            request_host = urlparse(request_url).hostname or ''
+            if self._is_platform_cdn(request_host):
+                return False
+            return registrable_domain(request_host) != registrable_domain(page_host)
+
+        return False
+
+    @staticmethod
+    def estimated_size(resource_type):
+        return TYPICAL_RESOURCE_BYTES.get(resource_type, DEFAULT_RESOURCE_BYTES)
+
+    def _is_platform_cdn(self, host):
+        return any(host == cdn or host.endswith('.' + cdn) for cdn in self.platform_cdn_hosts)
@@ -1,144 +1,214 @@
+import queue
+import threading
+import zlib
 import requests
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from bs4 import BeautifulSoup, XMLParsedAsHTMLWarning
+from lxml import etree
 from urllib.parse import urljoin, urlparse
+from crawler.rate_limiter import RateLimitedSession, get_rate_limiter
 import config
 import warnings
-from xml.etree import ElementTree as ET
 import html
 
 # Suppress XML parsing warnings
 warnings.filterwarnings("ignore", category=XMLParsedAsHTMLWarning)
 
+GZIP_MAGIC = b'\x1f\x8b'
+
+# A <url> entry from a sitemap; lastmod is a UTC timestamp, priority a float
+SitemapEntry = namedtuple('SitemapEntry', ['url', 'lastmod', 'changefreq', 'priority'])
+
 class SitemapParser:
     """Parses sitemap.xml and robots.txt to extract page URLs"""
 
     def __init__(self, base_url):
         self.base_url = base_url.rstrip('/')
-        self.session = requests.Session()
+        self.session = RateLimitedSession()
 
     def get_all_urls(self):
         """Get all URLs from sitemap and robots.txt"""
-        urls = set()
+        return [entry.url for entry in self.get_all_entries()]
 
-        # Try sitemap location
-        sitemap_locations = [
-            '/sitemap.xml'
-        ]
+    def get_all_entries(self):
+        """Get all sitemap entries (URL with lastmod, changefreq and priority)"""
+        entries = list(self.iter_entries())
 
-        for sitemap_path in sitemap_locations:
-            sitemap_url = f"{self.base_url}{sitemap_path}"
-            print(f"DEBUG: Trying sitemap location: {sitemap_path}")
-            sitemap_urls = self._parse_sitemap_url(sitemap_url)
-            if sitemap_urls:
-                print(f"DEBUG: Sitemap {sitemap_path} returned {len(sitemap_urls)} URLs")
-                urls.update(sitemap_urls)
-                # Don't break, try all locations
+        print(f"DEBUG: Total unique URLs found: {len(entries)}")
+        # Show sample URLs by type
+        for i, entry in enumerate(entries[:10]):
+            print(f"DEBUG: Sample URL {i+1}: {entry.url}")
 
-        # Try robots.txt for additional sitemaps
-        robots_urls = self._parse_robots_txt()
-        urls.update(robots_urls)
+        return entries
 
-        # Only use sitemap URLs
+    def iter_urls(self):
+        """Yield unique page URLs while sitemaps are still being downloaded"""
+        for entry in self.iter_entries():
+            yield entry.url
 
-        print(f"DEBUG: Total unique URLs found: {len(urls)}")
-        # Show sample URLs by type
-        sample_urls = list(urls)[:10]
-        for i, url in enumerate(sample_urls):
-            print(f"DEBUG: Sample URL {i+1}: {url}")
+    def iter_entries(self):
+        """Yield unique SitemapEntry objects while sitemaps are still being downloaded
 
-        return list(urls)
+        Sitemap-index children are fetched concurrently on a bounded worker
+        pool and their URLs are merged as they arrive. Every sitemap URL is
+        fetched at most once per discovery run.
+        """
+        seen = set()
+        fetched_sitemaps = set()
+        results = queue.Queue(maxsize=config.SITEMAP_QUEUE_SIZE)
+        stop = threading.Event()
+        active = 0
 
-    def _parse_sitemap_url(self, sitemap_url):
-        """Parse a specific sitemap URL"""
-        urls = set()
-        print(f"DEBUG: Fetching sitemap from: {sitemap_url}")
+        # robots.txt first: it may set a Crawl-delay and list extra sitemaps
+        sitemap_urls = [f"{self.base_url}/sitemap.xml"] + self._parse_robots_txt()
 
+        executor = ThreadPoolExecutor(max_workers=config.SITEMAP_WORKERS)
         try:
-            response = self.session.get(sitemap_url, timeout=10)
-            print(f"DEBUG: Sitemap response status: {response.status_code}")
-            if response.status_code != 200:
-                print(f"DEBUG: Non-200 status code, skipping")
-                return urls
+            while True:
+                for sitemap_url in sitemap_urls:
+                    if sitemap_url not in fetched_sitemaps:
+                        fetched_sitemaps.add(sitemap_url)
+                        executor.submit(self._sitemap_worker, sitemap_url, results, stop)
+                        active += 1
+                sitemap_urls = []
+
+                if not active:
+                    break
+
+                kind, value = results.get()
+                if kind == 'url':
+                    if value.url not in seen:
+                        seen.add(value.url)
+                        yield value
+                elif kind == 'sitemap':
+                    sitemap_urls.append(value)
+                else:
+                    active -= 1
 
-            content_length = len(response.content)
-            print(f"DEBUG: Sitemap content length: {content_length} bytes")
-            print(f"DEBUG: Content preview: {response.text[:500]}...")
+        finally:
+            # Unblock workers if the consumer stopped early
+            stop.set()
+            while active:
+                try:
+                    if results.get(timeout=1)[0] == 'done':
+                        active -= 1
+                except queue.Empty:
+                    pass
+            executor.shutdown(wait=True)
+
+    def _sitemap_worker(self, sitemap_url, results, stop):
+        """Stream one sitemap into the results queue, then report it done"""
+        count = 0
+        child_sitemaps = 0
+        try:
+            for kind, value in self._stream_sitemap(sitemap_url):
+                if not self._put(results, (kind, value), stop):
+                    return
+                if kind == 'sitemap':
+                    child_sitemaps += 1
+                else:
+                    count += 1
 
-            # Try ElementTree XML parser first
-            try:
-                root = ET.fromstring(response.content)
-                print("DEBUG: Successfully parsed as XML with ElementTree")
-
-                # Check for XML namespaces - use full namespace URI
-                sitemap_elements = root.findall('{http://www.sitemaps.org/schemas/sitemap/0.9}sitemap')
-                if sitemap_elements:
-                    print(f"DEBUG: Found sitemap index with {len(sitemap_elements)} sitemaps")
-                    for i, sitemap_elem in enumerate(sitemap_elements):
-                        loc = sitemap_elem.find('{http://www.sitemaps.org/schemas/sitemap/0.9}loc')
-                        print(f"DEBUG: Sitemap elem {i+1}, loc found: {loc is not None}, text: {loc.text if loc else None}")
-                        if loc is not None and loc.text:
-                            sub_sitemap_url = html.unescape(loc.text.strip())
-                            print(f"DEBUG: Parsing sub-sitemap {i+1}: {sub_sitemap_url}")
-                            sub_sitemap_urls = self._parse_sitemap_url(sub_sitemap_url)
-                            print(f"DEBUG: Sub-sitemap {i+1} returned {len(sub_sitemap_urls)} URLs")
-                            urls.update(sub_sitemap_urls)
-                    print(f"DEBUG: Total URLs from all sub-sitemaps: {len(urls)}")
-                    return urls
-
-                # Find URL elements
-                url_elements = root.findall('{http://www.sitemaps.org/schemas/sitemap/0.9}url') or root.findall('url')
-                print(f"DEBUG: Found {len(url_elements)} <url> elements")
-
-                for i, url_elem in enumerate(url_elements):
-                    loc = url_elem.find('{http://www.sitemaps.org/schemas/sitemap/0.9}loc')
-                    if loc is not None and loc.text:
-                        url = loc.text.strip()
-                        if i < 5:
-                            print(f"DEBUG: URL {i+1}: {url}")
-                        urls.add(url)
-
-                if len(url_elements) > 10:
-                    print(f"DEBUG: ... and {len(url_elements) - 10} more URLs")
-
-            except ET.ParseError as e:
-                print(f"DEBUG: ElementTree XML parsing failed: {e}, trying BeautifulSoup XML")
-                # Fallback to BeautifulSoup with XML parser
-                soup = BeautifulSoup(response.content, 'xml')
-                print("DEBUG: Using BeautifulSoup XML parser")
-
-                # Check if this is a sitemap index
-                sitemap_elements = soup.find_all('sitemap')
-                if sitemap_elements:
-                    print(f"DEBUG: Found sitemap index with {len(sitemap_elements)} sitemaps")
-                    for i, sitemap_elem in enumerate(sitemap_elements):
-                        loc = sitemap_elem.find('loc')
-                        if loc and loc.text:
-                            sub_sitemap_url = loc.text.strip()
-                            print(f"DEBUG: Parsing sub-sitemap {i+1}: {sub_sitemap_url}")
-                            sub_sitemap_urls = self._parse_sitemap_url(sub_sitemap_url)
-                            print(f"DEBUG: Sub-sitemap {i+1} returned {len(sub_sitemap_urls)} URLs")
-                            urls.update(sub_sitemap_urls)
-                    print(f"DEBUG: Total URLs from all sub-sitemaps: {len(urls)}")
-                    return urls
-
-                url_elements = soup.find_all('url')
-                print(f"DEBUG: Found {len(url_elements)} <url> elements")
-
-                for i, url_elem in enumerate(url_elements[:10]):
-                    loc = url_elem.find('loc')
-                    if loc and loc.text:
-                        url = loc.text.strip()
-                        if i < 5:
-                            print(f"DEBUG: URL {i+1}: {url}")
-                        urls.add(url)
-
-                if len(url_elements) > 10:
-                    print(f"DEBUG: ... and {len(url_elements) - 10} more URLs")
+            if child_sitemaps:
+                print(f"DEBUG: Found sitemap index with {child_sitemaps} sitemaps")
+            else:
+                print(f"DEBUG: Sitemap {sitemap_url} returned {count} URLs")
 
         except Exception as e:
             print(f"DEBUG: Error parsing sitemap {sitemap_url}: {e}")
 
-        return urls
+        finally:
+            results.put(('done', sitemap_url))
+
+    @staticmethod
+    def _put(results, item, stop):
+        """Put with backpressure; give up once the consumer has stopped"""
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _stream_sitemap(self, sitemap_url):
+        """Stream-parse a (optionally gzipped) sitemap
+
+        Yields ('url', SitemapEntry) for pages and ('sitemap', loc) for the
+        children of a sitemap index.
+
+        The body is decompressed and parsed incrementally; each <url>/<sitemap>
+        element is discarded as soon as its <loc> is read, so memory stays flat
+        regardless of sitemap size.
+        """
+        print(f"DEBUG: Fetching sitemap from: {sitemap_url}")
+
+        try:
+            response = self.session.get(sitemap_url, timeout=config.REQUEST_TIMEOUT, stream=True)
+        except requests.RequestException as e:
+            print(f"DEBUG: Error fetching sitemap {sitemap_url}: {e}")
+            return
+
+        with response:
+            if response.status_code != 200:
+                print(f"DEBUG: Sitemap response status {response.status_code}, skipping")
+                return
+
+            parser = etree.XMLPullParser(events=('end',), recover=True, huge_tree=True,
+                                         resolve_entities=False)
+            decompressor = None
+
+            try:
+                for i, chunk in enumerate(response.iter_content(chunk_size=64 * 1024)):
+                    # .xml.gz files arrive as raw gzip (Content-Encoding is undone by requests)
+                    if i == 0 and chunk[:2] == GZIP_MAGIC:
+                        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                    if decompressor:
+                        chunk = decompressor.decompress(chunk)
+
+                    parser.feed(chunk)
+                    yield from self._read_events(parser)
+
+                parser.close()
+                yield from self._read_events(parser)
+
+            except (etree.XMLSyntaxError, zlib.error, requests.RequestException) as e:
+                print(f"DEBUG: Error parsing sitemap {sitemap_url}: {e}")
+
+    def _read_events(self, parser):
+        """Yield completed <url>/<sitemap> elements and discard them"""
+        for event, elem in parser.read_events():
+            kind = elem.tag.rpartition('}')[2] if isinstance(elem.tag, str) else None
+            if kind not in ('url', 'sitemap'):
+                continue
+
+            fields = self._child_texts(elem)
+            loc = fields.get('loc')
+            if loc and kind == 'sitemap':
+                yield kind, html.unescape(loc)
+            elif loc:
+                yield kind, SitemapEntry(
+                    url=loc,
+                    lastmod=parse_lastmod(fields.get('lastmod')),
+                    changefreq=fields.get('changefreq'),
+                    priority=parse_priority(fields.get('priority'))
+                )
+
+            # Free parsed siblings so the tree never grows
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+    @staticmethod
+    def _child_texts(elem):
+        """Map local names of direct children (loc, lastmod, ...) to their text"""
+        fields = {}
+        for child in elem:
+            if isinstance(child.tag, str):
+                fields[child.tag.rpartition('}')[2]] = (child.text or '').strip()
+        return fields
 
     def _crawl_homepage(self):
         """Basic crawling from homepage to find product pages"""
@@ -187,94 +257,53 @@ class SitemapParser:
 
         return urls
 
-    def _parse_sitemap(self):
-        """Parse sitemap.xml"""
-        urls = set()
-        sitemap_url = f"{self.base_url}/sitemap.xml"
-
-        print(f"DEBUG: Fetching sitemap from: {sitemap_url}")
-
-        try:
-            response = self.session.get(sitemap_url)
-            print(f"DEBUG: Sitemap response status: {response.status_code}")
-            response.raise_for_status()
-
-            content_length = len(response.content)
-            print(f"DEBUG: Sitemap content length: {content_length} bytes")
-
-            # Try XML parser first, fallback to HTML parser
-            try:
-                soup = BeautifulSoup(response.content, 'xml')
-                print("DEBUG: Successfully parsed as XML")
-            except Exception as e:
-                print(f"DEBUG: XML parsing failed, trying HTML parser: {e}")
-                soup = BeautifulSoup(response.content, 'html.parser')
-                print("DEBUG: Using HTML parser")
-
-            url_elements = soup.find_all('url')
-            print(f"DEBUG: Found {len(url_elements)} <url> elements")
-
-            for i, url_elem in enumerate(url_elements[:5]):  # Show first 5
-                loc = url_elem.find('loc')
-                if loc and loc.text:
-                    url = loc.text.strip()
-                    print(f"DEBUG: URL {i+1}: {url}")
-                    urls.add(url)
-
-            if len(url_elements) > 5:
-                print(f"DEBUG: ... and {len(url_elements) - 5} more URLs")
-
-        except Exception as e:
-            print(f"Error parsing sitemap.xml: {e}")
-
-        return urls
-
     def _parse_robots_txt(self):
-        """Parse robots.txt for sitemap entries"""
-        urls = set()
+        """Parse robots.txt for sitemap entries and Crawl-delay"""
+        sitemap_urls = []
         robots_url = f"{self.base_url}/robots.txt"
 
         try:
-            response = self.session.get(robots_url)
+            response = self.session.get(robots_url, timeout=config.REQUEST_TIMEOUT)
             response.raise_for_status()
 
             lines = response.text.split('\n')
+            applies_to_us = False
             for line in lines:
                 line = line.strip()
+
+                # Crawl-delay from the "User-agent: *" group
+                if line.lower().startswith('user-agent:'):
+                    applies_to_us = line[11:].strip() == '*'
+                elif applies_to_us and line.lower().startswith('crawl-delay:'):
+                    try:
+                        get_rate_limiter().set_crawl_delay(urlparse(self.base_url).netloc, float(line[12:].strip()))
+                    except ValueError:
+                        pass
+
                 if line.lower().startswith('sitemap:'):
                     sitemap_url = line[8:].strip()
                     if sitemap_url:
-                        # Parse the sitemap URL
-                        sitemap_urls = self._parse_single_sitemap(sitemap_url)
-                        urls.update(sitemap_urls)
+                        sitemap_urls.append(sitemap_url)
 
         except Exception as e:
             print(f"Error parsing robots.txt: {e}")
 
-        return urls
-
-    def _parse_single_sitemap(self, sitemap_url):
-        """Parse a single sitemap URL"""
-        urls = set()
-
-        try:
-            response = self.session.get(sitemap_url)
-            response.raise_for_status()
-
-            # Try XML parser first, fallback to HTML parser
-            try:
-                soup = BeautifulSoup(response.content, 'xml')
-            except:
-                soup = BeautifulSoup(response.content, 'html.parser')
-
-            url_elements = soup.find_all('url')
-
-            for url_elem in url_elements:
-                loc = url_elem.find('loc')
-                if loc and loc.text:
-                    urls.add(loc.text.strip())
-
-        except Exception as e:
-            print(f"Error parsing sitemap {sitemap_url}: {e}")
-
-        return urls
+        return sitemap_urls
+
+def parse_lastmod(value):
+    """Parse a W3C datetime <lastmod> into a UTC timestamp, or None"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+def parse_priority(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
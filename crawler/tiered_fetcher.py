@@ -0,0 +1,302 @@
+import json
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from crawler.fetcher import PageFetcher
+from crawler.frontier import CrawlFrontier
+from crawler.rate_limiter import RateLimitedSession
+from crawler.url_classifier import looks_like_product
+from storage.page_cache import PageCache
+import config
+
+# Markers of structured data that ProductParser can build a product from
+PRODUCT_JSON_LD_PATTERN = re.compile(
+    r'<script[^>]+application/ld\+json[^>]*>[^<]*?"@type"\s*:\s*\[?\s*"Product"',
+    re.IGNORECASE
+)
+PRODUCT_META_PATTERN = re.compile(
+    r'<meta[^>]+(?:product|og):price:amount',
+    re.IGNORECASE
+)
+
+class TieredFetcher:
+    """Fetches pages over plain HTTP first, rendering with Playwright only when needed
+
+    Fetched pages are kept in a PageCache; re-crawls revalidate them with
+    conditional requests and reuse the cached HTML on 304.
+
+    The tier chosen for a host is saved with the time it was decided and
+    probed again once it is older than FETCH_TIER_MAX_AGE_HOURS, so a site
+    that starts (or stops) server-rendering its product data is noticed.
+    """
+
+    HTTP = 'http'
+    BROWSER = 'browser'
+
+    def __init__(self, http_workers=None, tiers_file=None, cache=None, capture_json=None):
+        self.http_workers = http_workers or config.HTTP_FETCH_WORKERS
+        self.capture_json = config.CAPTURE_JSON if capture_json is None else capture_json
+        self.tiers_file = tiers_file or config.FETCH_TIERS_FILE
+        self.cache = cache or PageCache()
+
+        # Pooled keep-alive connections shared by all HTTP workers
+        self.session = RateLimitedSession()
+        adapter = HTTPAdapter(pool_connections=self.http_workers, pool_maxsize=self.http_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.page_fetcher = None
+        self._lock = threading.Lock()
+        # host -> {'tier', 'decided_at'}, host -> [static hits, static misses]
+        self.site_tiers = self._load_tiers()
+        self.probe_stats = {}
+
+    def __enter__(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.http_workers)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._executor.shutdown(wait=True)
+        if self.page_fetcher:
+            self.page_fetcher.__exit__(exc_type, exc_val, exc_tb)
+            self.page_fetcher = None
+        self._save_tiers()
+        self.cache.close()
+
+    def fetch_page(self, url):
+        """Fetch page content, escalating to full rendering if static HTML is not enough"""
+        html_content = self._fetch_static(url)
+        if html_content:
+            return html_content
+        page_fetcher = self._get_page_fetcher()
+        html_content = page_fetcher.fetch_page(url)
+        self._cache_rendered(page_fetcher, url, html_content)
+        return html_content
+
+    def fetch_many(self, urls):
+        """Fetch pages concurrently, yielding (url, html_content) as they complete
+
+        Static HTTP probes run on a thread pool; pages that need rendering are
+        streamed into PageFetcher.fetch_many, which is only started on the
+        first escalation. On browser-tier hosts, pages cached with an ETag or
+        Last-Modified are probed with a conditional request first and are
+        rendered only if the server does not answer 304.
+
+        urls may also be a queue.Queue that another thread fills and closes
+        with None, or a CrawlFrontier another thread fills and close()s;
+        queued URLs are picked up while earlier pages are still in flight,
+        so a producer can feed the fetcher as it goes.
+        """
+        url_queue = urls if isinstance(urls, (queue.Queue, CrawlFrontier)) else None
+        url_iter = iter(urls) if url_queue is None else None
+        exhausted = object()
+        max_in_flight = self.http_workers * 2
+        results = queue.Queue()
+        browser_queue = None
+        browser_thread = None
+        in_flight = 0
+        source_done = False
+
+        try:
+            while True:
+                while in_flight < max_in_flight and not source_done:
+                    if url_queue is not None:
+                        # Only wait for the producer when nothing is in flight
+                        try:
+                            url = url_queue.get(block=not in_flight)
+                        except queue.Empty:
+                            break
+                        if url is None:
+                            url = exhausted
+                    else:
+                        url = next(url_iter, exhausted)
+                    if url is exhausted:
+                        source_done = True
+                        break
+                    in_flight += 1
+                    # Rendered pages cached with validators are revalidated
+                    # over HTTP first and only rendered again unless 304
+                    if self._tier_for(url) == self.BROWSER and not self.cache.has_validators(url):
+                        if browser_queue is None:
+                            browser_queue, browser_thread = self._start_browser_pump(results)
+                        browser_queue.put(url)
+                    else:
+                        self._executor.submit(self._probe, url, results)
+
+                if not in_flight:
+                    return
+
+                url, html_content = results.get()
+                if html_content is self.BROWSER:
+                    # Static HTML lacked structured data, render it instead
+                    if browser_queue is None:
+                        browser_queue, browser_thread = self._start_browser_pump(results)
+                    browser_queue.put(url)
+                    continue
+
+                in_flight -= 1
+                yield url, html_content
+
+        finally:
+            if browser_queue is not None:
+                browser_queue.put(None)
+                browser_thread.join()
+
+    def _probe(self, url, results):
+        """Worker: try the static tier and report either HTML or an escalation
+
+        Always reports something: fetch_many waits for one result per URL.
+        """
+        try:
+            html_content = self._fetch_static(url)
+        except Exception as e:
+            print(f"Error probing {url}: {e}")
+            html_content = None
+        results.put((url, html_content or self.BROWSER))
+
+    def _start_browser_pump(self, results):
+        """Start a thread feeding escalated URLs through the pooled browser"""
+        browser_queue = queue.Queue()
+        thread = threading.Thread(target=self._pump_browser, args=(browser_queue, results), daemon=True)
+        thread.start()
+        return browser_queue, thread
+
+    def _pump_browser(self, browser_queue, results):
+        urls = iter(browser_queue.get, None)
+        try:
+            page_fetcher = self._get_page_fetcher()
+            for url, html_content in page_fetcher.fetch_many(urls):
+                self._cache_rendered(page_fetcher, url, html_content)
+                results.put((url, html_content))
+        except Exception as e:
+            print(f"Error rendering pages: {e}")
+            for url in urls:
+                results.put((url, None))
+
+    def pop_captured_json(self, url):
+        """JSON responses captured while rendering url (see PageFetcher), or None"""
+        if self.page_fetcher is None:
+            return None
+        return self.page_fetcher.captured_json.pop(url, None)
+
+    def _get_page_fetcher(self):
+        """Start the browser pool on first use"""
+        with self._lock:
+            if self.page_fetcher is None:
+                capture_patterns = config.CAPTURE_JSON_PATTERNS if self.capture_json else None
+                self.page_fetcher = PageFetcher(capture_patterns=capture_patterns).__enter__()
+            return self.page_fetcher
+
+    def _cache_rendered(self, page_fetcher, url, html_content):
+        validators = page_fetcher.validators.pop(url, (None, None))
+        if html_content:
+            self.cache.put(url, html_content, *validators)
+
+    def _fetch_static(self, url):
+        """Return cached or server-rendered HTML if it carries usable structured data"""
+        host = urlparse(url).netloc
+        cached = self.cache.get(url)
+        headers = self.cache.conditional_headers(cached)
+        browser_tier = self._tier_for(url) == self.BROWSER
+
+        # Without validators there is nothing to revalidate for rendered sites
+        if browser_tier and not headers:
+            return None
+
+        response = self._fetch_http(url, headers)
+        if response is None:
+            return None
+
+        if response.status_code == 304 and cached:
+            self.cache.touch(url)
+            return cached['html']
+
+        if browser_tier or response.status_code != 200:
+            return None
+        if 'html' not in response.headers.get('content-type', '').lower():
+            return None
+
+        html_content = decode_html(response)
+        usable = self.has_structured_data(html_content)
+        # Listing and content pages never carry Product data; they say
+        # nothing about whether the site's product pages are server-rendered
+        if usable or looks_like_product(url):
+            self._record_probe(host, usable)
+        if not usable:
+            return None
+
+        self.cache.put(url, html_content, response.headers.get('etag'), response.headers.get('last-modified'))
+        return html_content
+
+    def _fetch_http(self, url, headers=None):
+        """Plain (optionally conditional) GET of a page"""
+        try:
+            return self.session.get(url, headers=headers, timeout=config.REQUEST_TIMEOUT)
+        except requests.RequestException as e:
+            print(f"Error fetching {url} over HTTP: {e}")
+            return None
+
+    @staticmethod
+    def has_structured_data(html_content):
+        """Check for JSON-LD Product blocks or product price meta tags"""
+        return bool(PRODUCT_JSON_LD_PATTERN.search(html_content) or
+                    PRODUCT_META_PATTERN.search(html_content))
+
+    def _tier_for(self, url):
+        host = urlparse(url).netloc
+        entry = self.site_tiers.get(host)
+        if entry is None:
+            return None
+        if time.time() - entry['decided_at'] > config.FETCH_TIER_MAX_AGE_HOURS * 3600:
+            with self._lock:
+                if self.site_tiers.get(host) is entry:
+                    del self.site_tiers[host]
+                    self.probe_stats.pop(host, None)
+                    print(f"DEBUG: Fetch tier for {host} expired, probing again")
+            return None
+        return entry['tier']
+
+    def _record_probe(self, host, usable):
+        """Settle on a tier for the host once enough pages have been probed"""
+        with self._lock:
+            stats = self.probe_stats.setdefault(host, [0, 0])
+            stats[0 if usable else 1] += 1
+
+            if host in self.site_tiers or sum(stats) < config.TIER_PROBE_PAGES:
+                return
+
+            tier = self.HTTP if stats[0] >= stats[1] else self.BROWSER
+            self.site_tiers[host] = {'tier': tier, 'decided_at': time.time()}
+            print(f"DEBUG: Using {tier} tier for {host} (static hits: {stats[0]}, misses: {stats[1]})")
+
+    def _load_tiers(self):
+        try:
+            with open(self.tiers_file, 'r', encoding='utf-8') as f:
+                tiers = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Files written before tiers expired hold bare tier names; probe those again
+        return {host: entry for host, entry in tiers.items()
+                if isinstance(entry, dict) and 'tier' in entry and 'decided_at' in entry}
+
+    def _save_tiers(self):
+        try:
+            os.makedirs(os.path.dirname(self.tiers_file) or '.', exist_ok=True)
+            with open(self.tiers_file, 'w', encoding='utf-8') as f:
+                json.dump(self.site_tiers, f, indent=2)
+        except OSError as e:
+            print(f"Error saving fetch tiers: {e}")
+
+def decode_html(response):
+    """Decode a response body, defaulting to UTF-8 when no charset is declared"""
+    encoding = response.encoding if 'charset' in response.headers.get('content-type', '').lower() else None
+    try:
+        return response.content.decode(encoding or 'utf-8', errors='replace')
+    except LookupError:
+        return response.content.decode('utf-8', errors='replace')
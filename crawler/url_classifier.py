@@ -0,0 +1,217 @@
+import json
+import math
+import re
+from urllib.parse import urlsplit
+from ai.deepseek_client import DeepSeekClient, parse_json_reply
+import config
+
+PRODUCT = 'product'
+COLLECTION = 'collection'
+OTHER = 'other'
+UNKNOWN = 'unknown'
+
+# Literal path segments that introduce a single product / a listing / other content
+PRODUCT_KEYWORDS = {
+    'products', 'product', 'p', 'item', 'items', 'dp', 'produkt', 'produkte',
+    'produit', 'produits', 'prodotto', 'prodotti', 'producto', 'productos',
+    'produto', 'produtos', 'artikel', 'tovar', 'goods'
+}
+COLLECTION_KEYWORDS = {
+    'collections', 'collection', 'category', 'categories', 'product-category',
+    'c', 'catalog', 'catalogue', 'kategorie', 'categorie', 'categoria', 'brands', 'brand'
+}
+OTHER_KEYWORDS = {
+    'pages', 'page', 'blogs', 'blog', 'news', 'articles', 'article', 'policies',
+    'tags', 'tag', 'author', 'search', 'account', 'cart', 'help', 'faq', 'info',
+    'post', 'posts', 'stores', 'legal'
+}
+KEYWORDS = PRODUCT_KEYWORDS | COLLECTION_KEYWORDS | OTHER_KEYWORDS
+
+ID_SEGMENT = re.compile(r'^\d+$')
+
+def looks_like_product(url):
+    """Cheap per-URL check: False for listing and content pages such as /collections/{slug}
+
+    The literal keyword closest to the end decides, as in cluster labels;
+    paths without keywords (e.g. /blue-shirt.html) may be products.
+    """
+    segments = URLClassifier._segments(url)
+    if not segments or segments[-1] in KEYWORDS:
+        return False
+    for segment in reversed(segments[:-1]):
+        if segment in PRODUCT_KEYWORDS:
+            return True
+        if segment in COLLECTION_KEYWORDS or segment in OTHER_KEYWORDS:
+            return False
+    return True
+
+class URLClassifier:
+    """Clusters URLs by path template (e.g. /products/{slug}) and labels each cluster
+
+    Labels come from path keywords. Clusters that keywords cannot explain can
+    be labelled with one small LLM call that only sees a few sample URLs per
+    cluster, so filtering cost does not grow with the number of URLs.
+    """
+
+    def __init__(self, use_llm=None, ai_client=None):
+        self.use_llm = config.URL_CLASSIFIER_USE_LLM if use_llm is None else use_llm
+        self.ai_client = ai_client
+
+    def filter_products(self, urls):
+        """Return product URLs in their original order"""
+        clusters = self.classify(urls)
+        product_urls = set()
+        for cluster in clusters.values():
+            if cluster['label'] == PRODUCT:
+                product_urls.update(cluster['urls'])
+        return [url for url in urls if url in product_urls]
+
+    def label_urls(self, urls):
+        """Map each URL to its cluster's label"""
+        labels = {}
+        for cluster in self.classify(urls).values():
+            for url in cluster['urls']:
+                labels[url] = cluster['label']
+        return labels
+
+    def classify(self, urls):
+        """Map path template -> {'label': ..., 'urls': [...]}"""
+        clusters = {}
+        for url, template in zip(urls, self.templates(urls)):
+            clusters.setdefault(template, {'label': None, 'urls': []})['urls'].append(url)
+
+        for template, cluster in clusters.items():
+            cluster['label'] = self._label_by_keywords(template)
+
+        unknown = {template: cluster for template, cluster in clusters.items() if cluster['label'] == UNKNOWN}
+        if unknown and self.use_llm:
+            self._label_with_llm(unknown)
+
+        for template, cluster in sorted(clusters.items(), key=lambda item: -len(item[1]['urls']))[:20]:
+            print(f"DEBUG: Cluster {template} ({len(cluster['urls'])} URLs): {cluster['label']}")
+
+        return clusters
+
+    def templates(self, urls):
+        """Generalize every URL path into a template, level by level
+
+        At each depth, URLs are grouped by their template so far. A segment
+        stays literal if it is a known keyword or is shared by enough URLs in
+        its group; otherwise it becomes {id} (digits) or {slug}.
+        """
+        paths = [self._segments(url) for url in urls]
+        templates = [[] for _ in paths]
+        max_depth = max((len(segments) for segments in paths), default=0)
+
+        for depth in range(max_depth):
+            groups = {}
+            for i, segments in enumerate(paths):
+                if len(segments) > depth:
+                    group = groups.setdefault(tuple(templates[i]), {})
+                    group[segments[depth]] = group.get(segments[depth], 0) + 1
+
+            min_support = {
+                key: max(2, math.ceil(sum(counts.values()) * config.URL_CLASSIFIER_LITERAL_SHARE))
+                for key, counts in groups.items()
+            }
+
+            for i, segments in enumerate(paths):
+                if len(segments) <= depth:
+                    continue
+                key = tuple(templates[i])
+                segment = segments[depth]
+                if segment in KEYWORDS or groups[key][segment] >= min_support[key]:
+                    templates[i].append(segment)
+                else:
+                    templates[i].append(self._placeholder(segment))
+
+        return ['/' + '/'.join(template) for template in templates]
+
+    @staticmethod
+    def _segments(url):
+        path = urlsplit(url).path.lower()
+        return [segment for segment in path.split('/') if segment]
+
+    @staticmethod
+    def _placeholder(segment):
+        if ID_SEGMENT.match(segment):
+            return '{id}'
+        # Keep file extensions such as .html, they are part of the site's URL scheme
+        stem, dot, ext = segment.rpartition('.')
+        if dot and stem and ext.isalpha() and len(ext) <= 5:
+            return '{slug}.' + ext
+        return '{slug}'
+
+    @staticmethod
+    def _label_by_keywords(template):
+        segments = [segment for segment in template.split('/') if segment]
+        if not segments:
+            return OTHER
+
+        # The literal segment closest to the end decides, e.g.
+        # /collections/{slug}/products/{slug} -> product
+        leaf_is_variable = segments[-1].startswith('{')
+        for segment in reversed(segments):
+            if segment.startswith('{'):
+                continue
+            if segment in PRODUCT_KEYWORDS:
+                return PRODUCT if leaf_is_variable else COLLECTION
+            if segment in COLLECTION_KEYWORDS:
+                return COLLECTION
+            if segment in OTHER_KEYWORDS:
+                return OTHER
+
+        return UNKNOWN if leaf_is_variable else OTHER
+
+    def _label_with_llm(self, clusters):
+        """Label ambiguous clusters with one LLM call over a few samples each"""
+        largest = sorted(clusters.items(), key=lambda item: -len(item[1]['urls']))
+        largest = largest[:config.URL_CLASSIFIER_MAX_LLM_CLUSTERS]
+        samples = {
+            str(i): {'template': template, 'count': len(cluster['urls']),
+                     'samples': cluster['urls'][:config.URL_CLASSIFIER_SAMPLES]}
+            for i, (template, cluster) in enumerate(largest)
+        }
+
+        prompt = f"""
+You are an expert at identifying product pages on e-commerce websites.
+
+Below are groups of URLs from one store's sitemap. URLs in a group share a path template.
+For each group decide whether its URLs are PRODUCT pages (individual items for sale),
+COLLECTION pages (categories/listings) or OTHER pages.
+
+Return ONLY a JSON object mapping group id to "product", "collection" or "other", like: {{"0": "product", "1": "other"}}
+
+GROUPS:
+{json.dumps(samples, indent=1)}
+"""
+
+        try:
+            if self.ai_client is None:
+                self.ai_client = DeepSeekClient()
+
+            response = self.ai_client.client.chat.completions.create(
+                model=self.ai_client.model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You classify groups of e-commerce URLs. Return only valid JSON."
+                    },
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                temperature=0.1,
+                max_tokens=1000,
+                timeout=config.REQUEST_TIMEOUT * 2
+            )
+
+            labels = parse_json_reply(response.choices[0].message.content, '{', '}') or {}
+            for key, (template, cluster) in zip(samples, largest):
+                label = str(labels.get(key, '')).lower()
+                if label in (PRODUCT, COLLECTION, OTHER):
+                    cluster['label'] = label
+
+        except Exception as e:
+            print(f"AI cluster labelling error: {e}")
@@ -0,0 +1,108 @@
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from extractor.images import ImageExtractor
+from storage.image_store import ImageStore
+import config
+
+class ImageDownloader:
+    """Downloads product images on a thread pool, off the page loop
+
+    submit() queues a product's image jobs and returns at once. When the
+    last image of a product finishes, product_data['images'] is replaced by
+    the filenames that downloaded, in job order; a file's extension is the
+    format sniffed from its bytes, which may differ from the job's filename.
+    Leaving the context waits for all downloads, so products are complete
+    before they are saved.
+
+    At most per_host downloads run against one host at a time (image CDNs
+    throttle bursts), on keep-alive connections pooled per host. Files are
+    placed through image_store, which skips URLs it already holds.
+    """
+
+    def __init__(self, workers=None, per_host=None, image_extractor=None, image_store=None):
+        self.workers = workers or config.IMAGE_DOWNLOAD_WORKERS
+        self.per_host = per_host or config.IMAGE_DOWNLOADS_PER_HOST
+        self.image_extractor = image_extractor or ImageExtractor("")
+        self._owns_store = image_store is None
+        self.image_store = image_store or ImageStore("output")
+
+        # requests keeps one connection pool per host; size it to the host limit
+        adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.per_host)
+        self.image_extractor.session.mount('http://', adapter)
+        self.image_extractor.session.mount('https://', adapter)
+
+        self.downloaded = 0
+        self.failed = 0
+        self._host_slots = defaultdict(lambda: threading.Semaphore(self.per_host))
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def __enter__(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._executor.shutdown(wait=True)
+        self._executor = None
+        if self._owns_store:
+            self.image_store.close()
+        if self.downloaded or self.failed:
+            print(f"DEBUG: Images stored: {self.downloaded}, failed: {self.failed}, "
+                  f"revalidated (304): {self.image_store.revalidated}")
+
+    def submit(self, product_data, jobs, on_done=None):
+        """Queue (img_url, filepath, filename) jobs for a product
+
+        on_done(product_data) is called from a worker thread once the
+        product's filenames are attached.
+        """
+        if not jobs:
+            product_data['images'] = []
+            if on_done:
+                on_done(product_data)
+            return
+
+        results = [None] * len(jobs)
+        remaining = [len(jobs)]
+
+        def finished(index, filename):
+            with self._lock:
+                results[index] = filename
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                product_data['images'] = [name for name in results if name]
+                if on_done:
+                    on_done(product_data)
+
+        for index, (img_url, filepath, _) in enumerate(jobs):
+            self._executor.submit(self._download, index, img_url, filepath, finished)
+
+    def _download(self, index, img_url, filepath, finished):
+        stored_path = None
+        try:
+            stored_path = self.image_store.store_image(img_url, filepath, self._fetch)
+            if not stored_path:
+                print(f"Failed to download image: {img_url}")
+        except Exception as e:
+            print(f"Error downloading image {img_url}: {e}")
+        finally:
+            with self._lock:
+                if stored_path:
+                    self.downloaded += 1
+                else:
+                    self.failed += 1
+            finished(index, os.path.basename(stored_path) if stored_path else None)
+
+    def _fetch(self, img_url, path, etag=None, last_modified=None):
+        # Only requests take a host slot; URLs fresh in the store are just linked
+        with self._host_slots_for(img_url):
+            return self.image_extractor.fetch_image(img_url, path, etag, last_modified)
+
+    def _host_slots_for(self, img_url):
+        with self._lock:
+            return self._host_slots[urlparse(img_url).netloc]
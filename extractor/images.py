@@ -1,15 +1,22 @@
-import requests
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urljoin, urlparse, urlsplit
 import os
 import re
+import tempfile
+from crawler.rate_limiter import RateLimitedSession
 import config
 
+# Leading bytes needed to recognize every supported image signature
+SNIFF_BYTES = 12
+IMAGE_CHUNK_SIZE = 64 * 1024
+# Format hints in CDN URLs, e.g. ?format=webp, &fm=avif, /f_webp/
+URL_FORMAT_PATTERN = re.compile(r'(?:\.|[?&](?:format|fm)=|[/,]f_)(avif|webp|jpe?g|png|gif)\b', re.IGNORECASE)
+
 class ImageExtractor:
     """Handles image extraction and download"""
 
     def __init__(self, base_url):
         self.base_url = base_url
-        self.session = requests.Session()
+        self._session = None
 
         # Skip small icons and trackers
         self.skip_patterns = [
@@ -17,6 +24,16 @@ class ImageExtractor:
             'analytics', 'social', 'share', 'button'
         ]
 
+    @property
+    def session(self):
+        """Rate-limited session, created on first download
+
+        Extraction workers only use the URL helpers and never open one.
+        """
+        if self._session is None:
+            self._session = RateLimitedSession()
+        return self._session
+
     def extract_product_images(self, raw_content, page_url):
         """Extract and filter product images from raw content"""
         if not raw_content or 'images' not in raw_content:
@@ -26,22 +43,30 @@ class ImageExtractor:
         seen_urls = set()
 
         for img_data in raw_content['images']:
-            img_url = self._resolve_image_url(img_data['src'], page_url)
+            alt = img_data.get('alt', '')
+            variant = select_image_candidate(img_data)
+            img_url = self._resolve_image_url(variant['url'] if variant else img_data['src'], page_url)
+
+            # A srcset variant the filter rejects (e.g. no extension) falls back to src
+            if variant and not (img_url and self._is_product_image(img_url, alt)):
+                variant = None
+                img_url = self._resolve_image_url(img_data['src'], page_url)
 
             if not img_url or img_url in seen_urls:
                 continue
 
             # Filter out non-product images
-            if self._is_product_image(img_url, img_data.get('alt', '')):
+            if self._is_product_image(img_url, alt):
                 images.append({
                     'url': img_url,
-                    'alt': img_data.get('alt', ''),
+                    'alt': alt,
+                    'width': variant['width'] if variant else None,
                     'filename': self._generate_filename(img_url)
                 })
                 seen_urls.add(img_url)
 
         # Prefer larger images
-        images.sort(key=lambda x: self._get_image_size_score(x['url']), reverse=True)
+        images.sort(key=lambda x: self._get_image_size_score(x['url'], x['width']), reverse=True)
 
         return images[:10]  # Limit to 10 images per product
 
@@ -68,18 +93,25 @@ class ImageExtractor:
         if any(dim in url_lower for dim in ['16x16', '32x32', '64x64']):
             return False
 
+        # The extension is on the path; CDN URLs add ?width=, ?v= and the like
+        path_lower = urlparse(url_lower).path
+
         # Skip SVG and icon formats
-        if url_lower.endswith(('.svg', '.ico')):
+        if path_lower.endswith(('.svg', '.ico')):
             return False
 
         # Accept all common image formats
-        if url_lower.endswith(('.jpg', '.jpeg', '.png', '.webp')):
+        if path_lower.endswith(('.jpg', '.jpeg', '.png', '.webp', '.avif')):
             return True
 
         return False
 
-    def _get_image_size_score(self, img_url):
-        """Score image based on likely size (rough heuristic)"""
+    def _get_image_size_score(self, img_url, width=None):
+        """Score image based on its declared width, else likely size (rough heuristic)"""
+        if width:
+            # A srcset variant wide enough for IMAGE_TARGET_WIDTH ranks with master images
+            return 10 if width >= config.IMAGE_TARGET_WIDTH else 5
+
         url_lower = img_url.lower()
 
         # Higher score for large/master images
@@ -115,21 +147,141 @@ class ImageExtractor:
 
     def download_image(self, img_url, output_path):
         """Download image to specified path"""
+        return self.fetch_image(img_url, output_path) is not None
+
+    def fetch_image(self, img_url, output_path, etag=None, last_modified=None):
+        """Stream an image to output_path, conditionally if validators are given
+
+        The body is read in chunks: the first bytes must carry an image
+        signature and the total may not exceed MAX_IMAGE_BYTES, otherwise
+        the download stops early. Data goes to a temp file next to
+        output_path that is renamed into place only once complete.
+
+        Returns None on failure, else a dict with 'not_modified' (True on
+        304; nothing is written) and the validators of the stored bytes:
+        the response's 'etag' and 'last_modified' after a download, the
+        given ones (unless the 304 updates them) when not modified.
+        """
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+        temp_path = None
         try:
-            response = self.session.get(img_url)
-            response.raise_for_status()
-
-            # Verify it's actually an image
-            content_type = response.headers.get('content-type', '').lower()
-            if not content_type.startswith('image/'):
-                return False
-
-            # Save image
-            with open(output_path, 'wb') as f:
-                f.write(response.content)
-
-            return True
+            with self.session.get(img_url, headers=headers, stream=True,
+                                  timeout=config.REQUEST_TIMEOUT) as response:
+                if response.status_code == 304:
+                    return {
+                        'not_modified': True,
+                        'etag': response.headers.get('etag') or etag,
+                        'last_modified': response.headers.get('last-modified') or last_modified
+                    }
+                response.raise_for_status()
+                # New bytes: validators of an older copy must not be kept
+                result = {
+                    'not_modified': False,
+                    'etag': response.headers.get('etag'),
+                    'last_modified': response.headers.get('last-modified')
+                }
+
+                content_length = response.headers.get('content-length', '')
+                if content_length.isdigit() and int(content_length) > config.MAX_IMAGE_BYTES:
+                    print(f"Skipping image {img_url}: {content_length} bytes exceeds MAX_IMAGE_BYTES")
+                    return None
+
+                chunks = response.iter_content(chunk_size=IMAGE_CHUNK_SIZE)
+                head = b''
+                for chunk in chunks:
+                    head += chunk
+                    if len(head) >= SNIFF_BYTES:
+                        break
+
+                # Verify it's actually an image from its signature, not the header
+                if not sniff_image_type(head):
+                    print(f"Skipping image {img_url}: not an image "
+                          f"({response.headers.get('content-type', 'no content-type')})")
+                    return None
+
+                fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(output_path) or '.', suffix='.part')
+                size = len(head)
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(head)
+                    for chunk in chunks:
+                        size += len(chunk)
+                        if size > config.MAX_IMAGE_BYTES:
+                            print(f"Skipping image {img_url}: exceeds MAX_IMAGE_BYTES")
+                            return None
+                        f.write(chunk)
+
+            os.replace(temp_path, output_path)
+            temp_path = None
+            return result
 
         except Exception as e:
             print(f"Error downloading image {img_url}: {e}")
-            return False
+            return None
+
+        finally:
+            if temp_path:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+
+def select_image_variant(image, target_width=None):
+    """Pick the URL to download for an extracted image ({'src', 'candidates'})
+
+    Among the srcset/<picture> variants at least target_width wide, an
+    IMAGE_PREFERRED_FORMATS format wins, then the smallest width; when none
+    is wide enough the widest is used. Without declared widths the plain
+    src is kept.
+    """
+    candidate = select_image_candidate(image, target_width)
+    return candidate['url'] if candidate else image.get('src')
+
+def select_image_candidate(image, target_width=None):
+    """The candidate select_image_variant() picks, or None if no widths are declared"""
+    target_width = target_width or config.IMAGE_TARGET_WIDTH
+    sized = [candidate for candidate in image.get('candidates') or [] if candidate['width']]
+    if not sized:
+        return None
+
+    large_enough = [candidate for candidate in sized if candidate['width'] >= target_width]
+    if not large_enough:
+        return max(sized, key=lambda candidate: candidate['width'])
+
+    def format_rank(candidate):
+        image_format = image_format_of(candidate)
+        if image_format in config.IMAGE_PREFERRED_FORMATS:
+            return config.IMAGE_PREFERRED_FORMATS.index(image_format)
+        return len(config.IMAGE_PREFERRED_FORMATS)
+
+    return min(large_enough, key=lambda candidate: (format_rank(candidate), candidate['width']))
+
+def image_key(url):
+    """Host and path of an absolute image URL, to match variants that differ only in query"""
+    parts = urlsplit(url)
+    return parts.netloc.lower() + parts.path
+
+def image_format_of(candidate):
+    """Image format of a candidate from its <source type> or URL, e.g. 'webp'"""
+    if candidate.get('type', '').startswith('image/'):
+        return candidate['type'][6:].lower()
+    match = URL_FORMAT_PATTERN.search(candidate['url'])
+    return match.group(1).lower().replace('jpeg', 'jpg') if match else ''
+
+def sniff_image_type(data):
+    """Return the image extension matching the leading bytes, or None"""
+    if data.startswith(b'\xff\xd8\xff'):
+        return 'jpg'
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if data.startswith((b'GIF87a', b'GIF89a')):
+        return 'gif'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    if data[4:8] == b'ftyp' and data[8:12] in (b'avif', b'avis'):
+        return 'avif'
+    return None
@@ -0,0 +1,160 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+import config
+
+# Per-process extractor and parser, created once by _init_worker
+_extractor = None
+_product_parser = None
+
+def _init_worker(base_url):
+    global _extractor, _product_parser
+    from extractor.raw_content import RawContentExtractor
+    from ai.product_parser import ProductParser
+
+    _extractor = RawContentExtractor()
+    _product_parser = ProductParser(base_url)
+
+def _extract_product(url, html_content, captured_json=None):
+    """Worker: HTML -> normalized product data (or None); runs in a child process"""
+    raw_content = _extractor.extract_content(html_content)
+    if not raw_content:
+        return None
+    return _product_parser.parse_product_page(raw_content, url, captured_json)
+
+class ExtractionPool:
+    """Runs content extraction and product parsing on a process pool
+
+    Parsing is CPU-bound, so it moves off the fetch loop's process and its
+    GIL. At most max_pending pages are queued for the workers; once that
+    many are in flight process_pages() stops pulling from the fetcher, which
+    in turn stops fetching, so memory stays bounded.
+
+    If a worker process dies the pool is rebuilt and the pages that were
+    queued on it are submitted once more; after EXTRACTION_MAX_RESTARTS
+    rebuilds the remaining pages are extracted in this process.
+    """
+
+    def __init__(self, base_url="", workers=None, max_pending=None):
+        self.base_url = base_url
+        self.workers = workers or config.EXTRACTION_WORKERS or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * config.EXTRACTION_PENDING_PER_WORKER
+        self.restarts = 0
+        self._executor = None
+        self._generation = 0  # bumped on every pool rebuild
+        self._in_process = False
+
+    def __enter__(self):
+        self._start()
+        print(f"DEBUG: Extraction pool started with {self.workers} processes")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._executor:
+            self._executor.shutdown(wait=exc_type is None, cancel_futures=exc_type is not None)
+            self._executor = None
+
+    def process_pages(self, pages, captured_json=None):
+        """Yield (url, product_data) for (url, html_content) pairs, in completion order
+
+        product_data is None for pages that hold no product, and False for
+        pages that failed to fetch or whose extraction raised (printed).
+        captured_json, if given, is called with each URL and returns the JSON
+        responses captured while rendering it (TieredFetcher.pop_captured_json).
+        """
+        # future -> (url, html_content, captured, attempt, pool generation)
+        pending = {}
+
+        for url, html_content in pages:
+            if not html_content:
+                yield url, False
+            else:
+                captured = captured_json(url) if captured_json else None
+                job = (url, html_content, captured, 0)
+                if not self._submit(job, pending):
+                    yield self._extract_here(job)
+
+            # Hand back whatever is finished; block only when the queue is full
+            done = [future for future in pending if future.done()]
+            if len(pending) - len(done) >= self.max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = self._result(future, pending.pop(future), pending)
+                if result:
+                    yield result
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = self._result(future, pending.pop(future), pending)
+                if result:
+                    yield result
+
+    def _start(self):
+        # spawn: forking a process that runs Playwright and fetch threads is unsafe
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self.base_url,)
+        )
+
+    def _restart(self):
+        """Replace a broken pool, or switch to in-process extraction after too many restarts"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        if self.restarts >= config.EXTRACTION_MAX_RESTARTS:
+            print("Extraction workers keep crashing, extracting in this process from now on")
+            self._in_process = True
+            return
+        self.restarts += 1
+        self._generation += 1
+        print(f"Extraction worker crashed, restarting the pool ({self.restarts}/{config.EXTRACTION_MAX_RESTARTS})")
+        self._start()
+
+    def _submit(self, job, pending):
+        """Queue (url, html_content, captured, attempt), rebuilding a broken pool
+
+        Returns False once extraction has fallen back to this process.
+        """
+        while not self._in_process:
+            try:
+                future = self._executor.submit(_extract_product, *job[:3])
+            except BrokenProcessPool:
+                self._restart()
+                continue
+            pending[future] = job + (self._generation,)
+            return True
+        return False
+
+    def _result(self, future, job, pending):
+        """(url, product_data) of a finished future, or None if its job was resubmitted"""
+        url, html_content, captured, attempt, generation = job
+        try:
+            return url, future.result()
+        except BrokenProcessPool:
+            # Every future of a broken pool fails; rebuild it once, for the first
+            if generation == self._generation and not self._in_process:
+                self._restart()
+            # The crashing page may be this one; give every page one more try
+            if attempt == 0:
+                if self._submit((url, html_content, captured, 1), pending):
+                    return None
+                return self._extract_here(job)
+            print(f"Error processing {url}: extraction worker crashed")
+            return url, False
+        except Exception as e:
+            print(f"Error processing {url}: {e}")
+            return url, False
+
+    def _extract_here(self, job):
+        """Extract a page in this process (fallback once the pool is given up)"""
+        url, html_content, captured = job[:3]
+        if _extractor is None:
+            _init_worker(self.base_url)
+        try:
+            return url, _extract_product(url, html_content, captured)
+        except Exception as e:
+            print(f"Error processing {url}: {e}")
+            return url, False
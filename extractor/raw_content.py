@@ -1,27 +1,415 @@
 from bs4 import BeautifulSoup
+from lxml import etree
+import html
 import json
 import re
+from collections.abc import Mapping
+import config
+
+# Elements whose text is not page text (BeautifulSoup's html.parser keeps it
+# as Script/Stylesheet/TemplateString/ruby strings, which get_text() skips)
+NON_TEXT_TAGS = {'script', 'style', 'template', 'rt', 'rp'}
+HEADING_LEVELS = {'h1': 1, 'h2': 2, 'h3': 3}
+IMAGE_SRC_ATTRIBUTES = ('src', 'data-src', 'data-lazy-src', 'data-original', 'data-url')
+IMAGE_SRCSET_ATTRIBUTES = ('srcset', 'data-srcset')
+SRCSET_URL_PATTERN = re.compile(r'[\s,]*(\S+)')
+
+# Head-only scanner: the tags it cares about, comments, and where the head ends
+HEAD_TAG_PATTERN = re.compile(
+    r'<(?:(?P<comment>!--)|(?P<close>/?)(?P<tag>script|style|meta|title|head|body)\b'
+    r'(?P<attrs>(?:[^>"\']|"[^"]*"|\'[^\']*\')*)>)',
+    re.IGNORECASE
+)
+SCRIPT_TAG_PATTERN = re.compile(r'<script\b(?P<attrs>(?:[^>"\']|"[^"]*"|\'[^\']*\')*)>', re.IGNORECASE)
+ATTRIBUTE_PATTERN = re.compile(r'([^\s=/>"\']+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+)))?')
+RAW_TEXT_END = {tag: re.compile(rf'</{tag}\s*>', re.IGNORECASE) for tag in ('script', 'style', 'title')}
+
+def iter_text(element):
+    """Yield an element's text pieces in document order, without its own tail
+
+    Text inside NON_TEXT_TAGS and comments is skipped, like get_text().
+    """
+    non_text_depth = 0
+    for event, node in etree.iterwalk(element, events=('start', 'end', 'comment', 'pi')):
+        if event == 'start':
+            if node.tag in NON_TEXT_TAGS:
+                non_text_depth += 1
+            elif node.text and not non_text_depth:
+                yield node.text
+            continue
+
+        if event == 'end':
+            if node is element:
+                return
+            if node.tag in NON_TEXT_TAGS:
+                non_text_depth -= 1
+        # Tails (also of comments and processing instructions) belong to the parent
+        if node.tail and not non_text_depth:
+            yield node.tail
+
+def parse_srcset(value):
+    """Split a srcset attribute into (url, descriptor) pairs, e.g. ('a.jpg', '1200w')
+
+    URLs may contain commas (CDN transform paths), so a candidate's URL is
+    the run of non-space characters and its descriptor runs to the next comma.
+    """
+    candidates = []
+    position = 0
+    while True:
+        match = SRCSET_URL_PATTERN.match(value, position)
+        if not match:
+            return candidates
+        url = match.group(1)
+        position = match.end()
+        descriptor = ''
+        if url.endswith(','):
+            url = url.rstrip(',')
+        else:
+            end = value.find(',', position)
+            end = len(value) if end == -1 else end
+            descriptor = value[position:end].strip()
+            position = end + 1
+        if url:
+            candidates.append((url, descriptor))
+
+def image_candidates(img, sources):
+    """Declared variants of an image: its own srcset plus <picture> <source> elements
+
+    img and sources are lxml or BeautifulSoup elements (both support get()).
+    Each candidate is {'url', 'width', 'type'}; width comes from a 'w'
+    descriptor, or an 'x' density times the img width attribute, else None.
+    """
+    declared_width = img.get('width') or ''
+    base_width = int(declared_width) if declared_width.isdigit() else None
+
+    candidates = []
+    for element in list(sources) + [img]:
+        srcset = next(filter(None, map(element.get, IMAGE_SRCSET_ATTRIBUTES)), None)
+        if not srcset:
+            continue
+        image_type = element.get('type') or ''
+        for url, descriptor in parse_srcset(srcset):
+            width = None
+            try:
+                if descriptor.endswith('w'):
+                    width = int(descriptor[:-1])
+                elif descriptor.endswith('x') and base_width:
+                    width = round(float(descriptor[:-1]) * base_width)
+            except ValueError:
+                pass
+            candidates.append({'url': url, 'width': width, 'type': image_type})
+    return candidates
+
+def html_to_text(value):
+    """Plain text of an HTML fragment such as a product description from an API"""
+    text = html.unescape(re.sub(r'<[^>]+>', ' ', str(value)))
+    return ' '.join(text.split())
+
+class RawContent(Mapping):
+    """Raw page content with dict-style access, computed on demand
+
+    Nothing is parsed until a field is read. The first read fills every
+    field from one walk over the lxml tree and memoizes them (BeautifulSoup
+    computes fields one by one); in head mode, a page whose head has Product
+    JSON-LD answers title, JSON-LD and meta without a tree at all.
+    text(limit) stops walking the page once limit characters are found.
+    """
+
+    FIELDS = ('title', 'headings', 'text_content', 'images', 'structured_data', 'meta_tags')
+    HEAD_FIELDS = ('title', 'structured_data', 'meta_tags')
+
+    def __init__(self, html_content, extractor):
+        self._html = html_content
+        self._extractor = extractor
+        self._fields = {}
+        self._document = None
+        self._head_scanned = False
+
+    def __getitem__(self, key):
+        if key not in self._fields:
+            if key not in self.FIELDS:
+                raise KeyError(key)
+            self._load(key)
+        return self._fields[key]
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+    def __repr__(self):
+        return f"RawContent(computed={sorted(self._fields)})"
+
+    def text(self, limit=None):
+        """Visible page text, at most limit characters"""
+        if 'text_content' in self._fields or limit is None:
+            return self['text_content'][:limit]
+        return self._extractor.text(self._get_document(), limit)
+
+    def _load(self, key):
+        if key in self.HEAD_FIELDS and self._extractor.mode == 'head' and not self._head_scanned:
+            self._head_scanned = True
+            head = self._extractor.extract_head(self._html)
+            # Almost every page has some meta tags; only a Product makes the
+            # head enough for ProductParser without images, headings or text
+            if self._extractor._has_product(head['structured_data']):
+                self._fields.update(head)
+                return
+            print("DEBUG: No Product JSON-LD found in head scan, reading the full page")
+        # Fields already read (e.g. from the head scan) keep their values
+        for field, value in self._extractor.extract_fields(self._get_document(), key).items():
+            self._fields.setdefault(field, value)
+
+    def _get_document(self):
+        if self._document is None:
+            self._document = self._extractor.parse(self._html)
+        return self._document
 
 class RawContentExtractor:
-    """Extracts raw content from HTML pages"""
+    """Extracts raw content from HTML pages
+
+    extract_content() returns a lazy RawContent. Fields come from an lxml
+    tree by default; the "soup" engine is the original BeautifulSoup
+    implementation, kept as a fallback for documents lxml cannot parse and
+    as the reference for benchmarks/bench_raw_content.py. In "head" mode
+    title, JSON-LD and meta tags are found by a tokenizer scan without
+    building any tree.
+    """
+
+    def __init__(self, engine=None, mode=None):
+        self.engine = engine or config.EXTRACTOR_ENGINE
+        self.mode = mode or config.EXTRACTOR_MODE
+        self._parser = etree.HTMLParser(encoding='utf-8')
 
     def extract_content(self, html_content):
         """Extract raw content from HTML"""
         if not html_content:
             return None
 
-        soup = BeautifulSoup(html_content, 'html.parser')
+        if isinstance(html_content, bytes):
+            html_content = html_content.decode('utf-8', 'replace')
+        return RawContent(html_content, self)
+
+    def parse(self, html_content):
+        """Parse a page for extract_fields(): an lxml root, or a BeautifulSoup"""
+        if self.engine == 'lxml':
+            try:
+                root = etree.fromstring(html_content.encode('utf-8', 'replace'), self._parser)
+                if root is not None:
+                    return root
+                print("DEBUG: lxml found no document, falling back to BeautifulSoup")
+            except (etree.LxmlError, ValueError) as e:
+                print(f"DEBUG: lxml parsing failed ({e}), falling back to BeautifulSoup")
+
+        return BeautifulSoup(html_content, 'html.parser')
+
+    def extract_fields(self, document, field):
+        """Fields of a parsed page that reading field computes
+
+        lxml fills every field in one walk over the tree; BeautifulSoup
+        extracts just the requested one.
+        """
+        if isinstance(document, BeautifulSoup):
+            return {field: getattr(self, f'_extract_{field}')(document)}
+        return self._lxml_fields(document)
+
+    def text(self, document, limit=None):
+        """Visible text of a parsed page, stopping once limit characters are found"""
+        if isinstance(document, BeautifulSoup):
+            return self._extract_text_content(document)[:limit]
 
-        content = {
-            'title': self._extract_title(soup),
-            'headings': self._extract_headings(soup),
-            'text_content': self._extract_text_content(soup),
-            'images': self._extract_images(soup),
-            'structured_data': self._extract_structured_data(soup),
-            'meta_tags': self._extract_meta_tags(soup)
+        pieces = []
+        size = 0
+        check_at = limit * 2 if limit is not None else None
+        for piece in iter_text(document):
+            pieces.append(piece)
+            size += len(piece)
+            if check_at is not None and size >= check_at:
+                text = self._clean_text(''.join(pieces))
+                # Everything before the last phrase is final; it may still grow
+                if text.rfind(' ') >= limit:
+                    return text[:limit]
+                check_at = size * 2
+
+        return self._clean_text(''.join(pieces))[:limit]
+
+    def extract_head(self, html_content):
+        """Scan for title, meta tags and JSON-LD without building a tree
+
+        Tags are tokenized up to the end of <head>; script, style and title
+        bodies and comments are skipped with one find() each. JSON-LD in the
+        body is only searched for when the head had no Product, by jumping
+        between "ld+json" occurrences. Meta tags in the body are not collected.
+        """
+        title = None
+        structured_data = []
+        meta_tags = {}
+        body_start = len(html_content)
+        pos = 0
+
+        while True:
+            match = HEAD_TAG_PATTERN.search(html_content, pos)
+            if not match:
+                break
+            pos = match.end()
+
+            if match.group('comment'):
+                end = html_content.find('-->', pos)
+                pos = len(html_content) if end < 0 else end + 3
+                continue
+
+            tag = match.group('tag').lower()
+            if tag == 'body' or (tag == 'head' and match.group('close')):
+                body_start = match.start()
+                break
+            if match.group('close') or tag == 'head':
+                continue
+
+            attributes = self._parse_attributes(match.group('attrs'))
+            if tag == 'meta':
+                name = attributes.get('name') or attributes.get('property')
+                content = attributes.get('content')
+                if name and content:
+                    meta_tags[name] = content
+                continue
+
+            # script, style, title: raw text up to the closing tag
+            end = RAW_TEXT_END[tag].search(html_content, pos)
+            text = html_content[pos:end.start() if end else len(html_content)]
+            pos = end.end() if end else len(html_content)
+            if tag == 'title' and title is None:
+                title = html.unescape(text).strip()
+            elif tag == 'script' and attributes.get('type') == 'application/ld+json':
+                self._add_json_ld(structured_data, text)
+
+        if not self._has_product(structured_data):
+            pos = body_start
+            while True:
+                found = html_content.find('ld+json', pos)
+                if found < 0:
+                    break
+                pos = found + 7
+                tag_start = html_content.rfind('<', body_start, found)
+                match = SCRIPT_TAG_PATTERN.match(html_content, tag_start) if tag_start >= 0 else None
+                if not match or match.end() <= found:
+                    continue
+                if self._parse_attributes(match.group('attrs')).get('type') != 'application/ld+json':
+                    continue
+                end = RAW_TEXT_END['script'].search(html_content, match.end())
+                self._add_json_ld(structured_data, html_content[match.end():end.start() if end else len(html_content)])
+                pos = end.end() if end else len(html_content)
+
+        return {
+            'title': title or '',
+            'structured_data': structured_data,
+            'meta_tags': meta_tags
+        }
+
+    @staticmethod
+    def _parse_attributes(text):
+        attributes = {}
+        for name, double_quoted, single_quoted, unquoted in ATTRIBUTE_PATTERN.findall(text):
+            # Like lxml, the first of duplicate attributes wins
+            attributes.setdefault(name.lower(), html.unescape(double_quoted or single_quoted or unquoted))
+        return attributes
+
+    @staticmethod
+    def _add_json_ld(structured_data, text):
+        try:
+            structured_data.append(json.loads(text))
+        except json.JSONDecodeError:
+            pass
+
+    @staticmethod
+    def _has_product(structured_data):
+        return any(isinstance(data, dict) and data.get('@type') == 'Product' for data in structured_data)
+
+    def _lxml_fields(self, root):
+        """Single pass: title, headings, text, images, JSON-LD and meta together"""
+        title = None
+        headings = {1: [], 2: [], 3: []}
+        open_headings = []
+        text_parts = []
+        images = []
+        structured_data = []
+        meta_tags = {}
+        non_text_depth = 0
+
+        def add_text(text):
+            text_parts.append(text)
+            for heading in open_headings:
+                heading[1].append(text)
+
+        for event, element in etree.iterwalk(root, events=('start', 'end', 'comment', 'pi')):
+            if event == 'start':
+                tag = element.tag
+                if tag in NON_TEXT_TAGS:
+                    non_text_depth += 1
+                    if tag == 'script' and element.get('type') == 'application/ld+json':
+                        try:
+                            structured_data.append(json.loads(element.text))
+                        except (json.JSONDecodeError, TypeError):
+                            pass
+                elif tag in HEADING_LEVELS:
+                    heading = [HEADING_LEVELS[tag], []]
+                    headings[heading[0]].append(heading)
+                    open_headings.append(heading)
+                elif tag == 'img':
+                    image = self._lxml_image(element)
+                    if image:
+                        images.append(image)
+                elif tag == 'meta':
+                    name = element.get('name') or element.get('property')
+                    content = element.get('content')
+                    if name and content:
+                        meta_tags[name] = content
+                elif tag == 'title' and title is None:
+                    title = ''.join(element.itertext())
+
+                if element.text and not non_text_depth:
+                    add_text(element.text)
+                continue
+
+            if event == 'end':
+                tag = element.tag
+                if tag in NON_TEXT_TAGS:
+                    non_text_depth -= 1
+                elif tag in HEADING_LEVELS:
+                    open_headings.pop()
+            # Tails (also of comments and processing instructions) belong to the parent
+            if element.tail and not non_text_depth:
+                add_text(element.tail)
+
+        return {
+            'title': (title or '').strip(),
+            'headings': [
+                {'level': level, 'text': text}
+                for level in (1, 2, 3)
+                for text in (''.join(parts).strip() for _, parts in headings[level])
+                if text
+            ],
+            'text_content': self._clean_text(''.join(text_parts)),
+            'images': images,
+            'structured_data': structured_data,
+            'meta_tags': meta_tags
         }
 
-        return content
+    @staticmethod
+    def _lxml_image(img):
+        src = next(filter(None, map(img.get, IMAGE_SRC_ATTRIBUTES)), None)
+        # libxml2 does not know <source> is void and nests what follows inside it
+        parent = img.getparent()
+        while parent is not None and parent.tag == 'source':
+            parent = parent.getparent()
+        sources = parent.iter('source') if parent is not None and parent.tag == 'picture' else []
+        candidates = image_candidates(img, sources)
+        if not src and not candidates:
+            return None
+        return {'src': src or candidates[-1]['url'], 'alt': img.get('alt', ''), 'candidates': candidates}
 
     def _extract_title(self, soup):
         """Extract page title"""
@@ -44,18 +432,16 @@ class RawContentExtractor:
 
     def _extract_text_content(self, soup):
         """Extract visible text content"""
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
+        # get_text() skips script and style strings, so the tree is left intact
+        # for fields read later
+        return self._clean_text(soup.get_text())
 
-        # Get text
-        text = soup.get_text()
-        # Clean up whitespace
+    @staticmethod
+    def _clean_text(text):
+        """Collapse whitespace: one space between non-empty lines and phrases"""
         lines = (line.strip() for line in text.splitlines())
         chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = ' '.join(chunk for chunk in chunks if chunk)
-
-        return text
+        return ' '.join(chunk for chunk in chunks if chunk)
 
     def _extract_images(self, soup):
         """Extract image URLs"""
@@ -71,10 +457,16 @@ class RawContentExtractor:
                    img.get('data-url'))
             alt = img.get('alt', '')
 
-            if src:
+            # srcset and <picture> sources declare the sized variants
+            parent = img.parent
+            sources = parent.find_all('source') if parent and parent.name == 'picture' else []
+            candidates = image_candidates(img, sources)
+
+            if src or candidates:
                 images.append({
-                    'src': src,
-                    'alt': alt
+                    'src': src or candidates[-1]['url'],
+                    'alt': alt,
+                    'candidates': candidates
                 })
 
         return images
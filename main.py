@@ -4,31 +4,41 @@ Universal E-commerce Parser
 Scrapes any online store using AI-powered product detection
 """
 
+import argparse
 import sys
 import os
 from urllib.parse import urlparse
-import time
 
 # Add current directory to path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from crawler.sitemap import SitemapParser
-from crawler.fetcher import PageFetcher
+from crawler.platforms import detect_platform
+from crawler.canonical import URLCanonicalizer
+from crawler.tiered_fetcher import TieredFetcher
 from crawler.filters import URLFilter
-from extractor.raw_content import RawContentExtractor
+from crawler.frontier import CrawlFrontier
+from crawler.url_classifier import URLClassifier
+from extractor.image_downloader import ImageDownloader
+from extractor.pipeline import ExtractionPool
 from ai.product_parser import ProductParser
 from storage.csv_writer import CSVWriter
 from storage.image_store import ImageStore
+from storage.url_state import UrlStateStore
 import config
 
 def main():
     """Main entry point"""
-    if len(sys.argv) != 2:
-        print("Usage: python main.py <website_url>")
-        print("Example: python main.py https://atelierhome-art.com")
-        sys.exit(1)
-
-    website_url = sys.argv[1].rstrip('/')
+    arg_parser = argparse.ArgumentParser(
+        description="Universal E-commerce Parser",
+        epilog="Example: python main.py https://atelierhome-art.com"
+    )
+    arg_parser.add_argument('website_url', help="Store URL")
+    arg_parser.add_argument('--incremental', action='store_true',
+                            help="Only fetch URLs that are new or whose sitemap lastmod advanced")
+    args = arg_parser.parse_args()
+
+    website_url = args.website_url.rstrip('/')
     print(f"Starting e-commerce parser for: {website_url}")
 
     # Validate URL
@@ -41,73 +51,126 @@ def main():
         sys.exit(1)
 
     # Initialize components
+    image_store = None
     try:
         print("Initializing components...")
         sitemap_parser = SitemapParser(website_url)
         url_filter = URLFilter(website_url)
-        content_extractor = RawContentExtractor()
         product_parser = ProductParser(website_url)
         csv_writer = CSVWriter("output")
         image_store = ImageStore("output")
-
-        # Get all URLs from sitemap
-        print("Fetching sitemap URLs...")
-        all_urls = sitemap_parser.get_all_urls()
-        print(f"Found {len(all_urls)} URLs in sitemap")
-
-        # Filter URLs
-        filtered_urls = url_filter.filter_urls(all_urls)
-        print(f"Filtered to {len(filtered_urls)} relevant URLs")
+        url_state = UrlStateStore()
+
+        # Stores with a public catalog API (Shopify, WooCommerce) are read in bulk
+        canonicalizer = URLCanonicalizer()
+        catalog = detect_platform(website_url) if config.PLATFORM_BULK_CATALOG else None
+        bulk_products = {}
+        if catalog:
+            print(f"Fetching products from the {catalog.platform} catalog API...")
+            entries, bulk_products = catalog.collect(canonicalizer.canonicalize, product_parser.finalize_product)
+        else:
+            # Get all URLs from sitemap
+            print("Fetching sitemap URLs...")
+            entries = sitemap_parser.get_all_entries()
+            print(f"Found {len(entries)} URLs in sitemap")
+
+            # Normalize URLs and collapse locale variants of the same page
+            entries = canonicalizer.dedupe_entries(entries)
+
+        url_state.record_seen(entries)
+        if args.incremental:
+            entries = url_state.select_changed(entries)
+            print(f"Incremental mode: {len(entries)} new or changed URLs")
+        all_urls = [entry.url for entry in entries]
+
+        frontier = CrawlFrontier()
+        if catalog:
+            # Only pages of products the API could not fully describe are rendered
+            bulk_products = {url: bulk_products[url] for url in all_urls}
+            render_urls = {url for url, product in bulk_products.items() if catalog.missing_fields(product)}
+            print(f"{len(render_urls)} products need their page rendered for missing fields")
+            frontier.add_entries([entry for entry in entries if entry.url in render_urls],
+                                 labels=dict.fromkeys(render_urls, 'product'))
+        else:
+            # Filter URLs
+            filtered_urls = set(url_filter.filter_urls(all_urls))
+            print(f"Filtered to {len(filtered_urls)} relevant URLs")
+
+            # Spend the MAX_PAGES budget on the most likely products first
+            frontier.add_entries(
+                [entry for entry in entries if entry.url in filtered_urls],
+                labels=URLClassifier(use_llm=False).label_urls(list(filtered_urls)),
+                extracted_urls=url_state.extracted_urls()
+            )
+        budget = min(len(frontier), config.MAX_PAGES)
+        print(f"Crawling {budget} of {len(frontier)} URLs in priority order")
 
         # Process pages
-        products_found = 0
         products = []
 
-        with PageFetcher() as fetcher:
-            for i, url in enumerate(filtered_urls, 1):
-                print(f"Processing {i}/{len(filtered_urls)}: {url}")
+        # Incremental runs keep the IDs of products already in the catalog
+        existing_ids = csv_writer.get_existing_ids_by_url() if args.incremental else {}
+        next_id = max((int(i) for i in existing_ids.values() if i.isdigit()), default=0)
 
-                try:
-                    # Fetch page content
-                    html_content = fetcher.fetch_page(url)
-                    if not html_content:
-                        continue
+        def add_product(product_data, url):
+            nonlocal next_id
+            # Add product ID
+            if url not in existing_ids:
+                next_id += 1
+            product_data['id'] = existing_ids.get(url) or str(next_id)
 
-                    # Extract raw content
-                    raw_content = content_extractor.extract_content(html_content)
-                    if not raw_content:
-                        continue
+            # Images download in the background; filenames replace the image
+            # dicts once the product's last download finishes
+            image_downloader.submit(
+                product_data, product_parser.image_jobs(product_data, "output", product_data['id'])
+            )
 
-                    # Parse product data
-                    product_data = product_parser.parse_product_page(raw_content, url)
-                    if product_data:
-                        # Add product ID
-                        product_data['id'] = str(products_found + 1)
+            products.append(product_data)
 
-                        # Download images
-                        downloaded_images = product_parser.download_product_images(
-                            product_data, "output", product_data['id']
-                        )
+            print(f"✓ Found product: {product_data.get('title', 'Unknown')}")
 
-                        # Update product data with downloaded image filenames
-                        product_data['images'] = downloaded_images
+        with ImageDownloader(image_store=image_store) as image_downloader, \
+                ExtractionPool(website_url) as extraction_pool, TieredFetcher() as fetcher:
+            # Pages are rendered concurrently and arrive in completion order;
+            # extraction and parsing run on the process pool meanwhile
+            pages = fetcher.fetch_many(frontier.drain(budget))
+            for i, (url, product_data) in enumerate(extraction_pool.process_pages(pages, fetcher.pop_captured_json), 1):
+                print(f"Processing {i}/{budget}: {url}")
 
-                        products.append(product_data)
-                        products_found += 1
+                try:
+                    if url in bulk_products:
+                        # The rendered page only fills what the catalog API lacked
+                        product_data = catalog.fill_missing(bulk_products.pop(url), product_data or {})
+                    elif product_data is False:
+                        continue
 
-                        print(f"✓ Found product: {product_data.get('title', 'Unknown')}")
+                    if product_data:
+                        add_product(product_data, url)
 
-                    # Rate limiting
-                    time.sleep(1)
+                    url_state.mark_extracted(url)
 
                 except Exception as e:
                     print(f"Error processing {url}: {e}")
                     continue
 
+            # Catalog API products that were complete (or beyond the render budget)
+            for url, product_data in bulk_products.items():
+                try:
+                    add_product(product_data, url)
+                    url_state.mark_extracted(url)
+                except Exception as e:
+                    print(f"Error processing {url}: {e}")
+
+        # Drop objects no product file links to, e.g. ones replaced by new downloads
+        image_store.prune_objects()
+
         # Save results
         if products:
             print(f"\nSaving {len(products)} products...")
-            csv_writer.write_products(products)
+            if args.incremental:
+                csv_writer.merge_products(products)
+            else:
+                csv_writer.write_products(products)
 
             # Print summary
             print("\n" + "="*50)
@@ -129,6 +192,9 @@ def main():
     except Exception as e:
         print(f"Error: {e}")
         sys.exit(1)
+    finally:
+        if image_store:
+            image_store.close()
 
 if __name__ == "__main__":
     main()
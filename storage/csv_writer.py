@@ -2,6 +2,8 @@ import csv
 import os
 from typing import List, Dict
 
+FIELDNAMES = ['id', 'url', 'title', 'description', 'price', 'old_price', 'currency', 'images']
+
 class CSVWriter:
     """Handles writing product data to CSV format"""
 
@@ -30,8 +32,7 @@ class CSVWriter:
         header = not (append and os.path.exists(self.catalog_path))
 
         with open(self.catalog_path, mode, newline='', encoding='utf-8') as csvfile:
-            fieldnames = ['id', 'url', 'title', 'description', 'price', 'old_price', 'currency', 'images']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
 
             if header:
                 writer.writeheader()
@@ -77,6 +78,34 @@ class CSVWriter:
         except Exception:
             return set()
 
+    def get_existing_ids_by_url(self) -> Dict[str, str]:
+        """Map product URL to its ID in the existing CSV"""
+        return {row['url']: row['id'] for row in self._read_rows() if row.get('url') and row.get('id')}
+
+    def merge_products(self, products: List[Dict]):
+        """Update the existing CSV in place: replace rows with the same URL, add new ones"""
+        new_rows = [self._product_to_csv_row(product) for product in products]
+        new_urls = {row['url'] for row in new_rows}
+        rows = [row for row in self._read_rows() if row.get('url') not in new_urls] + new_rows
+        rows.sort(key=lambda row: int(row['id']) if str(row.get('id', '')).isdigit() else 0)
+
+        with open(self.catalog_path, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+
+        print(f"Merged {len(new_rows)} products into {self.catalog_path} ({len(rows)} total)")
+
+    def _read_rows(self) -> List[Dict]:
+        if not os.path.exists(self.catalog_path):
+            return []
+
+        try:
+            with open(self.catalog_path, 'r', newline='', encoding='utf-8') as csvfile:
+                return list(csv.DictReader(csvfile))
+        except Exception:
+            return []
+
     def append_product(self, product: Dict):
         """Append a single product to CSV"""
         self.write_products([product], append=True)
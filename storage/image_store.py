@@ -1,15 +1,180 @@
+import hashlib
 import os
 import shutil
-from typing import List, Dict
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, List, Dict, Optional
+from extractor.images import SNIFF_BYTES, sniff_image_type
+import config
 
 class ImageStore:
-    """Manages storage of downloaded product images"""
+    """Manages storage of downloaded product images
 
-    def __init__(self, output_dir: str = "output"):
+    Image bytes are stored once, content-addressed, under
+    image_objects/ab/cd/<sha256>.<ext>; the per-product {id}-{i}.{ext} files
+    in images/ are hardlinks to them (copies where linking is not possible).
+    A persistent URL index maps source URLs to objects and their ETag /
+    Last-Modified. A URL stored by an earlier run is revalidated once per
+    run with a conditional request and its object reused on 304; within a
+    run it is not requested again. Objects no product file links to any
+    more are deleted by prune_objects(), which runs at the end of a run.
+    """
+
+    def __init__(self, output_dir: str = "output", index_path: Optional[str] = None,
+                 revalidate: Optional[bool] = None):
         self.output_dir = output_dir
         self.images_dir = os.path.join(output_dir, "images")
+        self.objects_dir = os.path.join(output_dir, "image_objects")
         os.makedirs(self.images_dir, exist_ok=True)
 
+        self.revalidate = config.IMAGE_REVALIDATE if revalidate is None else revalidate
+        self.index_path = index_path or config.IMAGE_INDEX_PATH
+        os.makedirs(os.path.dirname(self.index_path) or '.', exist_ok=True)
+        # Shared by download worker threads, so guard the connection with a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.index_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS images (
+                url TEXT PRIMARY KEY,
+                hash TEXT NOT NULL,
+                ext TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                etag TEXT,
+                last_modified TEXT
+            )
+        """)
+        # Indexes created before validators were kept
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(images)")}
+        for column in ('etag', 'last_modified'):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE images ADD COLUMN {column} TEXT")
+        self._conn.commit()
+        # Striped locks: concurrent requests for one URL download it once
+        self._url_locks = [threading.Lock() for _ in range(64)]
+        # URLs downloaded or revalidated by this process
+        self._fresh_urls = set()
+        self.revalidated = 0
+
+    def store_image(self, img_url: str, output_path: str, fetch: Callable) -> Optional[str]:
+        """Place the image at img_url at output_path, downloading it only if needed
+
+        The file gets the extension of the format sniffed from its bytes, so
+        the path returned may differ from output_path; None on failure.
+
+        fetch(img_url, path, etag, last_modified) is ImageExtractor.fetch_image:
+        it returns None on failure, else a dict with 'not_modified', 'etag'
+        and 'last_modified'.
+        """
+        with self._url_locks[hash(img_url) % len(self._url_locks)]:
+            entry = self._lookup(img_url)
+            if entry and (img_url in self._fresh_urls or not self.revalidate):
+                object_path = entry['path']
+            else:
+                object_path = self._download_object(img_url, fetch, entry)
+                if object_path is None:
+                    return None
+                self._fresh_urls.add(img_url)
+
+        link_path = self._link_path(object_path, output_path)
+        if link_path != output_path and os.path.exists(output_path):
+            # Left by a run that named the file after the URL's extension
+            os.remove(output_path)
+        self._link(object_path, link_path)
+        return link_path
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _lookup(self, img_url: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT hash, ext, etag, last_modified FROM images WHERE url = ?", (img_url,)
+            ).fetchone()
+        if not row:
+            return None
+        object_path = self._object_path(row[0], row[1])
+        # Objects removed by hand are fetched again
+        if not os.path.exists(object_path):
+            return None
+        return {'path': object_path, 'hash': row[0], 'ext': row[1], 'etag': row[2], 'last_modified': row[3]}
+
+    def _download_object(self, img_url: str, fetch: Callable, entry: Optional[Dict]) -> Optional[str]:
+        temp_dir = os.path.join(self.objects_dir, "tmp")
+        os.makedirs(temp_dir, exist_ok=True)
+        temp_path = os.path.join(temp_dir, uuid.uuid4().hex)
+
+        result = fetch(img_url, temp_path, entry and entry['etag'], entry and entry['last_modified'])
+        if result is None:
+            if entry:
+                print(f"DEBUG: Keeping stored copy of {img_url}")
+                return entry['path']
+            return None
+
+        if result['not_modified']:
+            self._index(img_url, entry['hash'], entry['ext'], result)
+            with self._lock:
+                self.revalidated += 1
+            return entry['path']
+
+        try:
+            digest = hashlib.sha256()
+            with open(temp_path, 'rb') as f:
+                head = f.read(SNIFF_BYTES)
+                digest.update(head)
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            image_hash = digest.hexdigest()
+            ext = sniff_image_type(head) or 'img'
+
+            object_path = self._object_path(image_hash, ext)
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            if os.path.exists(object_path):
+                # Same bytes under another URL (variant or locale page)
+                os.remove(temp_path)
+            else:
+                os.replace(temp_path, object_path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        self._index(img_url, image_hash, ext, result)
+        return object_path
+
+    def _index(self, img_url: str, image_hash: str, ext: str, validators: Dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO images (url, hash, ext, fetched_at, etag, last_modified) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (img_url, image_hash, ext, time.time(), validators.get('etag'), validators.get('last_modified'))
+            )
+            self._conn.commit()
+
+    def _object_path(self, image_hash: str, ext: str) -> str:
+        return os.path.join(self.objects_dir, image_hash[:2], image_hash[2:4], f"{image_hash}.{ext}")
+
+    @staticmethod
+    def _link_path(object_path: str, output_path: str) -> str:
+        ext = os.path.splitext(object_path)[1]
+        if ext == '.img':
+            return output_path
+        return os.path.splitext(output_path)[0] + ext
+
+    def _link(self, object_path: str, output_path: str):
+        if os.path.exists(output_path):
+            if os.path.samefile(object_path, output_path):
+                return
+            os.remove(output_path)
+        try:
+            os.link(object_path, output_path)
+        except OSError:
+            # Filesystems without hardlinks get a copy
+            shutil.copyfile(object_path, output_path)
+
     def store_product_images(self, product_data: Dict, product_id: str) -> List[str]:
         """Store images for a product and return list of stored filenames"""
         if not product_data or 'images' not in product_data:
@@ -61,6 +226,56 @@ class ImageStore:
                 except Exception as e:
                     print(f"Error removing {filename}: {e}")
 
+        self.prune_objects()
+
+    def prune_objects(self) -> int:
+        """Delete stored objects that no file in images/ links to, with their index rows
+
+        An object's only remaining link is its own entry in image_objects/.
+        Where hardlinks are unsupported product files are copies, objects
+        always look unreferenced and nothing is deleted.
+        """
+        if not os.path.isdir(self.objects_dir) or not self._hardlinks_supported():
+            return 0
+
+        removed = 0
+        for dirpath, dirnames, filenames in os.walk(self.objects_dir):
+            if os.path.samefile(dirpath, self.objects_dir):
+                # Partial downloads of a running store live in tmp/
+                dirnames[:] = [name for name in dirnames if name != "tmp"]
+            for filename in filenames:
+                object_path = os.path.join(dirpath, filename)
+                image_hash, _, ext = filename.partition('.')
+                try:
+                    if os.stat(object_path).st_nlink > 1:
+                        continue
+                    os.remove(object_path)
+                except OSError as e:
+                    print(f"Error removing {object_path}: {e}")
+                    continue
+                with self._lock:
+                    self._conn.execute("DELETE FROM images WHERE hash = ? AND ext = ?", (image_hash, ext))
+                    self._conn.commit()
+                removed += 1
+
+        if removed:
+            print(f"Removed {removed} unreferenced image objects")
+        return removed
+
+    def _hardlinks_supported(self) -> bool:
+        probe = os.path.join(self.objects_dir, f".link-probe-{uuid.uuid4().hex}")
+        try:
+            with open(probe, 'wb'):
+                pass
+            os.link(probe, probe + ".link")
+            os.remove(probe + ".link")
+            return True
+        except OSError:
+            return False
+        finally:
+            if os.path.exists(probe):
+                os.remove(probe)
+
     def get_product_images(self, product_id: str) -> List[str]:
         """Get all image filenames for a product"""
         if not os.path.exists(self.images_dir):
@@ -79,7 +294,7 @@ class ImageStore:
         """Extract file extension from filename"""
         if '.' in filename:
             ext = filename.split('.')[-1].lower()
-            if ext in ['jpg', 'jpeg', 'png', 'webp', 'gif']:
+            if ext in ['jpg', 'jpeg', 'png', 'webp', 'avif', 'gif']:
                 return ext
         return 'webp'  # Default as per README
 
@@ -96,20 +311,28 @@ class ImageStore:
         return 0
 
     def get_storage_stats(self) -> Dict:
-        """Get storage statistics"""
+        """Get storage statistics; total_size_mb counts each stored object once"""
         if not os.path.exists(self.images_dir):
-            return {'total_images': 0, 'total_size_mb': 0}
+            return {'total_images': 0, 'unique_images': 0, 'total_size_mb': 0}
 
         total_images = 0
+        unique_images = 0
         total_size = 0
+        seen_inodes = set()
 
         for filename in os.listdir(self.images_dir):
             filepath = os.path.join(self.images_dir, filename)
             if os.path.isfile(filepath):
                 total_images += 1
-                total_size += os.path.getsize(filepath)
+                stat = os.stat(filepath)
+                # Hardlinks to the same object share an inode
+                if (stat.st_dev, stat.st_ino) not in seen_inodes:
+                    seen_inodes.add((stat.st_dev, stat.st_ino))
+                    unique_images += 1
+                    total_size += stat.st_size
 
         return {
             'total_images': total_images,
+            'unique_images': unique_images,
             'total_size_mb': round(total_size / (1024 * 1024), 2)
         }
@@ -0,0 +1,112 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+import config
+
+class PageCache:
+    """Persistent compressed HTML cache keyed by URL, with LRU size-based eviction"""
+
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.path = path or config.PAGE_CACHE_PATH
+        self.max_bytes = max_bytes if max_bytes is not None else config.PAGE_CACHE_MAX_MB * 1024 * 1024
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+        # Shared by fetch worker threads, so guard the connection with a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed_at)")
+        self._conn.commit()
+
+        self.total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Return cached page with its validators, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, etag, last_modified, fetched_at FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+            if not row:
+                return None
+            self._conn.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+
+        return {
+            'html': zlib.decompress(row[0]).decode('utf-8'),
+            'etag': row[1],
+            'last_modified': row[2],
+            'fetched_at': row[3]
+        }
+
+    def put(self, url: str, html_content: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """Store a page, evicting least recently used pages over the size limit"""
+        body = zlib.compress(html_content.encode('utf-8'), 6)
+        now = time.time()
+
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM pages WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, body, size, etag, last_modified, fetched_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, body, len(body), etag, last_modified, now, now)
+            )
+            self.total_bytes += len(body) - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+
+    def touch(self, url: str):
+        """Mark a cached page as revalidated (server answered 304)"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, url))
+            self._conn.commit()
+
+    def has_validators(self, url: str) -> bool:
+        """Check whether a page is cached with an ETag or Last-Modified to revalidate it with"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM pages WHERE url = ? AND (etag IS NOT NULL OR last_modified IS NOT NULL)", (url,)
+            ).fetchone()
+        return row is not None
+
+    def conditional_headers(self, cached: Optional[Dict]) -> Dict:
+        """Build If-None-Match / If-Modified-Since headers for a cached page"""
+        headers = {}
+        if cached and cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached and cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+        return headers
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _evict(self):
+        """Drop least recently used pages until under max_bytes (lock held)"""
+        while self.total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT url, size FROM pages ORDER BY accessed_at LIMIT 100"
+            ).fetchall()
+            if not rows:
+                self.total_bytes = 0
+                return
+            for url, size in rows:
+                self._conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+                self.total_bytes -= size
+                if self.total_bytes <= self.max_bytes:
+                    return
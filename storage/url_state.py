@@ -0,0 +1,81 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional, Set
+import config
+
+class UrlStateStore:
+    """Persists per-URL sitemap lastmod and last successful extraction across runs"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or config.URL_STATE_PATH
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                lastmod REAL,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                extracted_at REAL,
+                extracted_lastmod REAL
+            )
+        """)
+        self._conn.commit()
+
+    def record_seen(self, entries: Iterable):
+        """Record sitemap entries (url, lastmod, ...) seen in this run"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO urls (url, lastmod, first_seen, last_seen) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET lastmod = excluded.lastmod, last_seen = excluded.last_seen",
+                ((entry.url, entry.lastmod, now, now) for entry in entries)
+            )
+            self._conn.commit()
+
+    def select_changed(self, entries: Iterable) -> List:
+        """Keep entries that are new, never extracted, or whose lastmod advanced"""
+        changed = []
+        with self._lock:
+            for entry in entries:
+                row = self._conn.execute(
+                    "SELECT extracted_at, extracted_lastmod FROM urls WHERE url = ?", (entry.url,)
+                ).fetchone()
+                if self._needs_fetch(row, entry.lastmod):
+                    changed.append(entry)
+        return changed
+
+    def mark_extracted(self, url: str):
+        """Record a successful extraction against the URL's last seen lastmod"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO urls (url, first_seen, last_seen, extracted_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET extracted_at = excluded.extracted_at, extracted_lastmod = lastmod",
+                (url, now, now, now)
+            )
+            self._conn.commit()
+
+    def extracted_urls(self) -> Set[str]:
+        """URLs that were successfully extracted in some earlier run"""
+        with self._lock:
+            rows = self._conn.execute("SELECT url FROM urls WHERE extracted_at IS NOT NULL").fetchall()
+        return {row[0] for row in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _needs_fetch(row, lastmod) -> bool:
+        if row is None or row[0] is None:
+            return True
+        # Without a lastmod we cannot tell whether an extracted page changed
+        if lastmod is None:
+            return False
+        return row[1] is None or lastmod > row[1]
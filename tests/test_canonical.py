@@ -0,0 +1,55 @@
+from collections import namedtuple
+import pytest
+from crawler.canonical import URLCanonicalizer
+
+Entry = namedtuple('Entry', 'url lastmod')
+
+@pytest.fixture
+def canonicalizer():
+    return URLCanonicalizer(locale_codes=['en', 'de', 'fr'], locale_patterns=[],
+                            tracking_params=['utm_*', 'gclid'])
+
+def test_normalizes_case_ports_slashes_and_fragment(canonicalizer):
+    url = 'HTTPS://Shop.Example.com:443//products//shirt/#reviews'
+    assert canonicalizer.canonicalize(url) == 'https://shop.example.com/products/shirt'
+
+def test_keeps_non_default_port(canonicalizer):
+    assert canonicalizer.canonicalize('http://example.com:8080/a/') == 'http://example.com:8080/a'
+
+def test_root_path(canonicalizer):
+    assert canonicalizer.canonicalize('https://example.com') == 'https://example.com/'
+
+def test_drops_tracking_params_and_sorts_query(canonicalizer):
+    url = 'https://example.com/p?variant=2&utm_source=x&gclid=y&color=red'
+    assert canonicalizer.canonicalize(url) == 'https://example.com/p?color=red&variant=2'
+
+def test_dedupe_key_ignores_www_and_locale(canonicalizer):
+    key = canonicalizer.dedupe_key('https://example.com/products/shirt?')
+    assert canonicalizer.dedupe_key('https://www.example.com/de/products/shirt') == key
+    assert canonicalizer.dedupe_key('https://example.com/products/shirt?lang=fr') == key
+
+def test_locale_prefix_must_be_a_whole_segment(canonicalizer):
+    assert canonicalizer.is_locale_variant('https://example.com/en-gb/products/shirt')
+    assert not canonicalizer.is_locale_variant('https://example.com/enamel-mug')
+
+def test_dedupe_prefers_default_locale_in_first_seen_position(canonicalizer):
+    urls = [
+        'https://example.com/de/products/shirt',
+        'https://example.com/products/mug',
+        'https://www.example.com/products/shirt/',
+    ]
+    assert canonicalizer.dedupe(urls) == [
+        'https://www.example.com/products/shirt',
+        'https://example.com/products/mug',
+    ]
+
+def test_dedupe_entries_keep_fields(canonicalizer):
+    entries = [Entry('https://example.com/fr/p?utm_medium=email', 1.0), Entry('https://example.com/p', 2.0)]
+    assert canonicalizer.dedupe_entries(entries) == [Entry('https://example.com/p', 2.0)]
+
+def test_query_values_are_not_reencoded(canonicalizer):
+    url = 'https://example.com/search?q=a%20b&flag&utm_campaign=x&name=caf%C3%A9'
+    assert canonicalizer.canonicalize(url) == 'https://example.com/search?flag&name=caf%C3%A9&q=a%20b'
+
+def test_encoded_tracking_param_is_dropped(canonicalizer):
+    assert canonicalizer.canonicalize('https://example.com/p?utm%5Fsource=x&id=1') == 'https://example.com/p?id=1'
@@ -0,0 +1,72 @@
+import json
+import pytest
+from crawler.filters import URLFilter
+
+BASE_URL = 'https://shop.example.com'
+
+@pytest.fixture
+def url_filter():
+    return URLFilter(BASE_URL, rules={})
+
+@pytest.mark.parametrize('url', [
+    'https://shop.example.com/',
+    'https://shop.example.com',
+    'http://shop.example.com/products/shirt',
+    'https://shop.example.com/products/shirt?variant=1',
+    'https://shop.example.com/products/photo.jpg-holder',
+])
+def test_keeps_pages(url_filter, url):
+    assert url_filter._is_valid_url(url)
+
+@pytest.mark.parametrize('url', [
+    'https://other.example.com/products/shirt',
+    'https://shop.example.com.evil.net/products/shirt',
+    'ftp://shop.example.com/products/shirt',
+    'https://shop.example.com/cart',
+    'https://shop.example.com/account/login',
+    'https://shop.example.com/files/shirt.JPG',
+    'https://shop.example.com/files/guide.pdf?v=2',
+])
+def test_skips_other_hosts_and_resources(url_filter, url):
+    assert not url_filter._is_valid_url(url)
+
+def test_skip_pattern_in_query_is_ignored(url_filter):
+    assert url_filter._is_valid_url('https://shop.example.com/products/shirt?from=/cart')
+
+def test_site_rules_extend_and_override_defaults():
+    url_filter = URLFilter(BASE_URL, rules={'skip_patterns': ['/lookbook'], 'allow_patterns': ['/api/products/']})
+    assert not url_filter._is_valid_url('https://shop.example.com/lookbook/spring')
+    assert url_filter._is_valid_url('https://shop.example.com/api/products/shirt')
+    assert not url_filter._is_valid_url('https://shop.example.com/api/orders')
+
+def test_filter_urls_keeps_order(url_filter):
+    urls = [
+        'https://shop.example.com/products/b',
+        'https://shop.example.com/cart',
+        'https://shop.example.com/products/a',
+    ]
+    assert url_filter.filter_urls(urls) == [urls[0], urls[2]]
+
+def test_load_site_rules_merges_rules_file(tmp_path, monkeypatch):
+    monkeypatch.setattr('config.URL_FILTER_RULES', {'shop.example.com': {'skip_patterns': ['/a']}})
+    rules_file = tmp_path / 'rules.json'
+    rules_file.write_text(json.dumps({'shop.example.com': {'allow_patterns': ['/b']}}))
+    assert URLFilter.load_site_rules('shop.example.com', str(rules_file)) == {
+        'skip_patterns': ['/a'], 'allow_patterns': ['/b']
+    }
+
+def test_load_site_rules_concatenates_shared_keys(tmp_path, monkeypatch):
+    config_rules = {'shop.example.com': {'skip_patterns': ['/a']}}
+    monkeypatch.setattr('config.URL_FILTER_RULES', config_rules)
+    rules_file = tmp_path / 'rules.json'
+    rules_file.write_text(json.dumps({'shop.example.com': {'skip_patterns': ['/b'], 'allow_patterns': ['/c']}}))
+    assert URLFilter.load_site_rules('shop.example.com', str(rules_file)) == {
+        'skip_patterns': ['/a', '/b'], 'allow_patterns': ['/c']
+    }
+    assert config_rules == {'shop.example.com': {'skip_patterns': ['/a']}}
+
+def test_load_site_rules_ignores_unreadable_file(tmp_path, monkeypatch):
+    monkeypatch.setattr('config.URL_FILTER_RULES', {'shop.example.com': {'skip_patterns': ['/a']}})
+    assert URLFilter.load_site_rules('shop.example.com', str(tmp_path / 'missing.json')) == {
+        'skip_patterns': ['/a']
+    }
@@ -0,0 +1,131 @@
+import os
+import pytest
+from storage.image_store import ImageStore
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 32
+JPEG = b'\xff\xd8\xff\xe0' + b'\x01' * 32
+URL = 'https://cdn.example.com/shirt'
+
+class FakeFetch:
+    """Stands in for ImageExtractor.fetch_image; replies are (status, body, etag)"""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.calls = []
+
+    def __call__(self, img_url, path, etag=None, last_modified=None):
+        self.calls.append((img_url, etag, last_modified))
+        status, body, new_etag = self.replies.pop(0)
+        if status is None:
+            return None
+        if status == 304:
+            return {'not_modified': True, 'etag': new_etag or etag, 'last_modified': last_modified}
+        with open(path, 'wb') as f:
+            f.write(body)
+        return {'not_modified': False, 'etag': new_etag, 'last_modified': None}
+
+def open_store(tmp_path, revalidate=True):
+    return ImageStore(str(tmp_path / 'output'), index_path=str(tmp_path / 'index.sqlite3'), revalidate=revalidate)
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+@pytest.fixture
+def store(tmp_path):
+    store = open_store(tmp_path)
+    yield store
+    store.close()
+
+def test_download_creates_object_and_link_with_sniffed_extension(store):
+    fetch = FakeFetch((200, PNG, '"v1"'))
+    path = store.store_image(URL, os.path.join(store.images_dir, '1-1.webp'), fetch)
+
+    assert path == os.path.join(store.images_dir, '1-1.png')
+    assert read(path) == PNG
+    entry = store._lookup(URL)
+    assert entry['etag'] == '"v1"' and os.path.samefile(entry['path'], path)
+
+def test_same_url_is_fetched_once_per_run(store):
+    fetch = FakeFetch((200, PNG, '"v1"'))
+    store.store_image(URL, os.path.join(store.images_dir, '1-1.png'), fetch)
+    path = store.store_image(URL, os.path.join(store.images_dir, '2-1.png'), fetch)
+
+    assert len(fetch.calls) == 1
+    assert read(path) == PNG
+
+def test_next_run_revalidates_and_relinks_on_304(tmp_path):
+    first = open_store(tmp_path)
+    first.store_image(URL, os.path.join(first.images_dir, '1-1.png'), FakeFetch((200, PNG, '"v1"')))
+    object_path = first._lookup(URL)['path']
+    first.close()
+
+    store = open_store(tmp_path)
+    fetch = FakeFetch((304, None, None))
+    path = store.store_image(URL, os.path.join(store.images_dir, '7-1.png'), fetch)
+    store.store_image(URL, os.path.join(store.images_dir, '8-1.png'), fetch)
+    store.close()
+
+    assert fetch.calls == [(URL, '"v1"', None)]
+    assert store.revalidated == 1
+    assert os.path.samefile(path, object_path)
+
+def test_changed_image_gets_new_object_and_validators(tmp_path):
+    first = open_store(tmp_path)
+    first.store_image(URL, os.path.join(first.images_dir, '1-1.png'), FakeFetch((200, PNG, '"v1"')))
+    old_object = first._lookup(URL)['path']
+    first.close()
+
+    store = open_store(tmp_path)
+    path = store.store_image(URL, os.path.join(store.images_dir, '1-1.png'), FakeFetch((200, JPEG, None)))
+    entry = store._lookup(URL)
+    store.close()
+
+    assert path.endswith('1-1.jpg') and read(path) == JPEG
+    assert not os.path.exists(os.path.join(store.images_dir, '1-1.png'))
+    assert entry['path'] != old_object
+    assert entry['etag'] is None
+
+def test_failed_revalidation_keeps_stored_copy(tmp_path):
+    first = open_store(tmp_path)
+    first.store_image(URL, os.path.join(first.images_dir, '1-1.png'), FakeFetch((200, PNG, '"v1"')))
+    first.close()
+
+    store = open_store(tmp_path)
+    path = store.store_image(URL, os.path.join(store.images_dir, '1-1.png'), FakeFetch((None, None, None)))
+    entry = store._lookup(URL)
+    store.close()
+
+    assert read(path) == PNG
+    assert entry['etag'] == '"v1"'
+
+def test_failed_first_download(store):
+    assert store.store_image(URL, os.path.join(store.images_dir, '1-1.png'), FakeFetch((None, None, None))) is None
+    assert store._lookup(URL) is None
+    assert os.listdir(store.images_dir) == []
+
+def test_without_revalidation_stored_urls_are_not_requested(tmp_path):
+    first = open_store(tmp_path)
+    first.store_image(URL, os.path.join(first.images_dir, '1-1.png'), FakeFetch((200, PNG, '"v1"')))
+    first.close()
+
+    store = open_store(tmp_path, revalidate=False)
+    fetch = FakeFetch()
+    path = store.store_image(URL, os.path.join(store.images_dir, '2-1.png'), fetch)
+    store.close()
+
+    assert fetch.calls == [] and read(path) == PNG
+
+def test_prune_removes_replaced_objects(tmp_path):
+    first = open_store(tmp_path)
+    first.store_image(URL, os.path.join(first.images_dir, '1-1.png'), FakeFetch((200, PNG, '"v1"')))
+    old_object = first._lookup(URL)['path']
+    first.close()
+
+    store = open_store(tmp_path)
+    store.store_image(URL, os.path.join(store.images_dir, '1-1.png'), FakeFetch((200, JPEG, None)))
+    new_object = store._lookup(URL)['path']
+    assert store.prune_objects() == 1
+    store.close()
+
+    assert not os.path.exists(old_object) and os.path.exists(new_object)
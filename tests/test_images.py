@@ -0,0 +1,66 @@
+import pytest
+from extractor.images import ImageExtractor, select_image_candidate, select_image_variant, sniff_image_type
+
+def candidate(url, width, image_type=''):
+    return {'url': url, 'width': width, 'type': image_type}
+
+@pytest.mark.parametrize('data, expected', [
+    (b'\xff\xd8\xff\xe0\x00\x10JFIF\x00', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n\x00\x00\x00\r', 'png'),
+    (b'GIF89a\x01\x00\x01\x00\x00\x00', 'gif'),
+    (b'RIFF\x24\x00\x00\x00WEBPVP8 ', 'webp'),
+    (b'\x00\x00\x00\x1cftypavif\x00\x00', 'avif'),
+    (b'\x00\x00\x00\x1cftypavis\x00\x00', 'avif'),
+])
+def test_sniff_image_type(data, expected):
+    assert sniff_image_type(data) == expected
+
+@pytest.mark.parametrize('data', [
+    b'<!DOCTYPE html><html>',
+    b'<svg xmlns="http://www.w3.org/2000/svg"',
+    b'\x00\x00\x00\x18ftypmp42\x00\x00',
+    b'RIFF\x24\x00\x00\x00WAVEfmt ',
+    b'',
+])
+def test_sniff_rejects_non_images(data):
+    assert sniff_image_type(data) is None
+
+def test_smallest_variant_at_target_width():
+    image = {'src': 'a.jpg', 'candidates': [
+        candidate('a_400.jpg', 400), candidate('a_2000.jpg', 2000), candidate('a_1200.jpg', 1200)
+    ]}
+    assert select_image_candidate(image, 1000)['url'] == 'a_1200.jpg'
+
+def test_widest_variant_when_none_is_wide_enough():
+    image = {'src': 'a.jpg', 'candidates': [candidate('a_400.jpg', 400), candidate('a_800.jpg', 800)]}
+    assert select_image_candidate(image, 1200)['url'] == 'a_800.jpg'
+
+def test_preferred_format_wins_over_width(monkeypatch):
+    monkeypatch.setattr('config.IMAGE_PREFERRED_FORMATS', ['avif', 'webp'])
+    image = {'src': 'a.jpg', 'candidates': [
+        candidate('a_1200.jpg', 1200),
+        candidate('a_1600.webp', 1600),
+        candidate('a_2000', 2000, 'image/avif'),
+        candidate('a_1400?format=webp', 1400),
+    ]}
+    assert select_image_candidate(image, 1200)['url'] == 'a_2000'
+
+def test_without_declared_widths_src_is_kept():
+    image = {'src': 'a.jpg', 'candidates': [candidate('a@2x.jpg', None)]}
+    assert select_image_candidate(image, 1200) is None
+    assert select_image_variant(image, 1200) == 'a.jpg'
+
+def test_shopify_srcset_variant_is_kept():
+    image = {'src': '//cdn.shopify.com/s/files/shirt.jpg?v=1', 'alt': 'Shirt', 'candidates': [
+        candidate('//cdn.shopify.com/s/files/shirt.jpg?v=1&width=600', 600),
+        candidate('//cdn.shopify.com/s/files/shirt.jpg?v=1&width=1200', 1200),
+    ]}
+    images = ImageExtractor('').extract_product_images({'images': [image]}, 'https://shop.example.com/products/shirt')
+    assert [(img['url'], img['width']) for img in images] == [
+        ('https://cdn.shopify.com/s/files/shirt.jpg?v=1&width=1200', 1200)
+    ]
+
+def test_rejected_variant_falls_back_to_src():
+    image = {'src': '/media/shirt.png', 'alt': '', 'candidates': [candidate('/media/shirt?format=webp&w=1600', 1600)]}
+    images = ImageExtractor('').extract_product_images({'images': [image]}, 'https://shop.example.com/products/shirt')
+    assert [img['url'] for img in images] == ['https://shop.example.com/media/shirt.png']
@@ -0,0 +1,71 @@
+import pytest
+from ai.product_parser import ProductParser
+
+PAGE_URL = 'https://shop.example.com/products/blue-shirt'
+
+def shopify_product(handle, title=None):
+    return {'title': title or handle, 'handle': handle, 'variants': [{}], 'price': 1999}
+
+@pytest.fixture
+def parser():
+    return ProductParser(PAGE_URL)
+
+def test_picks_product_matching_handle(parser):
+    captured = [{'product': shopify_product('red-shirt')}, shopify_product('blue-shirt')]
+    assert parser._find_captured_product(captured, PAGE_URL)['handle'] == 'blue-shirt'
+
+def test_matches_page_under_collection(parser):
+    captured = [shopify_product('red-shirt'), shopify_product('blue-shirt')]
+    page_url = 'https://shop.example.com/collections/tops/products/blue-shirt/'
+    assert parser._find_captured_product(captured, page_url)['handle'] == 'blue-shirt'
+
+def test_matches_graphql_online_store_url(parser):
+    graphql = {'data': {'product': {'title': 'Blue shirt',
+                                    'onlineStoreUrl': 'https://shop.example.com/products/blue-shirt'}}}
+    related = {'data': {'product': {'title': 'Red shirt', 'url': '/products/red-shirt'}}}
+    assert parser._find_captured_product([related, graphql], PAGE_URL)['title'] == 'Blue shirt'
+
+def test_single_product_is_accepted_without_match(parser):
+    captured = [{'product': shopify_product('blue-shirt-v2')}]
+    assert parser._find_captured_product(captured, PAGE_URL)['handle'] == 'blue-shirt-v2'
+
+def test_unmatched_products_are_rejected(parser):
+    captured = [shopify_product('red-shirt'), {'recommendations': [shopify_product('green-shirt')]}]
+    assert parser._find_captured_product(captured, PAGE_URL) is None
+
+def test_similar_handle_does_not_match(parser):
+    captured = [shopify_product('shirt'), {'product': {'title': 'Other', 'url': '/products/shirt'}}]
+    assert parser._find_captured_product(captured, PAGE_URL) is None
+
+def test_no_product_in_payloads(parser):
+    assert parser._find_captured_product([{'cart': {'items': []}}, [1, 2]], PAGE_URL) is None
+
+def test_rejected_products_fall_through_to_page(parser):
+    captured = [shopify_product('red-shirt'), shopify_product('green-shirt')]
+    assert parser._extract_from_captured_json(captured, {}, PAGE_URL) is None
+
+def test_structured_image_replaced_by_page_variant(parser, monkeypatch):
+    monkeypatch.setattr('config.IMAGE_TARGET_WIDTH', 1000)
+    raw_content = {'images': [{
+        'src': '//shop.example.com/cdn/shop/files/shirt.jpg?v=1&width=600',
+        'alt': 'Shirt',
+        'candidates': [
+            {'url': '//shop.example.com/cdn/shop/files/shirt.jpg?v=1&width=600', 'width': 600, 'type': ''},
+            {'url': '//shop.example.com/cdn/shop/files/shirt.jpg?v=1&width=1200', 'width': 1200, 'type': ''},
+        ]
+    }]}
+    product = parser.finalize_product(
+        {'title': 'Shirt', 'images': [
+            'https://shop.example.com/cdn/shop/files/shirt.jpg?v=1',
+            '/cdn/shop/files/back.jpg',
+        ]},
+        PAGE_URL, raw_content
+    )
+    assert [image['url'] for image in product['images']] == [
+        'https://shop.example.com/cdn/shop/files/shirt.jpg?v=1&width=1200',
+        'https://shop.example.com/cdn/shop/files/back.jpg',
+    ]
+
+def test_api_images_without_page_are_only_resolved(parser):
+    product = parser.finalize_product({'title': 'Shirt', 'images': ['//cdn.example.com/shirt.jpg']}, PAGE_URL)
+    assert [image['url'] for image in product['images']] == ['https://cdn.example.com/shirt.jpg']
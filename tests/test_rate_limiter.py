@@ -0,0 +1,104 @@
+import pytest
+from crawler import rate_limiter
+from crawler.rate_limiter import TokenBucket
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, 'monotonic', clock.monotonic)
+    return clock
+
+def test_first_request_is_immediate(clock):
+    bucket = TokenBucket(rate=2.0, max_rate=20.0)
+    assert bucket.reserve() == 0.0
+
+def test_burst_waiters_get_consecutive_slots(clock):
+    bucket = TokenBucket(rate=2.0, max_rate=20.0)
+    delays = [bucket.reserve() for _ in range(4)]
+    assert delays == pytest.approx([0.0, 0.5, 1.0, 1.5])
+
+def test_tokens_refill_over_time(clock):
+    bucket = TokenBucket(rate=2.0, max_rate=20.0)
+    bucket.reserve()
+    bucket.reserve()
+    clock.now += 1.0
+    assert bucket.reserve() == 0.0
+
+def test_burst_capacity_is_one_second_of_requests(clock):
+    bucket = TokenBucket(rate=4.0, max_rate=20.0)
+    clock.now += 60.0
+    delays = [bucket.reserve() for _ in range(5)]
+    assert delays[:4] == [0.0] * 4
+    assert delays[4] == pytest.approx(0.25)
+
+def test_blocked_until_overrides_available_tokens(clock):
+    bucket = TokenBucket(rate=2.0, max_rate=20.0)
+    bucket.blocked_until = clock.now + 30.0
+    assert bucket.reserve() == pytest.approx(30.0)
+
+@pytest.fixture
+def limiter(clock, monkeypatch):
+    monkeypatch.setattr('config.RATE_LIMIT_INCREASE', 0.25)
+    monkeypatch.setattr('config.RATE_LIMIT_SLOW_SECONDS', 5.0)
+    return rate_limiter.HostRateLimiter(initial_rate=2.0, min_rate=0.2, max_rate=3.0)
+
+def rate(limiter, url='https://shop.example.com/'):
+    return limiter._bucket(url).rate
+
+@pytest.mark.parametrize('status', [429, 503, None])
+def test_throttling_halves_rate(limiter, status):
+    limiter.record('https://shop.example.com/a', status, 0.1)
+    assert rate(limiter) == 1.0
+
+def test_slow_response_halves_rate(limiter):
+    limiter.record('https://shop.example.com/a', 200, 6.0)
+    assert rate(limiter) == 1.0
+
+def test_decrease_at_most_once_per_second(limiter, clock):
+    for _ in range(3):
+        limiter.record('https://shop.example.com/a', 429, 0.1)
+    assert rate(limiter) == 1.0
+    clock.now += 1.0
+    limiter.record('https://shop.example.com/a', 429, 0.1)
+    assert rate(limiter) == 0.5
+
+def test_rate_never_drops_below_minimum(limiter, clock):
+    for _ in range(10):
+        limiter.record('https://shop.example.com/a', 503, 0.1)
+        clock.now += 1.0
+    assert rate(limiter) == 0.2
+
+def test_fast_responses_increase_additively_up_to_maximum(limiter):
+    limiter.record('https://shop.example.com/a', 200, 0.1)
+    assert rate(limiter) == 2.25
+    for _ in range(10):
+        limiter.record('https://shop.example.com/a', 200, 0.1)
+    assert rate(limiter) == 3.0
+
+def test_hosts_are_limited_separately(limiter):
+    limiter.record('https://shop.example.com/a', 429, 0.1)
+    assert rate(limiter, 'https://cdn.example.com/') == 2.0
+
+def test_retry_after_blocks_host(limiter, clock):
+    limiter.reserve('https://shop.example.com/a')
+    limiter.record('https://shop.example.com/a', 429, 0.1, retry_after=30)
+    assert limiter.reserve('https://shop.example.com/b') == pytest.approx(30.0)
+
+def test_crawl_delay_caps_rate(limiter):
+    limiter.set_crawl_delay('shop.example.com', 2)
+    assert rate(limiter) == 0.5
+    for _ in range(5):
+        limiter.record('https://shop.example.com/a', 200, 0.1)
+    assert rate(limiter) == 0.5
+
+def test_crawl_delay_ignores_missing_values(limiter):
+    limiter.set_crawl_delay('shop.example.com', None)
+    limiter.set_crawl_delay('shop.example.com', 0)
+    assert rate(limiter) == 2.0
@@ -0,0 +1,32 @@
+from extractor.raw_content import RawContentExtractor, parse_srcset
+
+def test_width_and_density_descriptors():
+    assert parse_srcset('a.jpg 400w, b.jpg 1200w, c.jpg 2x') == [
+        ('a.jpg', '400w'), ('b.jpg', '1200w'), ('c.jpg', '2x')
+    ]
+
+def test_commas_inside_urls():
+    srcset = ('https://cdn.example.com/w_400,f_auto/a.jpg 400w, '
+              'https://cdn.example.com/w_1200,f_auto/a.jpg 1200w')
+    assert parse_srcset(srcset) == [
+        ('https://cdn.example.com/w_400,f_auto/a.jpg', '400w'),
+        ('https://cdn.example.com/w_1200,f_auto/a.jpg', '1200w'),
+    ]
+
+def test_candidates_without_descriptors():
+    assert parse_srcset('a.jpg, b.jpg 2x,c.jpg') == [('a.jpg', ''), ('b.jpg', '2x'), ('c.jpg', '')]
+
+def test_extra_whitespace_and_empty_value():
+    assert parse_srcset('  a.jpg   800w ,\n b.jpg 1600w  ') == [('a.jpg', '800w'), ('b.jpg', '1600w')]
+    assert parse_srcset('') == []
+    assert parse_srcset(' , ') == []
+
+def test_picture_sources_become_candidates():
+    page = """<html><body><picture>
+        <source type="image/avif" srcset="/a.avif 1600w">
+        <img src="/a.jpg" width="600" data-srcset="/a_600.jpg 1x, /a_1200.jpg 2x" alt="A">
+    </picture></body></html>"""
+    images = RawContentExtractor().extract_content(page)['images']
+    assert [(c['url'], c['width'], c['type']) for c in images[0]['candidates']] == [
+        ('/a.avif', 1600, 'image/avif'), ('/a_600.jpg', 600, ''), ('/a_1200.jpg', 1200, '')
+    ]
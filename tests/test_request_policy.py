@@ -0,0 +1,39 @@
+import pytest
+from crawler.request_policy import RequestPolicy, registrable_domain
+
+@pytest.fixture
+def policy():
+    return RequestPolicy(blocked_types=['image'], third_party_blocked_types=['script'],
+                         site_allow_patterns={'www.shop.de': ['widgets.example-cdn.com/product.js']},
+                         platform_cdn_hosts=['cdn.shopify.com'])
+
+@pytest.mark.parametrize('host, expected', [
+    ('www.shop.de', 'shop.de'),
+    ('static.abc.de', 'abc.de'),
+    ('cdn.shop.co.uk', 'shop.co.uk'),
+    ('a.myshopify.com', 'a.myshopify.com'),
+    ('co.uk', 'co.uk'),
+    ('127.0.0.1', '127.0.0.1'),
+    ('Shop.DE:8080', 'shop.de'),
+])
+def test_registrable_domain(host, expected):
+    assert registrable_domain(host) == expected
+
+def test_first_party_scripts_are_loaded(policy):
+    assert not policy.should_block('https://static.shop.de/app.js', 'script', 'www.shop.de')
+
+def test_third_party_scripts_are_blocked(policy):
+    assert policy.should_block('https://widgets.example-cdn.com/other.js', 'script', 'www.shop.de')
+    assert policy.should_block('https://b.myshopify.com/app.js', 'script', 'a.myshopify.com')
+
+def test_platform_cdn_scripts_are_loaded(policy):
+    assert not policy.should_block('https://cdn.shopify.com/s/files/theme.js', 'script', 'www.shop.de')
+
+def test_site_opt_in_overrides_blocking(policy):
+    assert not policy.should_block('https://widgets.example-cdn.com/product.js', 'script', 'www.shop.de')
+    assert policy.should_block('https://widgets.example-cdn.com/product.js', 'script', 'www.other.de')
+
+def test_trackers_and_blocked_types(policy):
+    assert policy.should_block('https://www.google-analytics.com/analytics.js', 'script', 'www.shop.de')
+    assert policy.should_block('https://www.shop.de/a.jpg', 'image', 'www.shop.de')
+    assert not policy.should_block('https://www.shop.de/', 'document', 'www.shop.de')
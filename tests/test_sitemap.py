@@ -0,0 +1,22 @@
+from datetime import datetime, timezone
+from crawler.sitemap import parse_lastmod
+
+def timestamp(*args):
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+def test_date_only():
+    assert parse_lastmod('2024-05-01') == timestamp(2024, 5, 1)
+
+def test_utc_designator():
+    assert parse_lastmod('2024-05-01T10:30:00Z') == timestamp(2024, 5, 1, 10, 30)
+
+def test_offset_is_converted_to_utc():
+    assert parse_lastmod('2024-05-01T12:30:00+02:00') == timestamp(2024, 5, 1, 10, 30)
+
+def test_naive_datetime_is_utc():
+    assert parse_lastmod('2024-05-01T10:30:00') == timestamp(2024, 5, 1, 10, 30)
+
+def test_missing_or_invalid_values():
+    assert parse_lastmod(None) is None
+    assert parse_lastmod('') is None
+    assert parse_lastmod('yesterday') is None
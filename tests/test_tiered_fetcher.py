@@ -0,0 +1,81 @@
+import time
+import pytest
+from crawler.tiered_fetcher import TieredFetcher
+from storage.page_cache import PageCache
+
+URL = 'https://shop.example.com/products/shirt'
+RENDERED = '<html>rendered</html>'
+
+class FakeResponse:
+    def __init__(self, status_code, text='', headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = text.encode('utf-8')
+        self.encoding = 'utf-8'
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append((url, dict(headers or {})))
+        return self.response
+
+class FakePageFetcher:
+    def __init__(self):
+        self.rendered = []
+        self.validators = {}
+        self.captured_json = {}
+
+    def fetch_many(self, urls):
+        for url in urls:
+            self.rendered.append(url)
+            yield url, RENDERED
+
+    def __exit__(self, *exc):
+        pass
+
+@pytest.fixture
+def fetcher(tmp_path):
+    fetcher = TieredFetcher(http_workers=2, tiers_file=str(tmp_path / 'tiers.json'),
+                            cache=PageCache(str(tmp_path / 'pages.db')))
+    fetcher.site_tiers['shop.example.com'] = {'tier': TieredFetcher.BROWSER, 'decided_at': time.time()}
+    fetcher.page_fetcher = FakePageFetcher()
+    return fetcher
+
+def fetch_all(fetcher, session, urls):
+    fetcher.session = session
+    page_fetcher = fetcher.page_fetcher
+    with fetcher:
+        return dict(fetcher.fetch_many(urls)), page_fetcher
+
+def test_browser_tier_page_not_modified_is_not_rendered(fetcher):
+    fetcher.cache.put(URL, '<html>cached</html>', '"abc"', None)
+    session = FakeSession(FakeResponse(304))
+
+    pages, page_fetcher = fetch_all(fetcher, session, [URL])
+
+    assert pages == {URL: '<html>cached</html>'}
+    assert session.requests == [(URL, {'If-None-Match': '"abc"'})]
+    assert page_fetcher.rendered == []
+
+def test_browser_tier_page_modified_is_rendered(fetcher):
+    fetcher.cache.put(URL, '<html>cached</html>', None, 'Mon, 01 Jan 2024 00:00:00 GMT')
+    session = FakeSession(FakeResponse(200, '<html>static</html>', {'content-type': 'text/html'}))
+
+    pages, page_fetcher = fetch_all(fetcher, session, [URL])
+
+    assert pages == {URL: RENDERED}
+    assert session.requests == [(URL, {'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT'})]
+    assert page_fetcher.rendered == [URL]
+
+def test_browser_tier_page_without_validators_skips_http(fetcher):
+    fetcher.cache.put(URL, '<html>cached</html>')
+    session = FakeSession(FakeResponse(200))
+
+    pages, page_fetcher = fetch_all(fetcher, session, [URL])
+
+    assert pages == {URL: RENDERED}
+    assert session.requests == []
+    assert page_fetcher.rendered == [URL]
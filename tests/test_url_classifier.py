@@ -0,0 +1,55 @@
+import pytest
+from crawler.url_classifier import URLClassifier, looks_like_product, PRODUCT, COLLECTION, OTHER, UNKNOWN
+
+BASE = 'https://shop.example.com'
+
+@pytest.fixture
+def classifier():
+    return URLClassifier(use_llm=False)
+
+def test_templates_generalize_slugs_and_ids(classifier):
+    urls = [f'{BASE}/collections/{c}/products/{c}-item' for c in ('tops', 'pants', 'hats', 'bags')]
+    urls += [f'{BASE}/blogs/news/{i}' for i in (101, 102)]
+    templates = classifier.templates(urls)
+    assert set(templates[:4]) == {'/collections/{slug}/products/{slug}'}
+    assert set(templates[4:]) == {'/blogs/news/{id}'}
+
+def test_segment_shared_by_many_urls_stays_literal(classifier):
+    urls = [f'{BASE}/collections/tops/products/item-{i}' for i in range(3)] + [f'{BASE}/collections/hats/products/cap']
+    assert classifier.templates(urls)[:3] == ['/collections/tops/products/{slug}'] * 3
+
+def test_templates_keep_shared_segments_and_extensions(classifier):
+    urls = [f'{BASE}/shop/{name}.html' for name in ('red-shirt', 'blue-shirt', 'green-hat')]
+    assert classifier.templates(urls) == ['/shop/{slug}.html'] * 3
+
+@pytest.mark.parametrize('template, label', [
+    ('/collections/{slug}/products/{slug}', PRODUCT),
+    ('/products/{slug}', PRODUCT),
+    ('/collections/{slug}', COLLECTION),
+    ('/products', COLLECTION),
+    ('/blogs/news/{id}', OTHER),
+    ('/{slug}.html', UNKNOWN),
+    ('/shop/{slug}', UNKNOWN),
+    ('/about-us', OTHER),
+    ('/', OTHER),
+])
+def test_label_by_keywords(template, label):
+    assert URLClassifier._label_by_keywords(template) == label
+
+def test_filter_products_keeps_order(classifier):
+    urls = [f'{BASE}/products/mug', f'{BASE}/collections/all', f'{BASE}/products/hat', f'{BASE}/products/shirt']
+    assert classifier.filter_products(urls) == [urls[0], urls[2], urls[3]]
+
+@pytest.mark.parametrize('url, expected', [
+    (f'{BASE}/products/blue-shirt', True),
+    (f'{BASE}/collections/tops/products/blue-shirt', True),
+    (f'{BASE}/blue-shirt.html', True),
+    (f'{BASE}/collections/tops', False),
+    (f'{BASE}/products/blue-shirt/reviews', True),
+    (f'{BASE}/blogs/news/spring-sale', False),
+    (f'{BASE}/products', False),
+    (f'{BASE}/collections/tops/products', False),
+    (f'{BASE}/', False),
+])
+def test_looks_like_product(url, expected):
+    assert looks_like_product(url) == expected
@@ -4,19 +4,25 @@ import sys
 import threading
 import time
 import requests
-import json
 from urllib.parse import urlparse
 
 # Add current directory to path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from crawler.sitemap import SitemapParser
-from crawler.fetcher import PageFetcher
+from crawler.platforms import detect_platform
+from crawler.canonical import URLCanonicalizer
+from crawler.url_classifier import URLClassifier
+from ai.url_filter import LLMURLFilter
+from crawler.tiered_fetcher import TieredFetcher
 from crawler.filters import URLFilter
-from extractor.raw_content import RawContentExtractor
+from crawler.frontier import CrawlFrontier
+from extractor.image_downloader import ImageDownloader
+from extractor.pipeline import ExtractionPool
 from ai.product_parser import ProductParser
 from storage.csv_writer import CSVWriter
 from storage.image_store import ImageStore
+from storage.url_state import UrlStateStore
 import config
 
 app = Flask(__name__)
@@ -178,6 +184,12 @@ HTML_TEMPLATE = """
                 <label for="websiteUrl">URL веб-сайта:</label>
                 <input type="url" id="websiteUrl" name="url" placeholder="https://example-shop.com" required>
             </div>
+            <div class="form-group">
+                <label><input type="checkbox" id="incremental" name="incremental"> Только новые и изменённые страницы</label>
+            </div>
+            <div class="form-group">
+                <label><input type="checkbox" id="combined" name="combined"> Фильтрация и парсинг товаров одновременно</label>
+            </div>
             <button type="submit" id="startButton">Шаг 1: Фильтрация товаров</button>
         </form>
 
@@ -230,7 +242,11 @@ HTML_TEMPLATE = """
                     headers: {
                         'Content-Type': 'application/json',
                     },
-                    body: JSON.stringify({ url: url })
+                    body: JSON.stringify({
+                        url: url,
+                        incremental: document.getElementById('incremental').checked,
+                        combined: document.getElementById('combined').checked
+                    })
                 });
 
                 const data = await response.json();
@@ -292,7 +308,8 @@ HTML_TEMPLATE = """
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json',
-                    }
+                    },
+                    body: JSON.stringify({ incremental: document.getElementById('incremental').checked })
                 });
 
                 const data = await response.json();
@@ -369,6 +386,8 @@ def start_parsing():
 
     data = request.get_json()
     url = data.get('url', '').strip()
+    incremental = bool(data.get('incremental'))
+    combined = bool(data.get('combined'))
 
     if not url:
         return jsonify({'success': False, 'message': 'URL не указан'})
@@ -395,7 +414,7 @@ def start_parsing():
     }
 
     # Start parsing in background thread
-    thread = threading.Thread(target=run_parsing, args=(url,))
+    thread = threading.Thread(target=run_parsing, args=(url, incremental, combined))
     thread.daemon = True
     thread.start()
 
@@ -415,71 +434,16 @@ def download_csv():
 
 @app.route('/filter_products', methods=['POST'])
 def filter_products():
-    """Filter product URLs from the list using AI"""
+    """Filter product URLs from the list (mode: "clusters" or "llm")"""
     data = request.get_json()
     urls = data.get('urls', [])
+    mode = data.get('mode', config.URL_FILTER_MODE)
 
     if not urls:
         return jsonify({'success': False, 'message': 'URLs not provided'})
 
-    # Use AI to filter product URLs
-    from ai.deepseek_client import DeepSeekClient
-    ai_client = DeepSeekClient()
-
-    # Prepare prompt with URL list
-    url_list = '\n'.join([f'{i+1}. {url}' for i, url in enumerate(urls[:200])])  # Limit to 200 for token limit
-    if len(urls) > 200:
-        url_list += f'\n... and {len(urls) - 200} more URLs'
-
-    prompt = f"""
-You are an expert at identifying product pages on e-commerce websites.
-
-Given the following list of URLs from a sitemap, identify which ones are likely PRODUCT pages (individual items for sale) and return ONLY those URLs.
-
-Exclude:
-- Homepage (/)
-- Collection/category pages (/collections/)
-- Static pages (/pages/)
-- Blog pages (/blogs/)
-- Any other non-product pages
-
-Return ONLY a list of product URLs, one URL per line, without quotes or brackets. Like:
-https://example.com/products/item1
-https://example.com/products/item2
-
-URL LIST:
-{url_list}
-"""
-
     try:
-        response = ai_client.client.chat.completions.create(
-            model=ai_client.model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant that filters product URLs from a list. Return only valid JSON arrays."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0.1,
-            max_tokens=2000
-        )
-
-        result_text = response.choices[0].message.content
-        if result_text:
-            result_text = result_text.strip()
-            if result_text.startswith('```json'):
-                result_text = result_text[7:]
-            if result_text.endswith('```'):
-                result_text = result_text[:-3]
-
-            import json
-            product_urls = json.loads(result_text.strip())
-        else:
-            product_urls = []
+        product_urls = filter_product_urls(urls, mode)
 
         return jsonify({
             'success': True,
@@ -489,7 +453,7 @@ URL LIST:
         })
 
     except Exception as e:
-        return jsonify({'success': False, 'message': f'AI filtering failed: {str(e)}'})
+        return jsonify({'success': False, 'message': f'URL filtering failed: {str(e)}'})
 
 @app.route('/start_product_parsing', methods=['POST'])
 def start_product_parsing():
@@ -516,7 +480,8 @@ def start_product_parsing():
     }
 
     # Start parsing in background thread
-    thread = threading.Thread(target=run_product_parsing)
+    data = request.get_json(silent=True) or {}
+    thread = threading.Thread(target=run_product_parsing, args=(bool(data.get('incremental')),))
     thread.daemon = True
     thread.start()
 
@@ -535,7 +500,7 @@ def download_images():
     # Get all image files
     image_files = []
     for file in os.listdir(images_dir):
-        if file.lower().endswith(('.jpg', '.jpeg', '.png', '.webp', '.gif')):
+        if file.lower().endswith(('.jpg', '.jpeg', '.png', '.webp', '.avif', '.gif')):
             image_files.append(file)
 
     if not image_files:
@@ -558,7 +523,61 @@ def download_images():
         download_name='product_images.zip'
     )
 
-def run_product_parsing():
+def filter_product_urls(urls, mode, progress=None):
+    """Pick product URLs with the path-template classifier or chunked LLM calls
+
+    progress(done, total) is called as LLM chunks complete.
+    """
+    if mode == 'llm':
+        return LLMURLFilter().filter_urls(urls, progress)
+
+    return URLClassifier().filter_products(urls)
+
+def update_filter_progress(done, total):
+    parsing_status['message'] = f'AI анализ URL: {done}/{total} частей'
+
+def filter_status_message(url_count, mode):
+    if mode == 'llm':
+        return f'AI анализ {url_count} URL...'
+    return f'Кластеризация {url_count} URL...'
+
+def iter_product_url_batches(urls, mode, progress=None):
+    """Yield product URLs in batches as soon as each one is classified
+
+    The LLM filter yields one batch per completed chunk; the path-template
+    classifier needs every URL at once and yields a single batch.
+    """
+    if mode == 'llm':
+        for start, product_urls in LLMURLFilter().iter_chunks(urls, progress):
+            yield product_urls
+    else:
+        yield URLClassifier().filter_products(urls)
+
+def queue_product_urls(entries, mode, frontier, found_urls, extracted_urls=None):
+    """Worker: classify sitemap entries and add product URLs to frontier, closing it at the end
+
+    The fetcher pulls the best URL queued so far from the frontier, which
+    stops handing out URLs at its MAX_PAGES limit.
+    """
+    entries_by_url = {entry.url: entry for entry in entries}
+    try:
+        with open('output/filtered_product_urls.txt', 'w', encoding='utf-8') as f:
+            for batch in iter_product_url_batches(list(entries_by_url), mode):
+                for url in batch:
+                    f.write(url + '\n')
+                    found_urls.append(url)
+                f.flush()
+                frontier.add_entries([entries_by_url[url] for url in batch],
+                                     labels=dict.fromkeys(batch, 'product'),
+                                     extracted_urls=extracted_urls)
+                parsing_status['total_pages'] = min(len(found_urls), config.MAX_PAGES)
+        print(f"CLASSIFIED: {len(found_urls)} product URLs from {len(entries_by_url)} total")
+    except Exception as e:
+        print(f"URL classification error: {e}")
+    finally:
+        frontier.close()
+
+def run_product_parsing(incremental=False):
     """Parse products from filtered URLs file"""
     global parsing_status
 
@@ -571,105 +590,212 @@ def run_product_parsing():
         parsing_status['total_pages'] = len(filtered_urls)
         parsing_status['message'] = f'Начинаем парсинг {len(filtered_urls)} товаров...'
 
-        # Initialize components
-        content_extractor = RawContentExtractor()
-        product_parser = ProductParser("")  # Will be updated per URL
-        csv_writer = CSVWriter("output")
-        image_store = ImageStore("output")
+        parse_product_urls(filtered_urls, incremental)
 
-        # Process pages
-        products = []
+    except Exception as e:
+        parsing_status['message'] = f'Ошибка: {str(e)}'
+        parsing_status['results'] = None
+    finally:
+        parsing_status['is_running'] = False
 
-        with PageFetcher() as fetcher:
-            for i, url in enumerate(filtered_urls, 1):
-                parsing_status['progress'] = (i / len(filtered_urls)) * 100
-                parsing_status['message'] = f'Обработка {i}/{len(filtered_urls)}: {url[:50]}...'
+def parse_product_urls(urls, incremental=False, total=None, catalog=None, bulk_products=None,
+                       image_store=None):
+    """Fetch, extract and parse product pages, then save the catalog
 
-                try:
-                    # Fetch page content
-                    html_content = fetcher.fetch_page(url)
-                    if not html_content:
-                        continue
+    urls is a list, or a CrawlFrontier that another thread fills while pages
+    are already being fetched; total() then returns the URLs queued so far.
+    bulk_products (URL -> product from catalog's API) are saved as well; a
+    rendered page only fills the fields its API product lacks. image_store
+    is left open for the caller; without one a store is opened for this call.
+    """
+    global parsing_status
 
-                    # Extract raw content
-                    raw_content = content_extractor.extract_content(html_content)
-                    if not raw_content:
-                        continue
+    if total is None:
+        total = lambda: len(urls)
+
+    # Initialize components
+    product_parser = ProductParser("")  # Will be updated per URL
+    csv_writer = CSVWriter("output")
+    url_state = UrlStateStore()
+
+    # Process pages
+    products = []
+
+    # Incremental runs keep the IDs of products already in the catalog
+    existing_ids = csv_writer.get_existing_ids_by_url() if incremental else {}
+    next_id = max((int(i) for i in existing_ids.values() if i.isdigit()), default=0)
+    bulk_products = dict(bulk_products or {})
+
+    def add_product(product_data, url):
+        nonlocal next_id
+        # Add product ID
+        if url not in existing_ids:
+            next_id += 1
+        product_data['id'] = existing_ids.get(url) or str(next_id)
+
+        # Images download in the background; filenames replace the image
+        # dicts once the product's last download finishes
+        image_downloader.submit(
+            product_data, product_parser.image_jobs(product_data, "output", product_data['id'])
+        )
 
-                    # Parse product data (TEMP mode returns None)
-                    product_data = product_parser.parse_product_page(raw_content, url)
-                    if product_data:
-                        # Add product ID
-                        product_data['id'] = str(len(products) + 1)
+        products.append(product_data)
+        parsing_status['found_products'] = len(products)
 
-                        # Download images
-                        downloaded_images = product_parser.download_product_images(
-                            product_data, "output", product_data['id']
-                        )
+    owns_store = image_store is None
+    image_store = image_store or ImageStore("output")
+    try:
+        with ImageDownloader(image_store=image_store) as image_downloader, \
+                ExtractionPool() as extraction_pool, TieredFetcher() as fetcher:
+            # Pages are rendered concurrently and arrive in completion order;
+            # extraction and parsing run on the process pool meanwhile
+            pages = fetcher.fetch_many(urls)
+            for i, (url, product_data) in enumerate(extraction_pool.process_pages(pages, fetcher.pop_captured_json), 1):
+                parsing_status['progress'] = (i / max(total(), i)) * 100
+                parsing_status['message'] = f'Обработка {i}/{total()}: {url[:50]}...'
 
-                        # Update product data with downloaded image filenames
-                        product_data['images'] = downloaded_images
+                try:
+                    if url in bulk_products:
+                        # The rendered page only fills what the catalog API lacked
+                        product_data = catalog.fill_missing(bulk_products.pop(url), product_data or {})
+                    elif product_data is False:
+                        continue
+
+                    # None: the page holds no product, but it was extracted
+                    if product_data:
+                        add_product(product_data, url)
 
-                        products.append(product_data)
-                        parsing_status['found_products'] = len(products)
-                    else:
-                        # TEMP mode - still count as processed
-                        parsing_status['found_products'] = i  # Show progress
+                    url_state.mark_extracted(url)
 
                 except Exception as e:
                     print(f"Error processing {url}: {e}")
                     continue
 
-        # Save results
-        if products:
-            parsing_status['message'] = f'Сохранение {len(products)} товаров...'
-            csv_writer.write_products(products)
+            # Catalog API products that were complete (or beyond the render budget)
+            for url, product_data in bulk_products.items():
+                try:
+                    add_product(product_data, url)
+                    url_state.mark_extracted(url)
+                except Exception as e:
+                    print(f"Error processing {url}: {e}")
 
-            # Show first 10 successfully parsed products in UI
-            display_products = products[:10]
-            parsing_status['results'] = {
-                'products': display_products,
-                'total_count': len(products),
-                'csv_path': 'output/catalog.csv',
-                'images_dir': 'output/images'
-            }
-            parsing_status['message'] = f'Парсинг завершен! Найдено {len(products)} товаров'
-        else:
-            parsing_status['message'] = 'Товары не найдены'
-            parsing_status['results'] = {'products': [], 'total_count': 0}
+            parsing_status['message'] = 'Загрузка изображений...'
 
-    except Exception as e:
-        parsing_status['message'] = f'Ошибка: {str(e)}'
-        parsing_status['results'] = None
+        # Drop objects no product file links to, e.g. ones replaced by new downloads
+        image_store.prune_objects()
     finally:
-        parsing_status['is_running'] = False
+        if owns_store:
+            image_store.close()
 
-def run_parsing(website_url):
-    """Run the parsing process in background"""
+    url_state.close()
+
+    # Save results
+    if products:
+        parsing_status['message'] = f'Сохранение {len(products)} товаров...'
+        if incremental:
+            csv_writer.merge_products(products)
+        else:
+            csv_writer.write_products(products)
+
+        # Show first 10 successfully parsed products in UI
+        display_products = products[:10]
+        parsing_status['results'] = {
+            'products': display_products,
+            'total_count': len(products),
+            'csv_path': 'output/catalog.csv',
+            'images_dir': 'output/images'
+        }
+        parsing_status['message'] = f'Парсинг завершен! Найдено {len(products)} товаров'
+    else:
+        parsing_status['message'] = 'Товары не найдены'
+        parsing_status['results'] = {'products': [], 'total_count': 0}
+
+def run_parsing(website_url, incremental=False, combined=False):
+    """Run the parsing process in background
+
+    In combined mode product URLs are streamed into fetching as soon as each
+    batch is classified, instead of stopping after filtering.
+    """
     global parsing_status
 
+    image_store = None
     try:
         # Initialize components
         sitemap_parser = SitemapParser(website_url)
         url_filter = URLFilter(website_url)
-        content_extractor = RawContentExtractor()
         product_parser = ProductParser(website_url)
         csv_writer = CSVWriter("output")
         image_store = ImageStore("output")
 
+        # Stores with a public catalog API (Shopify, WooCommerce) go straight to products
+        catalog = detect_platform(website_url) if config.PLATFORM_BULK_CATALOG else None
+        if catalog:
+            parsing_status['message'] = f'Загрузка каталога через API {catalog.platform}...'
+            entries, bulk_products = catalog.collect(URLCanonicalizer().canonicalize,
+                                                     product_parser.finalize_product)
+
+            url_state = UrlStateStore()
+            url_state.record_seen(entries)
+            if incremental:
+                entries = url_state.select_changed(entries)
+            url_state.close()
+
+            bulk_products = {entry.url: bulk_products[entry.url] for entry in entries}
+            render_urls = [url for url, product in bulk_products.items() if catalog.missing_fields(product)]
+            print(f"DEBUG: {len(render_urls)} of {len(bulk_products)} catalog products need page rendering")
+            parsing_status['total_pages'] = len(bulk_products)
+            parse_product_urls(render_urls[:config.MAX_PAGES], incremental,
+                               catalog=catalog, bulk_products=bulk_products, image_store=image_store)
+            return
+
         # Get all URLs from sitemap
         parsing_status['message'] = 'Получение карты сайта...'
-        all_urls = sitemap_parser.get_all_urls()
-        print(f"DEBUG: Found {len(all_urls)} URLs in sitemap")
+        entries = sitemap_parser.get_all_entries()
+        print(f"DEBUG: Found {len(entries)} URLs in sitemap")
+
+        # Normalize URLs and collapse locale variants before any filtering
+        entries = URLCanonicalizer().dedupe_entries(entries)
+
+        url_state = UrlStateStore()
+        url_state.record_seen(entries)
+        if incremental:
+            entries = url_state.select_changed(entries)
+            print(f"DEBUG: Incremental mode: {len(entries)} new or changed URLs")
+        extracted_urls = url_state.extracted_urls()
+        url_state.close()
+        all_urls = [entry.url for entry in entries]
+
         if all_urls:
             print(f"DEBUG: Sample URLs: {all_urls[:3]}")
         parsing_status['message'] = f'Найдено {len(all_urls)} URL в карте сайта'
 
-        # Skip URLFilter - we'll use AI to identify product pages directly from all URLs
+        # Skip URLFilter - product pages are identified by path-template clusters
         parsing_status['message'] = f'Получено {len(all_urls)} URL из sitemap'
         filtered_urls = []
 
-        # Save URLs to file and use AI to filter all at once
+        if all_urls and combined:
+            with open('output/all_urls.txt', 'w', encoding='utf-8') as f:
+                for url in all_urls:
+                    f.write(url + '\n')
+
+            # Classification and fetching overlap through the frontier,
+            # which hands out at most MAX_PAGES URLs, best first
+            parsing_status['message'] = f'Фильтрация и парсинг {len(all_urls)} URL...'
+            frontier = CrawlFrontier(limit=config.MAX_PAGES)
+            found_urls = []
+            classifier_thread = threading.Thread(
+                target=queue_product_urls,
+                args=(entries, config.URL_FILTER_MODE, frontier, found_urls, extracted_urls)
+            )
+            classifier_thread.daemon = True
+            classifier_thread.start()
+
+            parse_product_urls(frontier, incremental, total=lambda: min(len(found_urls), config.MAX_PAGES),
+                               image_store=image_store)
+            classifier_thread.join()
+            return
+
+        # Save URLs to file and classify all of them at once
         if all_urls:
             parsing_status['message'] = f'Сохранение {len(all_urls)} URL в файл...'
             try:
@@ -679,82 +805,21 @@ def run_parsing(website_url):
                     for url in all_urls:
                         f.write(url + '\n')
 
-                parsing_status['message'] = f'AI анализ файла с {len(all_urls)} URL...'
-                # Use AI to filter all URLs at once by sending file content
-                from ai.deepseek_client import DeepSeekClient
-                ai_client = DeepSeekClient()
-
-                # Read file content for prompt
-                with open(urls_file, 'r', encoding='utf-8') as f:
-                    urls_content = f.read()
-
-                # Truncate if too long (keep first 200 URLs for token limit)
-                urls_lines = urls_content.split('\n')[:200]
-                urls_content = '\n'.join(urls_lines)
-                if len(all_urls) > 200:
-                    urls_content += f'\n... and {len(all_urls) - 200} more URLs'
-
-                prompt = f"""
-You are an expert at identifying product pages on e-commerce websites.
-
-Given the following list of URLs from a sitemap (one URL per line), identify which ones are likely PRODUCT pages (individual items for sale) and return ONLY those URLs.
+                parsing_status['message'] = filter_status_message(len(all_urls), config.URL_FILTER_MODE)
+                filtered_urls = filter_product_urls(all_urls, config.URL_FILTER_MODE, update_filter_progress)
 
-Exclude:
-- Homepage (/)
-- Collection/category pages (/collections/)
-- Static pages (/pages/)
-- Blog pages (/blogs/)
-- Any other non-product pages
+                print(f"CLASSIFIED: {len(filtered_urls)} product URLs from {len(all_urls)} total")
 
-IMPORTANT: Remove duplicate URLs that represent the same product in different languages (e.g., keep only one of /products/item and /de/products/item).
-
-Return ONLY a JSON array of unique product URLs, like: ["https://example.com/products/item1", "https://example.com/products/item2"]
-
-URL LIST:
-{urls_content}
-"""
-
-                response = ai_client.client.chat.completions.create(
-                    model=ai_client.model,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are a helpful assistant that filters product URLs from a list. Return only valid JSON arrays."
-                        },
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    temperature=0.1,
-                    max_tokens=4000,
-                    timeout=600  # 10 minutes timeout
-                )
-
-                result_text = response.choices[0].message.content
-                if result_text:
-                    result_text = result_text.strip()
-                    if result_text.startswith('```'):
-                        lines = result_text.split('\n')
-                        if lines[0].startswith('```'):
-                            result_text = '\n'.join(lines[1:])
-                        if result_text.endswith('```'):
-                            result_text = result_text[:-3].strip()
-
-                    # Try to parse as JSON first, then as plain text
-                    try:
-                        filtered_urls = json.loads(result_text.strip())
-                        # Clean up URLs if they have quotes
-                        filtered_urls = [url.strip().strip('"').strip("'") for url in filtered_urls if url and 'https://' in url]
-                    except json.JSONDecodeError:
-                        # Parse as plain text - one URL per line
-                        filtered_urls = [line.strip().strip('"').strip("'").strip(',') for line in result_text.split('\n') if line.strip() and not line.startswith('URL LIST') and 'https://' in line]
-                else:
-                    filtered_urls = []
-                print(f"AI FILTERED: {len(filtered_urls)} product URLs from {len(all_urls)} total")
+                # Order by sitemap priority/lastmod and novelty within the MAX_PAGES budget
+                product_urls = set(filtered_urls)
+                frontier = CrawlFrontier()
+                frontier.add_entries([entry for entry in entries if entry.url in product_urls],
+                                     labels=dict.fromkeys(product_urls, 'product'),
+                                     extracted_urls=extracted_urls)
+                filtered_urls = list(frontier.drain(config.MAX_PAGES))
                 print(f"Sample product URLs: {filtered_urls[:5]}")
                 parsing_status['total_pages'] = len(filtered_urls)
-                parsing_status['message'] = f'AI отфильтровал {len(filtered_urls)} товарных страниц'
+                parsing_status['message'] = f'Найдено {len(filtered_urls)} товарных страниц'
 
                 # Save filtered URLs for later parsing
                 with open('output/filtered_product_urls.txt', 'w', encoding='utf-8') as f:
@@ -766,7 +831,7 @@ URL LIST:
                 return
 
             except Exception as e:
-                print(f"AI filtering error: {e}")
+                print(f"URL classification error: {e}")
                 filtered_urls = []
 
         # Product parsing removed - use separate endpoint
@@ -775,6 +840,8 @@ URL LIST:
         parsing_status['message'] = f'Ошибка: {str(e)}'
         parsing_status['results'] = None
     finally:
+        if image_store:
+            image_store.close()
         parsing_status['is_running'] = False
 
 if __name__ == '__main__':